@@ -1,34 +1,43 @@
 import os
 
+import eval_columns
 import utils
 
-import ecorouting_connector as eco
 from globals import Globals
 from logger import logger
+from scenario_catalog import catalog, ScenarioInfo
 
 
-def find_TEMA_res_file_dirs():
+def find_objective_pair_TEMA_res_file_dirs(info: ScenarioInfo, objective1, objective2):
     out_file_base = "baseTEMA.eval"
     out_file_sim = "simTEMA.eval"
+    in_dir_base = [info.base_output_dir]
+    in_dirs_sim = []
+    sols = []
+    out_dir = info.get_objectives_dir(objective1, objective2)
+    if not os.path.exists(in_dir_base[0]) or not os.path.exists(out_dir):
+        return []
+    for file in os.listdir(out_dir):
+        if os.path.isdir(os.path.join(out_dir, file)) and file.startswith("solution"):
+            sols.append(file)
+    ordered_sols = sorted(sols, key=lambda x: int(x.replace("solution", "")))
+    for sol in ordered_sols:
+        in_dirs_sim.append(os.path.join(out_dir, sol))
+    return [{"input_dirs": in_dir_base, "output_file": os.path.join(out_dir, out_file_base)},
+            {"input_dirs": in_dirs_sim, "output_file": os.path.join(out_dir, out_file_sim)}]
+
+
+def find_TEMA_res_file_dirs():
     dirs = []
-    for scenario, info in eco.get_test_cases().items():
-        in_dir_base = [os.path.join(info["ofolder"], "inputdata")]
-        if not os.path.exists(in_dir_base[0]):
+    for _, info in catalog.items():
+        if not os.path.exists(info.base_output_dir):
             break
         for obj_pair in utils.get_objective_combinations():
-            in_dirs_sim = []
-            sols = []
-            out_dir = os.path.join(info["ofolder"], obj_pair)
-            if not os.path.exists(out_dir):
+            objective1, objective2 = utils.reverse_format_objective_names(obj_pair)
+            pair_dirs = find_objective_pair_TEMA_res_file_dirs(info, objective1, objective2)
+            if not pair_dirs:
                 break
-            for file in os.listdir(out_dir):
-                if os.path.isdir(os.path.join(out_dir, file)) and file.startswith("solution"):
-                    sols.append(file)
-            ordered_sols = sorted(sols, key=lambda x: int(x.replace("solution", "")))
-            for sol in ordered_sols:
-                in_dirs_sim.append(os.path.join(out_dir, sol))
-            dirs.append({"input_dirs": in_dir_base, "output_file": os.path.join(out_dir, out_file_base)})
-            dirs.append({"input_dirs": in_dirs_sim, "output_file": os.path.join(out_dir, out_file_sim)})
+            dirs.extend(pair_dirs)
     return dirs
 
 
@@ -38,8 +47,8 @@ def generate_TEMA_eval_file(input_dirs: list, output_file: str):
     eval = []
     for input_dir in input_dirs:
         if Globals.TEMA_RESULTS_FILE_NAME in os.listdir(input_dir):
-            res_sol = utils.read_res_file(os.path.join(input_dir, Globals.TEMA_RESULTS_FILE_NAME))
-            ev_sol = utils.res_to_TEMA_ev(res_sol)
+            res_sol = eval_columns.read_res_columns(os.path.join(input_dir, Globals.TEMA_RESULTS_FILE_NAME))
+            ev_sol = eval_columns.res_to_TEMA_ev_columns(res_sol)
             for h in ev_sol:
                 header.add(h)
             eval.append(ev_sol)
@@ -51,13 +60,14 @@ def generate_TEMA_eval_file(input_dirs: list, output_file: str):
         print_msg = "Unable to generate %s as input directory %s does not have a %s file" % print_info
         logger.info("TEMA_EvalFileGenerator", print_msg)
     elif header and eval:
-        utils.write_eval_file(output_file, list(header), eval)
+        header = list(header)
+        eval_columns.write_eval_columns(output_file, header, eval_columns.rows_to_columns(header, eval))
         print_info = (output_file, Globals.TEMA_RESULTS_FILE_NAME, input_dirs)
         logger.info("TEMA_EvalFileGenerator", "Generated %s from %s files in %s" % print_info)
 
 
-def run():
-    for dir in find_TEMA_res_file_dirs():
+def generate_TEMA_eval_files(dirs):
+    for dir in dirs:
         try:
             in_dirs = dir["input_dirs"]
             out_file = dir["output_file"]
@@ -71,5 +81,9 @@ def run():
                 logger.flush()
 
 
+def run():
+    generate_TEMA_eval_files(find_TEMA_res_file_dirs())
+
+
 if __name__ == '__main__':
     run()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+import metrics
+import utils
+from globals import Globals
+from logger import logger
+
+
+# Content-addressed store of the simulation outputs (SUMO edge data, TEMA results): each distinct content is kept once,
+# as <store>/<sha256[:2]>/<sha256>, and the output paths, as well as the workspaces staged from them, are hard links to
+# it, so that the link count of an object is one more than its references
+# Objects and outputs are only ever replaced by renaming complete files into place, so that no lock is needed between
+# tasks publishing at once and no reader sees a partial file; outputs must never be written to in place
+class ArtifactStore:
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    @staticmethod
+    def hash_file(path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(Globals.ARTIFACT_STORE_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_tmp_path(path) -> str:
+        return "%s.%d.tmp" % (path, threading.get_ident())
+
+    @staticmethod
+    def link(src, dst) -> bool:
+        try:
+            os.link(src, dst)
+            return True
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # e.g. across file systems
+            shutil.copyfile(src, dst)
+            return False
+
+    def get_object_path(self, digest) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest)
+
+    def publish(self, src, dst, move=False) -> str:
+        digest = self.hash_file(src)
+        object_path = self.get_object_path(digest)
+        dst_tmp = self.get_tmp_path(dst)
+        try:
+            self.link(object_path, dst_tmp)
+            metrics.artifact_store_publishes.inc(("deduplicated",))
+            metrics.artifact_store_deduplicated_bytes.inc((), os.path.getsize(dst_tmp))
+        except FileNotFoundError:
+            # the output is linked to the new object before it is renamed into place, so that the garbage collection
+            # never sees it unreferenced
+            utils.ensure_dir_exists(os.path.dirname(object_path))
+            object_tmp = self.get_tmp_path(object_path)
+            if move:
+                shutil.move(src, object_tmp)
+            else:
+                shutil.copyfile(src, object_tmp)
+            self.link(object_tmp, dst_tmp)
+            os.replace(object_tmp, object_path)
+            metrics.artifact_store_publishes.inc(("stored",))
+        # as recent as a copy would be, for the outputs uploaded by distributed workers and the post-processing
+        os.utime(dst_tmp)
+        os.replace(dst_tmp, dst)
+        if move and os.path.lexists(src):
+            os.remove(src)
+        return digest
+
+    def collect_garbage(self):
+        started_at = time.monotonic()
+        removed, removed_bytes = 0, 0
+        if not os.path.isdir(self.root_dir):
+            return
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                    # temporary files are left to their publishers, unless they were abandoned
+                    if file_name.endswith(".tmp"):
+                        unreferenced = time.time() - stat.st_mtime > Globals.ARTIFACT_STORE_GC_INTERVAL
+                    else:
+                        unreferenced = stat.st_nlink == 1
+                    if unreferenced:
+                        os.remove(path)
+                        removed += 1
+                        removed_bytes += stat.st_size
+                except FileNotFoundError:
+                    pass
+        print_info = (removed, removed_bytes, time.monotonic() - started_at)
+        logger.info("ArtifactStore", "Removed %d unreferenced objects (%d bytes) in %.3f seconds" % print_info)
+
+
+artifacts = ArtifactStore(Globals.ARTIFACT_STORE_DIR)
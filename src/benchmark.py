@@ -0,0 +1,259 @@
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import eval_columns
+import utils
+import xml_transform
+
+
+# Micro-benchmarks comparing the current implementations of hot paths against their replacements
+# Run with: python benchmark.py [name ...]
+
+
+def report(name, baseline_seconds, optimized_seconds):
+    speedup = baseline_seconds / optimized_seconds if optimized_seconds else float("inf")
+    print_info = (name, baseline_seconds * 1000, optimized_seconds * 1000, speedup)
+    sys.__stdout__.write("%-40s baseline: %10.3f ms | optimized: %10.3f ms | speedup: %6.2fx\n" % print_info)
+
+
+def measure(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def measure_peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report_memory(name, baseline_bytes, optimized_bytes):
+    print_info = (name, baseline_bytes / 2 ** 20, optimized_bytes / 2 ** 20)
+    sys.__stdout__.write("%-40s baseline: %10.3f MB | optimized: %10.3f MB (peak memory)\n" % print_info)
+
+
+def bench_eval_files(links=20_000, solutions=2_000, repeat=5):
+    res_headers = ["link", "ttime", "length", "cost_co2", "cost_co", "cost_pm10", "cost_pm25", "cost_nox",
+                   "cost_eco_indicator", "totalvehicles"]
+    eval_headers = list(utils.Globals.ECOROUTING_METRICS)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        res_file = os.path.join(tmp_dir, utils.Globals.TEMA_RESULTS_FILE_NAME)
+        with open(res_file, "w") as f:
+            f.write("\t".join(res_headers) + "\n")
+            for i in range(links):
+                values = ["%.6f" % rng.uniform(1, 1000) for _ in res_headers[1:]]
+                f.write("\t".join(["link%d" % i] + values) + "\n")
+
+        eval_file = os.path.join(tmp_dir, "pred.eval")
+        eval_rows = [{h: rng.uniform(1, 1000) for h in eval_headers} for _ in range(solutions)]
+        utils.write_eval_file(eval_file, eval_headers, eval_rows)
+        eval_data = eval_columns.rows_to_columns(eval_headers, eval_rows)
+
+        baseline_file = os.path.join(tmp_dir, "baseline.eval")
+        optimized_file = os.path.join(tmp_dir, "optimized.eval")
+        utils.write_eval_file(baseline_file, eval_headers, eval_rows)
+        eval_columns.write_eval_columns(optimized_file, eval_headers, eval_data)
+        with open(baseline_file, "rb") as f1, open(optimized_file, "rb") as f2:
+            assert f1.read() == f2.read(), "write_eval_columns output differs from write_eval_file"
+
+        report("read_res_file", measure(lambda: utils.read_res_file(res_file), repeat),
+               measure(lambda: eval_columns.read_res_columns(res_file), repeat))
+        res = utils.read_res_file(res_file)
+        res_columns = eval_columns.read_res_columns(res_file)
+        report("res_to_TEMA_ev", measure(lambda: utils.res_to_TEMA_ev(res), repeat),
+               measure(lambda: eval_columns.res_to_TEMA_ev_columns(res_columns), repeat))
+        report("read_eval_file", measure(lambda: utils.read_eval_file(eval_file), repeat),
+               measure(lambda: eval_columns.read_eval_columns(eval_file), repeat))
+        report("write_eval_file", measure(lambda: utils.write_eval_file(baseline_file, eval_headers, eval_rows), repeat),
+               measure(lambda: eval_columns.write_eval_columns(optimized_file, eval_headers, eval_data), repeat))
+
+
+def bench_sim_chain(solutions=32, threads=8, seconds=0.1, repeat=3):
+    # wall-clock time to simulate the solutions of an objective pair, chained one after the other as they used to be,
+    # or in parallel as children of their Pred; the simulations are stand-ins that sleep, and are not batched
+    import ecorouting_connector as eco
+    from task import TaskStatus
+
+    class SleepingSimTask(eco.EcoRoutingTask):
+        def start(self):
+            self.status = TaskStatus.Running
+            time.sleep(seconds)
+            self.status = TaskStatus.Completed
+
+    class ChainedTaskManager(eco.EcoRoutingTaskManager):
+        def get_parent_dependency_key(self, task):
+            key = self.get_dependency_key(task)
+            if key[2] == "Sim" and key[:-1] + (key[-1] - 1,) in self.dep_nodes:
+                return key[:-1] + (key[-1] - 1,)
+            return eco.EcoRoutingTaskManager.get_parent_dependency_key(self, task)
+
+    def run(task_manager_class):
+        task_manager = task_manager_class(threads, lambda: None)
+        objective1, objective2 = list(utils.Globals.ECOROUTING_METRICS)[:2]
+        for task in [eco.EcoRoutingTask("base", "benchmark", eco.Base()),
+                     eco.EcoRoutingTask("pred", "benchmark", eco.Pred(objective1, objective2))]:
+            task.status = TaskStatus.Completed
+            task_manager.add_task(task)
+        for solution in range(1, solutions + 1):
+            mode = eco.Sim(objective1, objective2, solution)
+            task_manager.add_task(SleepingSimTask("sim%d" % solution, "benchmark", mode))
+        task_manager.start()
+        while task_manager.status_counts[TaskStatus.Completed] < solutions + 2:
+            time.sleep(0.01)
+        task_manager.stop(wait=True)
+
+    report("sim_chain (%d solutions, %d threads)" % (solutions, threads),
+           measure(lambda: run(ChainedTaskManager), repeat), measure(lambda: run(eco.EcoRoutingTaskManager), repeat))
+
+
+# the whole-file string and regex versions of the XML edits in utils, which xml_transform replaced
+def regex_add_snapshots_to_gui_settings(path_to_gui_settings):
+    snapshot_file_name = os.path.join(utils.Globals.SNAPSHOTS_DIR, utils.Globals.SNAPSHOTS_FILE_NAME)
+    snapshot_str = "\n".join([utils.Globals.SNAPSHOTS_XML_ELEMENT % (snapshot_file_name % i, i) for i in
+                              range(utils.Globals.SNAPSHOTS_COUNT)])
+    gui_settings = os.path.join(path_to_gui_settings, utils.Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME)
+    with open(gui_settings, "r") as f:
+        content = f.read()
+    content = content.replace("</viewsettings>", "%s\n</viewsettings>" % snapshot_str)
+    with open(gui_settings, "w") as f:
+        f.write(content)
+
+
+def regex_remove_snapshots_from_gui_settings(path_to_gui_settings):
+    xml_line = utils.Globals.SNAPSHOTS_XML_ELEMENT
+    regex = re.compile(xml_line.replace("%s", ".+").replace("%d", "[0-9]+").strip())
+    gui_settings = os.path.join(path_to_gui_settings, utils.Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME)
+    with open(gui_settings, "r") as f:
+        content = f.readlines()
+    content = [line for line in content if not regex.match(line.strip())]
+    with open(gui_settings, "w") as f:
+        f.writelines(content)
+
+
+def regex_merge_additional_files_content(file_src, file_dest, xml_tags: list):
+    content_to_add = []
+    with open(file_src, "r") as f:
+        for line in f.readlines():
+            for xml_tag in xml_tags:
+                if line.replace("<", "").replace(">", "").strip().startswith(xml_tag):
+                    content_to_add.append(line.strip())
+                    break
+    content_to_add_str = "\n".join(content_to_add)
+    with open(file_dest, "r") as f:
+        content = f.read()
+    content = content.replace("</additional>", "%s\n</additional>" % content_to_add_str)
+    with open(file_dest, "w") as f:
+        f.write(content)
+
+
+def regex_remove_tags_from_xml(file, tags):
+    with open(file, "r") as f:
+        content = f.read()
+    for tag in tags:
+        content = re.sub("(%s.*?%s)" % (tag[0], tag[1]), "", content, flags=re.DOTALL)
+    content = re.sub("\n(\n)+", "", content)
+    with open(file, "w") as f:
+        f.write(content)
+
+
+def bench_xml_transforms(edges=200_000, repeat=3):
+    # the edits on a gui-settings file (with the usual Globals.SNAPSHOTS_COUNT snapshots) and on a large SUMO
+    # additional file, each run on a fresh copy of its input
+    Globals = utils.Globals
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gui_settings_file = os.path.join(tmp_dir, "gui-settings.src.xml")
+        with open(gui_settings_file, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!-- view settings -->\n<viewsettings>\n'
+                    '    <scheme name="real world">\n        <opengl antialiase="0"/>\n    </scheme>\n'
+                    '    <delay value="0"/>\n</viewsettings>\n')
+        additional_file = os.path.join(tmp_dir, "additional.src.xml")
+        with open(additional_file, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!-- TEMA edge data -->\n<additional>\n')
+            for i in range(edges):
+                f.write('\t<!-- edge %d -->\n\t<edgeData id="edge%d" file="edges%d.xml" begin="%d" end="%d"/>\n'
+                        % (i, i, i % 3, rng.randint(0, 3600), rng.randint(3600, 7200)))
+            f.write('</additional>\n')
+        dest_file = os.path.join(tmp_dir, "moreOutputInfo.src.xml")
+        with open(dest_file, "w") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<additional>\n'
+                    '\t<edgeData id="all" file="all.xml"/>\n</additional>\n')
+        work_dir = os.path.join(tmp_dir, "work")
+        os.makedirs(work_dir)
+        gui_settings = os.path.join(work_dir, Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME)
+        work_file = os.path.join(work_dir, "work.xml")
+
+        def on_copy(src, dst, function):
+            def run():
+                shutil.copyfile(src, dst)
+                function()
+            return run
+
+        def on_gui_settings_with_snapshots(function):
+            def run():
+                shutil.copyfile(gui_settings_file, gui_settings)
+                utils.add_snapshots_to_gui_settings(work_dir)
+                function()
+            return run
+
+        def count_elements(file, tag):
+            with open(file) as f:
+                return f.read().count("<%s " % tag)
+
+        cases = [
+            ("add_snapshots_to_gui_settings",
+             on_copy(gui_settings_file, gui_settings, lambda: regex_add_snapshots_to_gui_settings(work_dir)),
+             on_copy(gui_settings_file, gui_settings, lambda: utils.add_snapshots_to_gui_settings(work_dir)),
+             lambda: count_elements(gui_settings, Globals.SNAPSHOTS_XML_TAG)),
+            ("remove_snapshots_from_gui_settings",
+             on_gui_settings_with_snapshots(lambda: regex_remove_snapshots_from_gui_settings(work_dir)),
+             on_gui_settings_with_snapshots(lambda: utils.remove_snapshots_from_gui_settings(work_dir)),
+             lambda: count_elements(gui_settings, Globals.SNAPSHOTS_XML_TAG)),
+            ("merge_additional_files_content",
+             on_copy(dest_file, work_file, lambda: regex_merge_additional_files_content(
+                 additional_file, work_file, [Globals.SUMO_EDGE_DATA_XML_TAG])),
+             on_copy(dest_file, work_file, lambda: utils.merge_additional_files_content(
+                 additional_file, work_file, [Globals.SUMO_EDGE_DATA_XML_TAG])),
+             lambda: count_elements(work_file, Globals.SUMO_EDGE_DATA_XML_TAG)),
+            ("remove_tags_from_xml",
+             on_copy(additional_file, work_file, lambda: regex_remove_tags_from_xml(
+                 work_file, [Globals.XML_COMMENT_TAGS, Globals.XML_PROLOG_TAGS])),
+             on_copy(additional_file, work_file, lambda: utils.remove_tags_from_xml(
+                 work_file, [Globals.XML_COMMENT_TAGS, Globals.XML_PROLOG_TAGS])),
+             lambda: count_elements(work_file, Globals.SUMO_EDGE_DATA_XML_TAG))
+        ]
+        # an edit that drops nothing leaves the formatting as it was
+        for src_file in [gui_settings_file, additional_file]:
+            shutil.copyfile(src_file, work_file)
+            xml_transform.transform(work_file)
+            with open(src_file) as f, open(work_file) as g:
+                assert f.read() == g.read(), "%s is not written back as it was" % src_file
+        for name, baseline, optimized, count in cases:
+            baseline()
+            baseline_count = count()
+            optimized()
+            assert count() == baseline_count, "%s output differs from the regex version" % name
+            report(name, measure(baseline, repeat), measure(optimized, repeat))
+            report_memory(name, measure_peak_memory(baseline), measure_peak_memory(optimized))
+
+
+BENCHMARKS = {
+    "eval_files": bench_eval_files,
+    "sim_chain": bench_sim_chain,
+    "xml_transforms": bench_xml_transforms,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or list(BENCHMARKS):
+        BENCHMARKS[name]()
@@ -0,0 +1,334 @@
+import hmac
+import os
+import socket
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+from flask import Flask, request, send_file
+from werkzeug.serving import make_server
+
+import ecorouting_connector as eco
+from globals import Globals
+from logger import logger
+from task import Task, TaskManager, TaskStatus, ResourcePool
+
+
+# Distributed runs: the coordinator owns the task graph (an EcoRoutingTaskManager that runs no tasks itself), and
+# workers on any number of hosts lease its ready tasks over HTTP. A worker downloads the task's input paths from the
+# coordinator as a tar.gz, runs the task in its own workspace, and uploads whatever the task wrote under its output
+# paths. Workers renew their leases with heartbeats, and the task of an expired lease goes back to the ready queue
+# Every host runs from its own checkout, so archived paths are relative to the project root
+ROOT_DIR = ".."
+
+
+def pack_paths(paths: List[str], since: float = None, shallow_paths: List[str] = ()):
+    # the files under paths, and the files directly in shallow_paths
+    archive = tempfile.TemporaryFile()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        for path in list(paths) + list(shallow_paths):
+            files = []
+            if os.path.isfile(path):
+                files = [path]
+            elif os.path.isdir(path) and path in shallow_paths:
+                files = [file.path for file in os.scandir(path) if file.is_file()]
+            elif os.path.isdir(path):
+                files = [os.path.join(root, file) for root, _, dir_files in os.walk(path) for file in dir_files]
+            for file in files:
+                if since is None or os.stat(file).st_mtime >= since:
+                    tar.add(file, arcname=os.path.relpath(file, ROOT_DIR), recursive=False)
+    archive.seek(0)
+    return archive
+
+
+def get_token() -> str:
+    token = os.environ.get(Globals.DISTRIBUTED_TOKEN_ENV)
+    if not token:
+        raise RuntimeError("The %s environment variable must be set for distributed runs"
+                           % Globals.DISTRIBUTED_TOKEN_ENV)
+    return token
+
+
+def is_within_paths(path, paths: List[str], shallow_paths: List[str] = ()) -> bool:
+    path = os.path.abspath(path)
+    for allowed_path in paths:
+        allowed_path = os.path.abspath(allowed_path)
+        if path == allowed_path or path.startswith(allowed_path + os.sep):
+            return True
+    return os.path.dirname(path) in [os.path.abspath(shallow_path) for shallow_path in shallow_paths]
+
+
+def unpack_paths(archive, allowed_paths: List[str], shallow_paths: List[str] = ()):
+    # only regular files under the given paths (the task's inputs or outputs), or directly in the shallow ones, are
+    # extracted
+    with tarfile.open(fileobj=archive, mode="r:gz") as tar:
+        for member in tar:
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.startswith("..") or not member.isfile() or \
+                    not is_within_paths(os.path.join(ROOT_DIR, name), allowed_paths, shallow_paths):
+                logger.warn("Distributed", "Skipping archive member %s" % member.name)
+                continue
+            # replaced rather than written to, as outputs may be hard links into the artifact store
+            path = os.path.join(ROOT_DIR, name)
+            if os.path.lexists(path) and not os.path.isdir(path):
+                os.remove(path)
+            tar.extract(member, ROOT_DIR)
+
+
+class Lease:
+    def __init__(self, task: Task, worker):
+        self.lease_id = uuid.uuid4().hex
+        self.task = task
+        self.worker = worker
+        self.expires_at = 0
+        self.renew()
+
+    def renew(self):
+        self.expires_at = time.time() + Globals.DISTRIBUTED_LEASE_TIMEOUT
+
+
+class Coordinator:
+    def __init__(self, task_manager: TaskManager, host=Globals.DISTRIBUTED_COORDINATOR_HOST,
+                 port=Globals.DISTRIBUTED_COORDINATOR_PORT):
+        self.task_manager = task_manager
+        self.host = host
+        self.port = port
+        self.token = get_token()
+        self.leases: Dict[str, Lease] = {}
+        self.leases_lock = threading.Lock()
+        self.app = self.create_app()
+        self.server = None
+
+    def lease(self, worker, capacities: Dict[str, float], used: Dict[str, float]) -> Lease:
+        resource_pool = ResourcePool(capacities)
+        resource_pool.acquire(used)
+        task = self.task_manager.get_available_task(resource_pool)
+        if not task:
+            return None
+        lease = Lease(task, worker)
+        with self.leases_lock:
+            self.leases[lease.lease_id] = lease
+        task.started_at = datetime.now()
+        task.status = TaskStatus.Running
+        logger.info("Coordinator", "Leased task ID = %s to worker %s" % (task.task_id, worker))
+        return lease
+
+    def renew(self, lease_id) -> Lease:
+        with self.leases_lock:
+            lease = self.leases.get(lease_id)
+            if lease:
+                lease.renew()
+            return lease
+
+    def complete(self, lease_id, status: TaskStatus, archive) -> bool:
+        with self.leases_lock:
+            lease = self.leases.pop(lease_id, None)
+        if not lease:
+            return False
+        if status == TaskStatus.Completed and archive:
+            unpack_paths(archive, lease.task.get_output_paths())
+        lease.task.status = status
+        self.task_manager.task_finished(lease.task, (datetime.now() - lease.task.started_at).total_seconds())
+        print_info = (lease.worker, lease.task.task_id, status.name)
+        logger.info("Coordinator", "Worker %s finished task ID = %s with status = %s" % print_info)
+        with self.task_manager.callback_rlock:
+            self.task_manager.on_task_finish_callback()
+        return True
+
+    def expire_leases(self):
+        now = time.time()
+        with self.leases_lock:
+            expired = [lease for lease in self.leases.values() if lease.expires_at < now]
+            for lease in expired:
+                self.leases.pop(lease.lease_id)
+        for lease in expired:
+            print_info = (lease.worker, lease.task.task_id)
+            logger.warn("Coordinator", "Lease of worker %s on task ID = %s expired, task is available again" % print_info)
+            lease.task.status = TaskStatus.Available
+
+    def create_app(self) -> Flask:
+        app = Flask(__name__)
+
+        @app.before_request
+        def authenticate():
+            token = request.headers.get("Authorization", "")[len("Bearer "):]
+            if not hmac.compare_digest(token.encode(), self.token.encode()):
+                return {"success": False, "error": "Invalid or missing coordinator token"}, 401
+
+        @app.route("/coordinator/leases", methods=["POST"])
+        def lease():
+            body = request.get_json(force=True)
+            new_lease = self.lease(body["worker"], body.get("capacities", {}), body.get("used", {}))
+            if not new_lease:
+                return "", 204
+            return {
+                "lease_id": new_lease.lease_id,
+                "task": eco.describe_task(new_lease.task),
+                "expires_at": new_lease.expires_at
+            }, 200
+
+        @app.route("/coordinator/leases/<lease_id>/inputs", methods=["GET"])
+        def inputs(lease_id):
+            with self.leases_lock:
+                current_lease = self.leases.get(lease_id)
+            if not current_lease:
+                return {"success": False, "error": "Unknown or expired lease %s" % lease_id}, 404
+            task = current_lease.task
+            archive = pack_paths(task.get_input_paths(), shallow_paths=task.get_shallow_input_paths())
+            return send_file(archive, mimetype="application/gzip")
+
+        @app.route("/coordinator/leases/<lease_id>/heartbeat", methods=["POST"])
+        def heartbeat(lease_id):
+            renewed_lease = self.renew(lease_id)
+            if not renewed_lease:
+                return {"success": False, "error": "Unknown or expired lease %s" % lease_id}, 404
+            return {"success": True, "expires_at": renewed_lease.expires_at}, 200
+
+        @app.route("/coordinator/leases/<lease_id>/complete", methods=["POST"])
+        def complete(lease_id):
+            status = TaskStatus[request.form["status"]]
+            archive = request.files.get("artifacts")
+            if not self.complete(lease_id, status, archive.stream if archive else None):
+                return {"success": False, "error": "Unknown or expired lease %s" % lease_id}, 404
+            return {"success": True}, 200
+
+        return app
+
+    def start(self):
+        host, port = self.host, self.port
+        self.server = make_server(host, port, self.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, name="Coordinator", daemon=True).start()
+        logger.info("Coordinator", "Listening for workers on %s:%d" % (host, port))
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+
+
+# Runs the tasks leased from a coordinator; the coordinator's callbacks, rather than this task manager's, react to
+# finished tasks
+class WorkerTaskManager(TaskManager):
+    def __init__(self, coordinator_url, max_parallel_tasks, resource_capacities: Dict[str, float]):
+        TaskManager.__init__(self, max_parallel_tasks, lambda: None, resource_capacities=resource_capacities)
+        self.coordinator_url = coordinator_url
+        self.worker_name = "%s-%d" % (socket.gethostname(), os.getpid())
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = "Bearer %s" % get_token()
+        self.leases: Dict[str, dict] = {}
+        self.leases_lock = threading.Lock()
+
+    def get_lease_url(self, lease: dict, action):
+        return "%scoordinator/leases/%s/%s" % (self.coordinator_url, lease["lease_id"], action)
+
+    def request_lease(self) -> dict:
+        # one request at a time, so that concurrent threads do not claim the same free resources
+        with self.leases_lock:
+            body = {
+                "worker": self.worker_name,
+                "capacities": self.resource_pool.capacities,
+                "used": self.resource_pool.get_used()
+            }
+            response = self.session.post(self.coordinator_url + "coordinator/leases", json=body,
+                                         timeout=Globals.DISTRIBUTED_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            if response.status_code == 204:
+                return None
+            lease = response.json()
+            lease["task"] = eco.build_task(lease["task"])
+            self.resource_pool.acquire(lease["task"].get_resource_demands())
+            self.leases[lease["task"].task_id] = lease
+            return lease
+
+    def download_inputs(self, lease: dict):
+        response = self.session.get(self.get_lease_url(lease, "inputs"), stream=True,
+                                    timeout=Globals.DISTRIBUTED_REQUEST_TIMEOUT)
+        response.raise_for_status()
+        with tempfile.TemporaryFile() as archive:
+            for chunk in response.iter_content(Globals.DISTRIBUTED_CHUNK_SIZE):
+                archive.write(chunk)
+            archive.seek(0)
+            task = lease["task"]
+            unpack_paths(archive, task.get_input_paths(), task.get_shallow_input_paths())
+
+    def complete_lease(self, lease: dict, status: TaskStatus):
+        task = lease["task"]
+        files = {}
+        if status == TaskStatus.Completed:
+            files["artifacts"] = ("artifacts.tar.gz", pack_paths(task.get_output_paths(), lease["started_at"]),
+                                  "application/gzip")
+        try:
+            response = self.session.post(self.get_lease_url(lease, "complete"), data={"status": status.name},
+                                         files=files, timeout=Globals.DISTRIBUTED_REQUEST_TIMEOUT)
+            if response.status_code == 404:
+                logger.warn("Worker", "Lease on task ID = %s expired, its results were dropped" % task.task_id)
+            else:
+                response.raise_for_status()
+        finally:
+            for _, archive, _ in files.values():
+                archive.close()
+
+    def get_available_task(self, resource_pool: ResourcePool = None) -> Task:
+        try:
+            lease = self.request_lease()
+        except (requests.RequestException, ValueError) as e:
+            logger.error("Worker", "Could not lease a task from %s: %s" % (self.coordinator_url, e))
+            return None
+        if not lease:
+            return None
+        task = lease["task"]
+        try:
+            self.download_inputs(lease)
+        except BaseException as e:
+            logger.error("Worker", "Could not download the inputs of task ID = %s: %s" % (task.task_id, e))
+            self.resource_pool.release(task.get_resource_demands())
+            self.task_finished(task, 0)
+            return None
+        lease["started_at"] = time.time()
+        task.status = TaskStatus.Taken
+        return task
+
+    def task_finished(self, task: Task, seconds: float):
+        with self.leases_lock:
+            lease = self.leases.pop(task.task_id)
+        status = task.status if task.status in [TaskStatus.Completed, TaskStatus.Failed] else TaskStatus.Failed
+        try:
+            self.complete_lease(lease, status)
+        except requests.RequestException as e:
+            logger.error("Worker", "Could not report task ID = %s to %s: %s" % (task.task_id, self.coordinator_url, e))
+
+    def heartbeat(self):
+        with self.leases_lock:
+            leases = list(self.leases.values())
+        for lease in leases:
+            try:
+                response = self.session.post(self.get_lease_url(lease, "heartbeat"),
+                                             timeout=Globals.DISTRIBUTED_REQUEST_TIMEOUT)
+                if response.status_code == 404:
+                    logger.warn("Worker", "Lease on task ID = %s expired" % lease["task"].task_id)
+            except requests.RequestException as e:
+                logger.error("Worker", "Could not renew the lease on task ID = %s: %s" % (lease["task"].task_id, e))
+
+
+def run_worker(coordinator_url, worker_index, stopping: threading.Event):
+    worker = WorkerTaskManager(coordinator_url, Globals.TASK_MANAGER_MAX_THREADS,
+                               Globals.TASK_MANAGER_RESOURCE_CAPACITIES)
+    # local workers sharing a host each get their own range of displays
+    worker.display_offset = worker_index * Globals.TASK_MANAGER_MAX_THREADS
+    logger.info("Worker", "Worker %s leasing tasks from %s" % (worker.worker_name, coordinator_url))
+    while not stopping.is_set():
+        worker.start()
+        worker.heartbeat()
+        logger.flush()
+        stopping.wait(Globals.DISTRIBUTED_HEARTBEAT_INTERVAL)
+    worker.stop()
+    while worker.thread_info_pool:
+        worker.heartbeat()
+        logger.flush()
+        time.sleep(Globals.DISTRIBUTED_HEARTBEAT_INTERVAL)
+    logger.info("Worker", "Worker %s stopping" % worker.worker_name)
+    logger.flush()
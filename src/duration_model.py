@@ -0,0 +1,66 @@
+import threading
+from collections import deque
+from typing import Dict, Tuple
+
+import numpy as np
+
+from globals import Globals
+
+
+# Historical task durations, keyed by (task type, scenario, mode), with an exponential moving average and a window of
+# recent samples for quantiles; keys never seen fall back to the same task type and mode over all scenarios
+class DurationStats:
+    def __init__(self):
+        self.count = 0
+        self.ema = None
+        self.samples = deque(maxlen=Globals.DURATION_MODEL_WINDOW)
+
+    def add(self, seconds: float):
+        alpha = Globals.DURATION_MODEL_EMA_ALPHA
+        self.ema = seconds if self.ema is None else alpha * seconds + (1 - alpha) * self.ema
+        self.count += 1
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        return float(np.quantile(np.asarray(self.samples), q))
+
+
+class DurationModel:
+    def __init__(self, task_store=None):
+        self.stats: Dict[Tuple, DurationStats] = {}
+        self.lock = threading.Lock()
+        self.task_store = task_store
+        if task_store:
+            for key, seconds in task_store.load_durations():
+                self.add(key, seconds)
+
+    @staticmethod
+    def get_keys(key: Tuple):
+        task_type, _, mode = key
+        return [key, (task_type, None, mode)]
+
+    def add(self, key: Tuple, seconds: float):
+        for k in DurationModel.get_keys(key):
+            self.stats.setdefault(k, DurationStats()).add(seconds)
+
+    def record(self, key: Tuple, seconds: float):
+        with self.lock:
+            self.add(key, seconds)
+        if self.task_store:
+            self.task_store.save_duration(key, seconds)
+
+    def get_stats(self, key: Tuple, min_samples=1) -> DurationStats:
+        for k in DurationModel.get_keys(key):
+            if k in self.stats and self.stats[k].count >= min_samples:
+                return self.stats[k]
+        return None
+
+    def estimate(self, key: Tuple, default: float) -> float:
+        with self.lock:
+            stats = self.get_stats(key)
+            return stats.ema if stats else default
+
+    def quantile(self, key: Tuple, q: float, default: float, min_samples=1) -> float:
+        with self.lock:
+            stats = self.get_stats(key, min_samples)
+            return stats.quantile(q) if stats else default
@@ -1,23 +1,48 @@
+import math
 import os
 import shutil
 import threading
+import time
+from datetime import datetime
 from subprocess import STDOUT, PIPE, TimeoutExpired
-from typing import Dict, Callable, List, Tuple
+from typing import Callable, Dict, List, Tuple
 
+import process_monitor
 import utils
+from artifact_store import artifacts
 from globals import Globals
 from logger import logger
+from process_monitor import ProcessStalled
 
-if not utils.is_module_available("ecorouting"):
-    module = utils.import_module(os.path.join(Globals.ECOROUTING_DIR, "testcases.py"), "testcases")
-    testcases = getattr(module, "testcases")
-else:
-    from ecorouting.testcases import testcases
+from scenario_catalog import catalog, ScenarioSolution
 from spopen import SPopen
-from task import Task, TaskStatus, TaskManager, TaskDependency, TaskRunMode
+from task import Task, TaskStatus, TaskManager, TaskRunMode, ResourcePool
+from workspace import Workspace, WorkspaceTemplate
 
+# the trees the isolated task workspaces are staged from, with the files of them the tasks write to before their
+# processes start (the Video task adds snapshots to the GUI settings)
+ECOROUTING_WORKSPACE = WorkspaceTemplate("EcoRouting", [Globals.ECOROUTING_DIR],
+                                         [Globals.ECOROUTING_ADDITIONAL_FILES_FILE_NAME,
+                                          Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME])
+ECO_INDICATOR_WORKSPACE = WorkspaceTemplate("EcoIndicator", [Globals.TEMA_DIR])
+HEATMAPS_WORKSPACE = WorkspaceTemplate("Heatmaps", [Globals.TEMA_DIR, Globals.MATLAB_LIB_DIR])
+WORKSPACE_TEMPLATES = [ECOROUTING_WORKSPACE, ECO_INDICATOR_WORKSPACE, HEATMAPS_WORKSPACE]
 
-file_copy_lock = threading.RLock()
+
+def stage_workspace(task: Task, template: WorkspaceTemplate) -> Workspace:
+    # a workspace leased from the pool is already staged from the template, and is reset once given back
+    if task.workspace:
+        return task.workspace
+    utils.ensure_dir_exists(task.cwd)
+    utils.clear_dir(task.cwd)
+    workspace = Workspace(task.cwd, task.__class__.__name__)
+    workspace.stage_template(template)
+    return workspace
+
+
+def remove_workspace(task: Task):
+    if task.workspace is None:
+        utils.clear_and_remove_dir(task.cwd)
 
 
 class EcoRoutingMode:
@@ -36,8 +61,8 @@ class EcoRoutingMode:
         raise NotImplementedError
 
     def get_net_file(self, scenario) -> Tuple[str, str]:
-        tc = get_test_cases()[scenario]
-        return (tc["ifolder"], tc["netfile"])
+        info = catalog.get(scenario)
+        return (info.input_dir, info.net_file)
 
     def get_TEMA_route_file(self, scenario):
         raise NotImplementedError
@@ -45,49 +70,51 @@ class EcoRoutingMode:
     def get_TEMA_res_file(self, scenario):
         raise NotImplementedError
 
-    def run_ecorouting(self, process: SPopen):
+    def run_ecorouting(self, process: SPopen, timeout, inactivity_timeout):
         # TODO: Detect return code from Popen process, and if it is not 0 the task MUST be considered as status = Failed
         #       If the task has failed, additionally, the EcoRouting output directory MUST be removed
         raise NotImplementedError
 
-    def run_eco_indicator(self, process: SPopen):
+    def run_eco_indicator(self, process: SPopen, timeout, inactivity_timeout):
         logger.debug("TEMA", "[Eco-Indicator] starting Popen process")
         with EcoRoutingMode.TEMA_lock:
             eco_ind_proc = process.start()
         logger.debug("TEMA", "[Eco-Indicator] started Popen process")
         try:
             logger.debug("TEMA", "[Eco-Indicator] waiting for eco_ind_proc.communicate()")
-            out = eco_ind_proc.communicate(timeout=Globals.TASK_MANAGER_MAX_TIMEOUT)
+            out = process_monitor.communicate(eco_ind_proc, timeout=timeout, inactivity_timeout=inactivity_timeout)
             logger.debug("TEMA", "[Eco-Indicator] eco_ind_proc.communicate() finished")
             logger.info("TEMA", out[0].decode().rstrip())
         except BaseException as e:
-            if isinstance(e, TimeoutExpired):
-                timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
-                logger.info("TEMA", "TEMA Eco-Indicator process exceeded %d seconds, and will be terminated" % timeout)
+            if isinstance(e, ProcessStalled):
+                logger.info("TEMA", "TEMA Eco-Indicator process stalled for %d seconds, and was terminated" % e.timeout)
+            elif isinstance(e, TimeoutExpired):
+                logger.info("TEMA", "TEMA Eco-Indicator process exceeded %d seconds, and was terminated" % e.timeout)
             raise
         finally:
             logger.debug("TEMA", "[Eco-Indicator] terminating Popen process")
-            eco_ind_proc.terminate()
+            process_monitor.kill_process_group(eco_ind_proc)
             logger.debug("TEMA", "[Eco-Indicator] terminated Popen process")
 
-    def run_heatmaps(self, process: SPopen):
+    def run_heatmaps(self, process: SPopen, timeout, inactivity_timeout):
         logger.debug("TEMA", "[Heatmaps] starting Popen process")
         with EcoRoutingMode.TEMA_lock:
             heatmaps_proc = process.start()
         logger.debug("TEMA", "[Heatmaps] started Popen process")
         try:
             logger.debug("TEMA", "[Heatmaps] waiting for heatmaps_proc.communicate()")
-            out = heatmaps_proc.communicate(timeout=Globals.TASK_MANAGER_MAX_TIMEOUT)
+            out = process_monitor.communicate(heatmaps_proc, timeout=timeout, inactivity_timeout=inactivity_timeout)
             logger.debug("TEMA", "[Heatmaps] heatmaps_proc.communicate() finished")
             logger.info("TEMA", out[0].decode().rstrip())
         except BaseException as e:
-            if isinstance(e, TimeoutExpired):
-                timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
-                logger.info("TEMA", "TEMA Heatmaps process exceeded %d seconds, and will be terminated" % timeout)
+            if isinstance(e, ProcessStalled):
+                logger.info("TEMA", "TEMA Heatmaps process stalled for %d seconds, and was terminated" % e.timeout)
+            elif isinstance(e, TimeoutExpired):
+                logger.info("TEMA", "TEMA Heatmaps process exceeded %d seconds, and was terminated" % e.timeout)
             raise
         finally:
             logger.debug("TEMA", "[Heatmaps] terminating Popen process")
-            heatmaps_proc.terminate()
+            process_monitor.kill_process_group(heatmaps_proc)
             logger.debug("TEMA", "[Heatmaps] terminated Popen process")
 
 
@@ -96,54 +123,38 @@ class Base(EcoRoutingMode):
         return True
 
     def get_TEMA_files(self, scenario) -> List[Tuple[str, str]]:
-        tc = get_test_cases()[scenario]
-        period = tc["period"]
-        location = tc["location"]
-        file_rou = "%s-base.rou.xml" % tc["bname"]
-        file_route_veh = Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME
-        file_all_veh = Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME
-        file_noise = Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME
-        return [
-            (file_rou, self.get_TEMA_route_file(scenario)),
-            (file_route_veh, utils.convert_base_file_name_to_TEMA_spec(file_route_veh, period, location)),
-            (file_all_veh, utils.convert_base_file_name_to_TEMA_spec(file_all_veh, period, location)),
-            (file_noise, utils.convert_base_file_name_to_TEMA_spec(file_noise, period, location))
-        ]
+        return catalog.get(scenario).base_TEMA_files
 
     def get_additional_args(self):
         return ["--mode", "1"]
 
     def get_output_dir(self, scenario):
-        tc = get_test_cases()[scenario]
-        return os.path.join(tc["ofolder"], "inputdata")
+        return catalog.get(scenario).base_output_dir
 
     def get_TEMA_route_file(self, scenario):
-        tc = get_test_cases()[scenario]
-        return utils.get_base_route_file_name_per_TEMA_spec(tc["period"])
+        return catalog.get(scenario).base_TEMA_route_file
 
     def get_TEMA_res_file(self, scenario):
-        tc = get_test_cases()[scenario]
-        period = tc["period"]
-        location = tc["location"]
-        return utils.get_base_res_file_name_per_TEMA_spec(period, location)
+        return catalog.get(scenario).base_TEMA_res_file
 
-    def run_ecorouting(self, process: SPopen):
+    def run_ecorouting(self, process: SPopen, timeout, inactivity_timeout):
         logger.debug("EcoRouting", "[Base] starting Popen process")
         eco_proc = process.start()
         logger.debug("EcoRouting", "[Base] started Popen process")
         try:
             logger.debug("EcoRouting", "[Base] waiting for eco_proc.communicate()")
-            out = eco_proc.communicate(timeout=Globals.TASK_MANAGER_MAX_TIMEOUT)
+            out = process_monitor.communicate(eco_proc, timeout=timeout, inactivity_timeout=inactivity_timeout)
             logger.debug("EcoRouting", "[Base] eco_proc.communicate() finished")
             logger.info("EcoRouting", out[0].decode().rstrip())
         except BaseException as e:
-            if isinstance(e, TimeoutExpired):
-                timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
-                logger.info("EcoRouting", "EcoRouting Base process exceeded %d seconds, and will be terminated" % timeout)
+            if isinstance(e, ProcessStalled):
+                logger.info("EcoRouting", "EcoRouting Base process stalled for %d seconds, and was terminated" % e.timeout)
+            elif isinstance(e, TimeoutExpired):
+                logger.info("EcoRouting", "EcoRouting Base process exceeded %d seconds, and was terminated" % e.timeout)
             raise
         finally:
             logger.debug("EcoRouting", "[Base] terminating Popen process")
-            eco_proc.terminate()
+            process_monitor.kill_process_group(eco_proc)
             logger.debug("EcoRouting", "[Base] terminated Popen process")
 
 
@@ -158,23 +169,28 @@ class Pred(EcoRoutingMode):
     def get_additional_args(self):
         return ["--mode", "2", "--obj1", self.objective1, "--obj2", self.objective2]
 
-    def run_ecorouting(self, process: SPopen):
+    def get_output_dir(self, scenario):
+        return catalog.get(scenario).get_objectives_dir(self.objective1, self.objective2)
+
+    def run_ecorouting(self, process: SPopen, timeout, inactivity_timeout):
         logger.debug("EcoRouting", "[Pred] starting Popen process")
         eco_proc = process.start()
         logger.debug("EcoRouting", "[Pred] started Popen process")
         try:
             logger.debug("EcoRouting", "[Pred] waiting for eco_proc.communicate(-1)")
-            out = eco_proc.communicate(input=b"-1\n", timeout=Globals.TASK_MANAGER_MAX_TIMEOUT)
+            out = process_monitor.communicate(eco_proc, input=b"-1\n", timeout=timeout,
+                                              inactivity_timeout=inactivity_timeout)
             logger.debug("EcoRouting", "[Pred] eco_proc.communicate(-1) finished")
             logger.info("EcoRouting", out[0].decode().rstrip())
         except BaseException as e:
-            if isinstance(e, TimeoutExpired):
-                timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
-                logger.info("EcoRouting", "EcoRouting Pred process exceeded %d seconds, and will be terminated" % timeout)
+            if isinstance(e, ProcessStalled):
+                logger.info("EcoRouting", "EcoRouting Pred process stalled for %d seconds, and was terminated" % e.timeout)
+            elif isinstance(e, TimeoutExpired):
+                logger.info("EcoRouting", "EcoRouting Pred process exceeded %d seconds, and was terminated" % e.timeout)
             raise
         finally:
             logger.debug("EcoRouting", "[Pred] terminating Popen process")
-            eco_proc.terminate()
+            process_monitor.kill_process_group(eco_proc)
             logger.debug("EcoRouting", "[Pred] terminated Popen process")
 
 
@@ -186,55 +202,40 @@ class Sim(Pred):
     def can_generate_TEMA_data(self):
         return True
 
+    def get_solution_info(self, scenario) -> ScenarioSolution:
+        return catalog.get(scenario).get_solution(self.objective1, self.objective2, self.solution)
+
     def get_TEMA_files(self, scenario) -> List[Tuple[str, str]]:
-        tc = get_test_cases()[scenario]
-        period = tc["period"]
-        location = tc["location"]
-        file_rou = "%s.rou.xml" % tc["bname"]
-        file_route_veh = Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME
-        file_all_veh = Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME
-        file_noise = Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME
-        return [
-            (file_rou, self.get_TEMA_route_file(scenario)),
-            (file_route_veh, utils.convert_sim_file_name_to_TEMA_spec(file_route_veh, period, location, self.solution)),
-            (file_all_veh, utils.convert_sim_file_name_to_TEMA_spec(file_all_veh, period, location, self.solution)),
-            (file_noise, utils.convert_sim_file_name_to_TEMA_spec(file_noise, period, location, self.solution))
-        ]
+        return self.get_solution_info(scenario).TEMA_files
 
     def get_output_dir(self, scenario):
-        tc = get_test_cases()[scenario]
-        objectives = utils.format_objective_names(self.objective1, self.objective2)
-        return os.path.join(tc["ofolder"], objectives, "solution%d" % self.solution)
+        return self.get_solution_info(scenario).output_dir
 
     def get_TEMA_route_file(self, scenario):
-        tc = get_test_cases()[scenario]
-        period = tc["period"]
-        location = tc["location"]
-        return utils.get_sim_route_file_name_per_TEMA_spec(tc["bname"], period, location, self.solution)
+        return self.get_solution_info(scenario).TEMA_route_file
 
     def get_TEMA_res_file(self, scenario):
-        tc = get_test_cases()[scenario]
-        period = tc["period"]
-        location = tc["location"]
-        return utils.get_sim_res_file_name_per_TEMA_spec(period, location, self.solution)
+        return self.get_solution_info(scenario).TEMA_res_file
 
-    def run_ecorouting(self, process: SPopen):
+    def run_ecorouting(self, process: SPopen, timeout, inactivity_timeout):
         logger.debug("EcoRouting", "[Sim] starting Popen process")
         eco_proc = process.start()
         logger.debug("EcoRouting", "[Sim] started Popen process")
         try:
             logger.debug("EcoRouting", "[Sim] waiting for eco_proc.communicate(%d\\n-1\\n)" % self.solution)
-            out = eco_proc.communicate(input=b"%d\n-1\n" % self.solution, timeout=Globals.TASK_MANAGER_MAX_TIMEOUT)
+            out = process_monitor.communicate(eco_proc, input=b"%d\n-1\n" % self.solution, timeout=timeout,
+                                              inactivity_timeout=inactivity_timeout)
             logger.debug("EcoRouting", "[Sim] eco_proc.communicate(%d\\n-1\\n) finished" % self.solution)
             logger.info("EcoRouting", out[0].decode().rstrip())
         except BaseException as e:
-            if isinstance(e, TimeoutExpired):
-                timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
-                logger.info("EcoRouting", "EcoRouting Sim process exceeded %d seconds, and will be terminated" % timeout)
+            if isinstance(e, ProcessStalled):
+                logger.info("EcoRouting", "EcoRouting Sim process stalled for %d seconds, and was terminated" % e.timeout)
+            elif isinstance(e, TimeoutExpired):
+                logger.info("EcoRouting", "EcoRouting Sim process exceeded %d seconds, and was terminated" % e.timeout)
             raise
         finally:
             logger.debug("EcoRouting", "[Sim] terminating Popen process")
-            eco_proc.terminate()
+            process_monitor.kill_process_group(eco_proc)
             logger.debug("EcoRouting", "[Sim] terminated Popen process")
 
 
@@ -250,19 +251,40 @@ class EcoRoutingTask(Task):
     def get_display_mode(self) -> TaskRunMode:
         return TaskRunMode.Default
 
+    def get_resource_demands(self) -> Dict[str, float]:
+        return {"cpu": 1, "memory": 1024}
+
     def get_cmd(self):
         return ["python", "main-interactive.py", "-t", self.scenario, *self.mode.get_additional_args()]
 
+    def get_workspace_template(self) -> WorkspaceTemplate:
+        return ECOROUTING_WORKSPACE
+
+    def get_input_paths(self) -> List[str]:
+        if type(self.mode) is Base:
+            return []
+        return [catalog.get(self.scenario).base_output_dir]
+
+    def get_shallow_input_paths(self) -> List[str]:
+        # the Pred files of the pair, without the solution directories of the other Sims
+        if type(self.mode) is Sim:
+            return [Pred.get_output_dir(self.mode, self.scenario)]
+        return []
+
+    def get_output_paths(self) -> List[str]:
+        if type(self.mode) is Base:
+            return [catalog.get(self.scenario).output_dir]
+        return [Pred.get_output_dir(self.mode, self.scenario)]
+
     def before(self):
         if self.cwd != os.getcwd():
-            utils.ensure_dir_exists(self.cwd)
-            utils.clear_dir(self.cwd)
-            with file_copy_lock:
-                utils.copy_dir_contents(Globals.ECOROUTING_DIR, self.cwd)
+            workspace = stage_workspace(self, ECOROUTING_WORKSPACE)
             if self.mode.can_generate_TEMA_data():
-                src = os.path.join(get_test_cases()[self.scenario]["ifolder"], Globals.TEMA_ADDITIONAL_FILES_FILE_NAME)
+                src = catalog.get(self.scenario).TEMA_additional_file_path
                 dst = os.path.join(self.cwd, Globals.ECOROUTING_ADDITIONAL_FILES_FILE_NAME)
+                workspace.materialize(dst)
                 utils.merge_additional_files_content(src, dst, [Globals.SUMO_EDGE_DATA_XML_TAG])
+            workspace.report()
 
     def start(self):
         if self.cwd == os.getcwd() or self.cwd == Globals.ECOROUTING_DIR:
@@ -270,15 +292,17 @@ class EcoRoutingTask(Task):
             self.status = TaskStatus.Failed
             return
         cmd = self.get_cmd()
-        eco_proc = SPopen(cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+        eco_proc = SPopen(cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
+                          start_new_session=True)
         print_info = (self.task_id, self.cwd, cmd)
         logger.info("EcoRouting", "Started EcoRouting process (task ID = %s | cwd = %s | cmd = %s)" % print_info)
         self.status = TaskStatus.Starting
         self.before()
         self.status = TaskStatus.Running
         try:
-            self.mode.run_ecorouting(eco_proc)
+            self.mode.run_ecorouting(eco_proc, self.timeout, self.inactivity_timeout)
         except BaseException as e:
+            self.retryable = isinstance(e, ProcessStalled)
             logger.error("EcoRouting", "Error in task ID = %s: %s" % (self.task_id, e))
             self.status = TaskStatus.Failed
         if self.status != TaskStatus.Failed:
@@ -289,24 +313,116 @@ class EcoRoutingTask(Task):
         print_info = (self.task_id, self.status.name, self.cwd, cmd)
         logger.info("EcoRouting", "Terminated EcoRouting process (task ID = %s | status = %s | cwd = %s | cmd = %s)" % print_info)
 
+    def collect_TEMA_data(self, out_dir):
+        for file_name in [Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME,
+                          Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME,
+                          Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME]:
+            edge_data = os.path.join(self.cwd, file_name)
+            if os.path.exists(edge_data) and os.path.isfile(edge_data):
+                artifacts.publish(edge_data, os.path.join(out_dir, file_name), move=True)
+
     def after(self):
         if self.cwd != os.getcwd():
             if self.mode.can_generate_TEMA_data():
-                out_dir = self.mode.get_output_dir(self.scenario)
-                all_veh_edge_data = os.path.join(self.cwd, Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME)
-                with file_copy_lock:
-                    if os.path.exists(all_veh_edge_data) and os.path.isfile(all_veh_edge_data):
-                        dst = os.path.join(out_dir, Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME)
-                        shutil.copyfile(all_veh_edge_data, dst)
-                    routing_veh_edge_data = os.path.join(self.cwd, Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME)
-                    if os.path.exists(routing_veh_edge_data) and os.path.isfile(routing_veh_edge_data):
-                        dst = os.path.join(out_dir, Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME)
-                        shutil.copyfile(routing_veh_edge_data, dst)
-                    noise_edge_data = os.path.join(self.cwd, Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME)
-                    if os.path.exists(noise_edge_data) and os.path.isfile(noise_edge_data):
-                        dst = os.path.join(out_dir, Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME)
-                        shutil.copyfile(noise_edge_data, dst)
-            utils.clear_and_remove_dir(self.cwd)
+                self.collect_TEMA_data(self.mode.get_output_dir(self.scenario))
+            remove_workspace(self)
+
+
+# Several Sim solutions of the same scenario and objective pair, run one after the other by a single EcoRouting process
+# so that the network and the predictive model are only loaded once
+# Each solution number is written to the process once the previous solution has been simulated, i.e. once a new sim.ev
+# file is in its solution directory, and its TEMA data is then moved from the workspace to its solution directory
+class EcoRoutingBatchTask(EcoRoutingTask):
+    def __init__(self, tasks: List[EcoRoutingTask]):
+        EcoRoutingTask.__init__(self, "%s_batch%d" % (tasks[0].task_id, len(tasks)), tasks[0].scenario, tasks[0].mode)
+        self.tasks = tasks
+        self.on_task_finished: Callable[[Task, float], None] = None
+
+    def is_simulated(self, task: EcoRoutingTask, since: float) -> bool:
+        sim_dir = task.mode.get_output_dir(self.scenario)
+        if not os.path.isdir(sim_dir):
+            return False
+        for file in os.listdir(sim_dir):
+            if file.endswith("sim.ev") and os.path.getmtime(os.path.join(sim_dir, file)) >= since:
+                return True
+        return False
+
+    def run_solutions(self, process: SPopen):
+        eco_proc = process.start()
+        monitor = process_monitor.ProcessMonitor(eco_proc, self.timeout, self.inactivity_timeout)
+        try:
+            for task in self.tasks:
+                task.started_at = datetime.now()
+                task.status = TaskStatus.Running
+                since = time.time()
+                logger.debug("EcoRouting", "[SimBatch] writing solution %d" % task.mode.solution)
+                monitor.write(b"%d\n" % task.mode.solution)
+                monitor.reset_timeout()
+                if not monitor.wait_until(lambda: self.is_simulated(task, since), Globals.WAIT_MILLIS / 1000):
+                    raise ChildProcessError("EcoRouting exited before simulating solution %d" % task.mode.solution)
+                task.status = TaskStatus.Completing
+                self.collect_TEMA_data(task.mode.get_output_dir(self.scenario))
+                task.status = TaskStatus.Completed
+                if self.on_task_finished:
+                    self.on_task_finished(task, (datetime.now() - task.started_at).total_seconds())
+            monitor.write(b"-1\n", close=True)
+            logger.info("EcoRouting", monitor.wait().decode().rstrip())
+        except BaseException as e:
+            logger.info("EcoRouting", monitor.get_output().decode().rstrip())
+            if isinstance(e, ProcessStalled):
+                print_msg = "EcoRouting Sim batch process stalled for %d seconds, and was terminated" % e.timeout
+                logger.info("EcoRouting", print_msg)
+            elif isinstance(e, TimeoutExpired):
+                print_msg = "EcoRouting Sim batch process exceeded %d seconds, and was terminated" % e.timeout
+                logger.info("EcoRouting", print_msg)
+            raise
+        finally:
+            process_monitor.kill_process_group(eco_proc)
+
+    def start(self):
+        if self.cwd == os.getcwd() or self.cwd == Globals.ECOROUTING_DIR:
+            logger.error("EcoRouting", "EcoRoutingBatchTask task ID = %s is set for cwd %s" % (self.task_id, self.cwd))
+            self.status = TaskStatus.Failed
+            for task in self.tasks:
+                task.status = TaskStatus.Failed
+            return
+        cmd = self.get_cmd()
+        eco_proc = SPopen(cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
+                          start_new_session=True)
+        solutions = [task.mode.solution for task in self.tasks]
+        print_info = (self.task_id, self.cwd, cmd, solutions)
+        logger.info("EcoRouting", "Started EcoRouting process (task ID = %s | cwd = %s | cmd = %s | solutions = %s)"
+                    % print_info)
+        for task in self.tasks:
+            task.cwd = self.cwd
+        self.status = TaskStatus.Starting
+        self.tasks[0].status = TaskStatus.Starting
+        self.before()
+        self.status = TaskStatus.Running
+        try:
+            self.run_solutions(eco_proc)
+        except BaseException as e:
+            logger.error("EcoRouting", "Error in task ID = %s: %s" % (self.task_id, e))
+            self.status = TaskStatus.Failed
+            # the solution being simulated failed, and those after it are given back to the task manager
+            for task in self.tasks:
+                if task.status in [TaskStatus.Running, TaskStatus.Completing]:
+                    task.retryable = isinstance(e, ProcessStalled)
+                    task.status = TaskStatus.Failed
+                elif task.status in [TaskStatus.Taken, TaskStatus.Starting]:
+                    task.status = TaskStatus.Available
+        if self.status != TaskStatus.Failed:
+            self.status = TaskStatus.Completing
+        self.after()
+        if self.status != TaskStatus.Failed:
+            self.status = TaskStatus.Completed
+        print_info = (self.task_id, self.status.name, self.cwd, cmd)
+        logger.info("EcoRouting", "Terminated EcoRouting process (task ID = %s | status = %s | cwd = %s | cmd = %s)"
+                    % print_info)
+
+    def after(self):
+        if self.cwd != os.getcwd():
+            remove_workspace(self)
 
 
 class EcoRoutingVideoTask(EcoRoutingTask):
@@ -317,9 +433,16 @@ class EcoRoutingVideoTask(EcoRoutingTask):
     def get_display_mode(self) -> TaskRunMode:
         return TaskRunMode.Isolated
 
+    def get_resource_demands(self) -> Dict[str, float]:
+        return {"cpu": 1, "display": 1, "memory": 2048}
+
     def get_cmd(self):
         return EcoRoutingTask.get_cmd(self) + ["--gui"]
 
+    def get_output_paths(self) -> List[str]:
+        gztar_file = "%s.%s" % (self.video_name, Globals.VIDEOS_TARGZ_FILE_TYPE)
+        return EcoRoutingTask.get_output_paths(self) + [os.path.join(Globals.VIDEOS_TARGZ_DIR, gztar_file)]
+
     def before(self):
         EcoRoutingTask.before(self)
         utils.add_snapshots_to_gui_settings(self.cwd)
@@ -369,16 +492,26 @@ class TEMAEcoIndicatorTask(Task):
     def get_display_mode(self) -> TaskRunMode:
         return TaskRunMode.Default
 
+    def get_resource_demands(self) -> Dict[str, float]:
+        return {"cpu": 1, "matlab": 1, "memory": 2048}
+
+    def get_input_paths(self) -> List[str]:
+        return [self.mode.get_output_dir(self.scenario)]
+
+    def get_output_paths(self) -> List[str]:
+        return [self.mode.get_output_dir(self.scenario)]
+
+    def get_workspace_template(self) -> WorkspaceTemplate:
+        return ECO_INDICATOR_WORKSPACE
+
     def before(self):
         if self.cwd != os.getcwd():
-            utils.ensure_dir_exists(self.cwd)
-            utils.clear_dir(self.cwd)
-            with file_copy_lock:
-                utils.copy_dir_contents(Globals.TEMA_DIR, self.cwd)
-                for file_src, file_dst in self.mode.get_TEMA_files(self.scenario):
-                    src_path = os.path.join(self.mode.get_output_dir(self.scenario), file_src)
-                    dst_path = os.path.join(self.cwd, file_dst)
-                    shutil.copyfile(src_path, dst_path)
+            workspace = stage_workspace(self, ECO_INDICATOR_WORKSPACE)
+            for file_src, file_dst in self.mode.get_TEMA_files(self.scenario):
+                src_path = os.path.join(self.mode.get_output_dir(self.scenario), file_src)
+                dst_path = os.path.join(self.cwd, file_dst)
+                workspace.link_file(src_path, dst_path)
+            workspace.report()
 
     def start(self):
         if self.cwd == os.getcwd() or self.cwd == Globals.ECOROUTING_DIR:
@@ -386,7 +519,8 @@ class TEMAEcoIndicatorTask(Task):
             self.status = TaskStatus.Failed
             return
         eco_ind_cmd = ["./eco_indicator"]
-        eco_ind_proc = SPopen(eco_ind_cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+        eco_ind_proc = SPopen(eco_ind_cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
+                              start_new_session=True)
         logger.info("TEMA", "Started TEMA process (task ID = %s | cwd = %s)" % (self.task_id, self.cwd))
         self.status = TaskStatus.Starting
         self.before()
@@ -394,9 +528,10 @@ class TEMAEcoIndicatorTask(Task):
         try:
             print_info = (self.task_id, self.cwd, eco_ind_cmd)
             logger.info("TEMA", "Started TEMA Eco-Indicator process (task ID = %s | cwd = %s | cmd = %s)" % print_info)
-            self.mode.run_eco_indicator(eco_ind_proc)
+            self.mode.run_eco_indicator(eco_ind_proc, self.timeout, self.inactivity_timeout)
             logger.info("TEMA", "Terminated TEMA Eco-Indicator process (task ID = %s | cwd = %s | cmd = %s)" % print_info)
         except BaseException as e:
+            self.retryable = isinstance(e, ProcessStalled)
             logger.error("TEMA", "Error in task ID = %s: %s" % (self.task_id, e))
             self.status = TaskStatus.Failed
         if self.status != TaskStatus.Failed:
@@ -412,11 +547,12 @@ class TEMAEcoIndicatorTask(Task):
             res_file = self.mode.get_TEMA_res_file(self.scenario)
             if res_file in os.listdir(self.cwd):
                 out_dir = self.mode.get_output_dir(self.scenario)
-                shutil.move(os.path.join(self.cwd, res_file), os.path.join(out_dir, Globals.TEMA_RESULTS_FILE_NAME))
+                artifacts.publish(os.path.join(self.cwd, res_file), os.path.join(out_dir, Globals.TEMA_RESULTS_FILE_NAME),
+                                  move=True)
             else:
                 logger.error("TEMA", "Results file %s not found in %s" % (res_file, self.cwd))
                 self.status = TaskStatus.Failed
-            utils.clear_and_remove_dir(self.cwd)
+            remove_workspace(self)
 
 
 class TEMAHeatmapsTask(Task):
@@ -432,22 +568,31 @@ class TEMAHeatmapsTask(Task):
     def get_display_mode(self) -> TaskRunMode:
         return TaskRunMode.Isolated
 
+    def get_resource_demands(self) -> Dict[str, float]:
+        return {"cpu": 1, "display": 1, "matlab": 1, "memory": 3072}
+
+    def get_input_paths(self) -> List[str]:
+        return [self.mode.get_output_dir(self.scenario)]
+
+    def get_output_paths(self) -> List[str]:
+        return [os.path.join(Globals.HEATMAPS_DIR, self.image_dir_name)]
+
+    def get_workspace_template(self) -> WorkspaceTemplate:
+        return HEATMAPS_WORKSPACE
+
     def before(self):
         if self.cwd != os.getcwd():
-            utils.ensure_dir_exists(self.cwd)
-            utils.clear_dir(self.cwd)
-            with file_copy_lock:
-                utils.copy_dir_contents(Globals.TEMA_DIR, self.cwd)
-                utils.copy_dir_contents(Globals.MATLAB_LIB_DIR, self.cwd)
-                net_file_path, net_file = self.mode.get_net_file(self.scenario)
-                shutil.copyfile(os.path.join(net_file_path, net_file), os.path.join(self.cwd, net_file))
-                res_file_src = os.path.join(self.mode.get_output_dir(self.scenario), Globals.TEMA_RESULTS_FILE_NAME)
-                res_file_dst = os.path.join(self.cwd, self.mode.get_TEMA_res_file(self.scenario))
-                shutil.copyfile(res_file_src, res_file_dst)
-                for file_src, file_dst in self.mode.get_TEMA_files(self.scenario):
-                    src_path = os.path.join(self.mode.get_output_dir(self.scenario), file_src)
-                    dst_path = os.path.join(self.cwd, file_dst)
-                    shutil.copyfile(src_path, dst_path)
+            workspace = stage_workspace(self, HEATMAPS_WORKSPACE)
+            net_file_path, net_file = self.mode.get_net_file(self.scenario)
+            workspace.link_file(os.path.join(net_file_path, net_file), os.path.join(self.cwd, net_file))
+            res_file_src = os.path.join(self.mode.get_output_dir(self.scenario), Globals.TEMA_RESULTS_FILE_NAME)
+            res_file_dst = os.path.join(self.cwd, self.mode.get_TEMA_res_file(self.scenario))
+            workspace.link_file(res_file_src, res_file_dst)
+            for file_src, file_dst in self.mode.get_TEMA_files(self.scenario):
+                src_path = os.path.join(self.mode.get_output_dir(self.scenario), file_src)
+                dst_path = os.path.join(self.cwd, file_dst)
+                workspace.link_file(src_path, dst_path)
+            workspace.report()
 
         geometry = "%dx%d" % (Globals.HEATMAPS_RESOLUTION["width"], Globals.HEATMAPS_RESOLUTION["height"])
         display = self.env["DISPLAY"]
@@ -469,7 +614,8 @@ class TEMAHeatmapsTask(Task):
         rou_file = self.mode.get_TEMA_route_file(self.scenario)
         traci_port = str(Globals.TEMA_TRACI_BASE_PORT + int(display.replace(":", "")))
         heatmap_cmd = ["./heatmaps", net_file, rou_file, traci_port]
-        heatmap_proc = SPopen(heatmap_cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT)
+        heatmap_proc = SPopen(heatmap_cmd, cwd=self.cwd, env=self.env, stdout=PIPE, stdin=PIPE, stderr=STDOUT,
+                              start_new_session=True)
         logger.info("TEMA", "Started TEMA process (task ID = %s | cwd = %s)" % (self.task_id, self.cwd))
         self.status = TaskStatus.Starting
         self.before()
@@ -477,9 +623,10 @@ class TEMAHeatmapsTask(Task):
         try:
             print_info = (self.task_id, self.cwd, heatmap_cmd)
             logger.info("TEMA", "Started TEMA Heatmaps process (task ID = %s | cwd = %s | cmd = %s)" % print_info)
-            self.mode.run_heatmaps(heatmap_proc)
+            self.mode.run_heatmaps(heatmap_proc, self.timeout, self.inactivity_timeout)
             logger.info("TEMA", "Terminated TEMA Heatmaps process (task ID = %s | cwd = %s | cmd = %s)" % print_info)
         except BaseException as e:
+            self.retryable = isinstance(e, ProcessStalled)
             logger.error("TEMA", "Error in task ID = %s: %s" % (self.task_id, e))
             self.status = TaskStatus.Failed
         if self.status != TaskStatus.Failed:
@@ -513,189 +660,168 @@ class TEMAHeatmapsTask(Task):
                 logger.error("TEMA", "Found %d heatmap files in %s out of an expected %d" % print_info)
                 utils.clear_and_remove_dir(path_dst)
                 self.status = TaskStatus.Failed
-            utils.clear_and_remove_dir(self.cwd)
+            remove_workspace(self)
 
 
 class EcoRoutingTaskManager(TaskManager):
-    def get_dependency_tree(self, root: TaskDependency, task_list: List[Task]) -> TaskDependency:
-        base_tasks = []
-        base_eco_indicator_tasks = []
-        base_heatmap_tasks = []
-        pred_tasks = []
-        sim_tasks = []
-        sim_eco_indicator_tasks = []
-        sim_heatmap_tasks = []
-        for task in task_list:
-            if isinstance(task, EcoRoutingTask):
-                if type(task.mode) is Base:
-                    base_tasks.append(task)
-                elif type(task.mode) is Pred:
-                    pred_tasks.append(task)
-                elif type(task.mode) is Sim:
-                    sim_tasks.append(task)
-                else:
-                    print_info = (task.mode.__class__.__name__, task.task_id)
-                    logger.warn("TaskManager", "Unknown EcoRoutingMode %s for EcoRoutingTask task ID = %s " % print_info)
-            elif isinstance(task, TEMAEcoIndicatorTask):
-                if type(task.mode) is Base:
-                    base_eco_indicator_tasks.append(task)
-                elif type(task.mode) is Sim:
-                    sim_eco_indicator_tasks.append(task)
-                else:
-                    print_info = (task.mode.__class__.__name__, task.task_id)
-                    logger.warn("TaskManager", "Unknown EcoRoutingMode %s for TEMAEcoIndicatorTask task ID = %s " % print_info)
-            elif isinstance(task, TEMAHeatmapsTask):
-                if type(task.mode) is Base:
-                    base_heatmap_tasks.append(task)
-                elif type(task.mode) is Sim:
-                    sim_heatmap_tasks.append(task)
-                else:
-                    print_info = (task.mode.__class__.__name__, task.task_id)
-                    logger.warn("TaskManager", "Unknown EcoRoutingMode %s for TEMAHeatmapsTask task ID = %s " % print_info)
-            else:
-                print_info = (task.__class__.__name__, task.task_id)
-                logger.warn("TaskManager", "Task %s task ID = %s is not an acceptable subclass of Task" % print_info)
-
-        def find_matching_task_dep(dep_tree: TaskDependency, condition: Callable[[TaskDependency], bool]):
-            res = None
-            if condition(dep_tree):
-                res = dep_tree
-            else:
-                for child in dep_tree.children:
-                    res = find_matching_task_dep(child, condition)
-                    if res:
-                        break
-            return res
-
-        def find_all_matching_task_deps(dep_tree: TaskDependency, condition: Callable[[TaskDependency], bool]):
-            res = []
-            if condition(dep_tree):
-                res.append(dep_tree)
-            for child in dep_tree.children:
-                res.extend(find_all_matching_task_deps(child, condition))
-            return res
-
-        for base_task in base_tasks:
-            base_task_dep = TaskDependency(base_task)
-            root.add_child(base_task_dep)
-
-        for base_eco_indicator_task in base_eco_indicator_tasks:
-            base_eco_indicator_task_dep = TaskDependency(base_eco_indicator_task)
-
-            def f_base_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, EcoRoutingTask) and isinstance(dep.task.mode, Base):
-                    return dep.task.scenario == base_eco_indicator_task.scenario
-                return False
-
-            parent_base_task_dep = find_matching_task_dep(root, f_base_parent)
-            if parent_base_task_dep:
-                parent_base_task_dep.add_child(base_eco_indicator_task_dep)
-            else:
-                root.add_child(base_eco_indicator_task_dep)
-
-        for base_heatmap_task in base_heatmap_tasks:
-            base_heatmap_task_dep = TaskDependency(base_heatmap_task)
-
-            def f_base_eco_indicator_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, TEMAEcoIndicatorTask) and isinstance(dep.task.mode, Base):
-                    return dep.task.scenario == base_heatmap_task.scenario
-                return False
-
-            parent_base_eco_indicator_task_dep = find_matching_task_dep(root, f_base_eco_indicator_parent)
-            if parent_base_eco_indicator_task_dep:
-                parent_base_eco_indicator_task_dep.add_child(base_heatmap_task_dep)
-            else:
-                root.add_child(base_heatmap_task_dep)
-
-        for pred_task in pred_tasks:
-            pred_task_dep = TaskDependency(pred_task)
-
-            def f_base_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, EcoRoutingTask) and isinstance(dep.task.mode, Base):
-                    return dep.task.scenario == pred_task.scenario
-                return False
-
-            parent_base_task_dep = find_matching_task_dep(root, f_base_parent)
-            if parent_base_task_dep:
-                parent_base_task_dep.add_child(pred_task_dep)
-            else:
-                root.add_child(pred_task_dep)
-
-        for sim_task in sim_tasks:
-            sim_task_dep = TaskDependency(sim_task)
-
-            def f_sim_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, EcoRoutingTask):
-                    if isinstance(dep.task.mode, Sim) and isinstance(sim_task.mode, Sim):
-                        return dep.task.scenario == sim_task.scenario and \
-                               dep.task.mode.objective1 == sim_task.mode.objective1 and \
-                               dep.task.mode.objective2 == sim_task.mode.objective2 and \
-                               dep.task.mode.solution != sim_task.mode.solution
-                return False
-
-            def f_pred_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, EcoRoutingTask):
-                    if isinstance(dep.task.mode, Pred) and isinstance(sim_task.mode, Sim):
-                        return dep.task.scenario == sim_task.scenario and \
-                               dep.task.mode.objective1 == sim_task.mode.objective1 and \
-                               dep.task.mode.objective2 == sim_task.mode.objective2
-                return False
-
-            parent_sim_task_deps = find_all_matching_task_deps(root, f_sim_parent)
-            parent_pred_task_dep = find_matching_task_dep(root, f_pred_parent)
-            if parent_sim_task_deps:
-                parent_sim_task_deps[-1].add_child(sim_task_dep)
-            elif parent_pred_task_dep:
-                parent_pred_task_dep.add_child(sim_task_dep)
-            else:
-                root.add_child(sim_task_dep)
-
-        for sim_eco_indicator_task in sim_eco_indicator_tasks:
-            sim_eco_indicator_task_dep = TaskDependency(sim_eco_indicator_task)
-
-            def f_sim_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, EcoRoutingTask):
-                    if isinstance(dep.task.mode, Sim) and isinstance(sim_eco_indicator_task.mode, Sim):
-                        return dep.task.scenario == sim_eco_indicator_task.scenario and \
-                               dep.task.mode.objective1 == sim_eco_indicator_task.mode.objective1 and \
-                               dep.task.mode.objective2 == sim_eco_indicator_task.mode.objective2 and \
-                               dep.task.mode.solution == sim_eco_indicator_task.mode.solution
-                return False
-
-            parent_sim_task_dep = find_matching_task_dep(root, f_sim_parent)
-            if parent_sim_task_dep:
-                parent_sim_task_dep.add_child(sim_eco_indicator_task_dep)
-            else:
-                root.add_child(sim_eco_indicator_task_dep)
-
-        for sim_heatmap_task in sim_heatmap_tasks:
-            sim_heatmap_task_dep = TaskDependency(sim_heatmap_task)
-
-            def f_sim_eco_indicator_parent(dep: TaskDependency) -> bool:
-                if isinstance(dep.task, TEMAEcoIndicatorTask):
-                    if isinstance(dep.task.mode, Sim) and isinstance(sim_heatmap_task.mode, Sim):
-                        return dep.task.scenario == sim_heatmap_task.scenario and \
-                               dep.task.mode.objective1 == sim_heatmap_task.mode.objective1 and \
-                               dep.task.mode.objective2 == sim_heatmap_task.mode.objective2 and \
-                               dep.task.mode.solution == sim_heatmap_task.mode.solution
-                return False
-
-            parent_sim_eco_indicator_task_dep = find_matching_task_dep(root, f_sim_eco_indicator_parent)
-            if parent_sim_eco_indicator_task_dep:
-                parent_sim_eco_indicator_task_dep.add_child(sim_heatmap_task_dep)
-            else:
-                root.add_child(sim_heatmap_task_dep)
-
-        return root
+    # Dependency keys are (stage, scenario, mode, [objective1, objective2, [solution]]), and each task depends on:
+    # - Base EcoRouting: nothing
+    # - Pred EcoRouting: the Base EcoRouting of its scenario
+    # - Sim EcoRouting: the Pred EcoRouting of its objective pair, so the solutions of a pair are simulated in parallel
+    # - EcoIndicator: the EcoRouting of its scenario and mode
+    # - Heatmaps: the EcoIndicator of its scenario and mode
+    def get_dependency_key(self, task: Task) -> Tuple:
+        if isinstance(task, EcoRoutingTask):
+            stage = "EcoRouting"
+            modes = [Base, Pred, Sim]
+        elif isinstance(task, TEMAEcoIndicatorTask):
+            stage = "EcoIndicator"
+            modes = [Base, Sim]
+        elif isinstance(task, TEMAHeatmapsTask):
+            stage = "Heatmaps"
+            modes = [Base, Sim]
+        else:
+            print_info = (task.__class__.__name__, task.task_id)
+            logger.warn("TaskManager", "Task %s task ID = %s is not an acceptable subclass of Task" % print_info)
+            return None
+        if type(task.mode) not in modes:
+            print_info = (task.mode.__class__.__name__, task.__class__.__name__, task.task_id)
+            logger.warn("TaskManager", "Unknown EcoRoutingMode %s for %s task ID = %s " % print_info)
+            return None
+        key = (stage, task.scenario, task.mode.__class__.__name__)
+        if type(task.mode) is Pred:
+            key += (task.mode.objective1, task.mode.objective2)
+        elif type(task.mode) is Sim:
+            key += (task.mode.objective1, task.mode.objective2, task.mode.solution)
+        return key
+
+    def get_duration_key(self, task: Task) -> tuple:
+        # a batch is timed out as any single one of its Sim solutions, which are recorded as they are simulated
+        task_type = EcoRoutingTask.__name__ if isinstance(task, EcoRoutingBatchTask) else task.__class__.__name__
+        return task_type, task.scenario, task.mode.__class__.__name__
+
+    def get_expected_duration(self, task: Task) -> float:
+        key = self.get_dependency_key(task)
+        default = Globals.TASK_MANAGER_EXPECTED_DURATIONS.get(key[0], {}).get(key[2], Globals.TASK_MANAGER_MAX_TIMEOUT)
+        if self.duration_model:
+            return self.duration_model.estimate(self.get_duration_key(task), default)
+        return default
+
+    def get_task_group(self, task: Task) -> str:
+        return task.scenario
+
+    def get_available_task(self, resource_pool: ResourcePool = None) -> Task:
+        # tasks leased to the workers of a distributed run (which pass their own resource pool) are not batched, as
+        # they are described to them one by one
+        with self.dep_graph_rlock:
+            task = TaskManager.get_available_task(self, resource_pool)
+            if resource_pool is None and type(task) is EcoRoutingTask and type(task.mode) is Sim:
+                return self.build_sim_batch(task)
+            return task
+
+    def build_sim_batch(self, task: EcoRoutingTask) -> Task:
+        # other solutions of the same objective pair ready to run, an even share of them per thread so that the pair
+        # is still simulated in parallel, within the expected duration cap
+        node = self.task_nodes[task.task_id]
+        ready = [n.task for n in node.parent.children if n.key[:5] == node.key[:5] and n.reachable and
+                 type(n.task) is EcoRoutingTask and n.task.status == TaskStatus.Available]
+        size = min(Globals.ECOROUTING_SIM_BATCH_MAX_SIZE, math.ceil((len(ready) + 1) / self.max_parallel_tasks))
+        tasks = [task]
+        budget = Globals.ECOROUTING_SIM_BATCH_MAX_DURATION - self.get_expected_duration(task)
+        for other in sorted(ready, key=lambda t: t.mode.solution)[:size - 1]:
+            budget -= self.get_expected_duration(other)
+            if budget < 0:
+                break
+            other.status = TaskStatus.Taken
+            tasks.append(other)
+        if len(tasks) == 1:
+            return task
+        batch = EcoRoutingBatchTask(tasks)
+        batch.status = TaskStatus.Taken
+        batch.on_task_finished = self.task_finished
+        print_info = ([t.mode.solution for t in tasks], task.scenario, task.mode.objective1, task.mode.objective2)
+        logger.info("TaskManager", "Batched Sim solutions %s of %s (%s, %s)" % print_info)
+        return batch
+
+    def task_finished(self, task: Task, seconds: float):
+        if not isinstance(task, EcoRoutingBatchTask):
+            TaskManager.task_finished(self, task, seconds)
+
+    def retry_stalled_task(self, task: Task):
+        for t in task.tasks if isinstance(task, EcoRoutingBatchTask) else [task]:
+            TaskManager.retry_stalled_task(self, t)
+
+    def describe_task(self, task: Task) -> dict:
+        return describe_task(task)
+
+    def build_task(self, description: dict) -> Task:
+        if description["scenario"] not in catalog:
+            return None
+        return build_task(description)
+
+    def get_parent_dependency_key(self, task: Task) -> Tuple:
+        key = self.get_dependency_key(task)
+        stage, scenario, mode = key[:3]
+        if stage == "Heatmaps":
+            return ("EcoIndicator",) + key[1:]
+        if stage == "EcoIndicator":
+            return ("EcoRouting",) + key[1:]
+        if mode == "Pred":
+            return "EcoRouting", scenario, "Base"
+        if mode == "Sim":
+            return ("EcoRouting", scenario, "Pred") + key[3:5]
+        return None
 
 
 def get_test_cases():
-    excluded = ["ang-est", "portoSB_8AM9AM_fewerv", "portoA3_6PM7PM"]
-    return {k: v for k, v in testcases.items() if k not in excluded}
+    return catalog.test_cases
+
+
+# Tasks are described as plain dicts to hand them to the workers of a distributed run (see distributed.py)
+def describe_task(task: Task) -> dict:
+    description = {
+        "type": task.__class__.__name__,
+        "task_id": task.task_id,
+        "scenario": task.scenario,
+        "mode": task.mode.__class__.__name__
+    }
+    if isinstance(task.mode, Pred):
+        description["objective1"] = task.mode.objective1
+        description["objective2"] = task.mode.objective2
+    if isinstance(task.mode, Sim):
+        description["solution"] = task.mode.solution
+    if isinstance(task, EcoRoutingVideoTask):
+        description["video_name"] = task.video_name
+    if isinstance(task, TEMAHeatmapsTask):
+        description["image_dir_name"] = task.image_dir_name
+    return description
+
+
+def build_task(description: dict) -> Task:
+    if description["mode"] == "Base":
+        mode = Base()
+    elif description["mode"] == "Pred":
+        mode = Pred(description["objective1"], description["objective2"])
+    elif description["mode"] == "Sim":
+        mode = Sim(description["objective1"], description["objective2"], description["solution"])
+    else:
+        raise ValueError("Unknown EcoRoutingMode %s" % description["mode"])
+    task_id = description["task_id"]
+    scenario = description["scenario"]
+    if description["type"] == "EcoRoutingTask":
+        return EcoRoutingTask(task_id, scenario, mode)
+    if description["type"] == "EcoRoutingVideoTask":
+        return EcoRoutingVideoTask(task_id, scenario, mode, description["video_name"])
+    if description["type"] == "TEMAEcoIndicatorTask":
+        return TEMAEcoIndicatorTask(task_id, scenario, mode)
+    if description["type"] == "TEMAHeatmapsTask":
+        return TEMAHeatmapsTask(task_id, scenario, mode, description["image_dir_name"])
+    raise ValueError("Unknown task type %s" % description["type"])
 
 
 def check_content(silent=True) -> Dict[str, Task]:
-    tcs = get_test_cases()
+    if catalog.reload_if_changed():
+        logger.info("ContentChecker", "Reloaded scenario catalog from %s" % catalog.module_file)
     total_objective_combinations = utils.get_objective_combinations()
     count_combs_total = len(total_objective_combinations)
     log = []
@@ -737,14 +863,12 @@ def check_content(silent=True) -> Dict[str, Task]:
 
     log.append("Checking content...")
 
-    for scenario in tcs:
-        tc = tcs[scenario]
-
-        log.append("Scenario %s (%s)" % (tc["prettyName"], scenario))
+    for scenario, info in catalog.items():
+        log.append("Scenario %s (%s)" % (info.pretty_name, scenario))
 
-        data_dir = tc["ifolder"]
-        data_net = join(data_dir, tc["netfile"])
-        data_rou = join(data_dir, tc["roufile"])
+        data_dir = info.input_dir
+        data_net = info.net_path
+        data_rou = info.route_path
         data_dir_exists = exists(data_dir)
         data_net_exists = exists(data_net)
         data_rou_exists = exists(data_rou)
@@ -752,11 +876,10 @@ def check_content(silent=True) -> Dict[str, Task]:
         log.append("\tDataset: Net file: %s | Route file: %s " % (verbose(data_net_exists), verbose(data_rou_exists)))
 
         if data_dir_exists and data_net_exists and data_rou_exists:
-            res_dir = tc["ofolder"]
-            base_dir = join(res_dir, "inputdata")
+            base_dir = info.base_output_dir
 
             base_TEMA_res = join(base_dir, Globals.TEMA_RESULTS_FILE_NAME)
-            base_rou = join(base_dir, tc["bname"]) + "-base.rou.xml"
+            base_rou = info.base_route_path
             base_TEMA_res_exists = exists(base_TEMA_res)
             base_rou_exists = exists(base_rou)
             base_TEMA_data_exists = check_TEMA_simulation_data(base_dir)
@@ -775,7 +898,7 @@ def check_content(silent=True) -> Dict[str, Task]:
             base_tasks[base_eco_indicator_task_name] = task
             check_task_completeness(task, base_TEMA_res_exists)
 
-            base_media_name = utils.format_file_name_base(scenario)
+            base_media_name = info.base_media_name
 
             base_video_exists = check_video(base_media_name)
             task = EcoRoutingVideoTask(base_ecorouting_task_name, scenario, base_task_mode, base_media_name)
@@ -798,7 +921,7 @@ def check_content(silent=True) -> Dict[str, Task]:
             for objective_combination in total_objective_combinations:
                 obj1, obj2 = utils.reverse_format_objective_names(objective_combination)
 
-                pred_dir = join(res_dir, objective_combination)
+                pred_dir = info.get_objectives_dir(obj1, obj2)
                 base_eval = join(pred_dir, "base.eval")
                 pred_eval = join(pred_dir, "pred.eval")
 
@@ -821,11 +944,12 @@ def check_content(silent=True) -> Dict[str, Task]:
 
                     for file in os.listdir(pred_dir):
                         if os.path.isdir(join(pred_dir, file)) and file.startswith("solution"):
-                            sim_dir = join(pred_dir, file)
                             sol_number = int(file.replace("solution", "").strip())
+                            sol_info = info.get_solution(obj1, obj2, sol_number)
+                            sim_dir = sol_info.output_dir
 
                             sim_TEMA_res = join(sim_dir, Globals.TEMA_RESULTS_FILE_NAME)
-                            sim_rou = join(sim_dir, tc["bname"]) + ".rou.xml"
+                            sim_rou = sol_info.route_path
                             sim_TEMA_res_exists = exists(sim_TEMA_res)
                             sim_rou_exists = exists(sim_rou)
                             sim_TEMA_data_exists = check_TEMA_simulation_data(sim_dir)
@@ -844,7 +968,7 @@ def check_content(silent=True) -> Dict[str, Task]:
                             sim_tasks[sim_eco_indicator_task_name] = task
                             check_task_completeness(task, sim_TEMA_res_exists)
 
-                            sim_media_name = utils.format_file_name_sim(scenario, obj1, obj2, sol_number)
+                            sim_media_name = sol_info.media_name
 
                             sim_video_exists = check_video(sim_media_name)
                             task = EcoRoutingVideoTask(sim_ecorouting_task_name, scenario, sim_task_mode, sim_media_name)
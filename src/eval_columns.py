@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+
+# Columnar counterparts of utils.read_ev_file, read_eval_file, read_res_file, write_eval_file and res_to_TEMA_ev
+# Each column is a NumPy array, so parsing, formatting and the TEMA aggregations run in C rather than per value
+
+
+def read_ev_columns(file_name) -> Dict[str, np.float64]:
+    with open(file_name, "r") as f:
+        items = [line.strip().split("\t") for line in f.read().splitlines() if line.strip()]
+    items = [item for item in items if len(item) == 2]
+    headers = [item[0].strip() for item in items]
+    values = np.array([item[1] for item in items], dtype=np.float64)
+    return dict(zip(headers, values))
+
+
+def load_table(body: str, delimiter, columns: List[int]) -> np.ndarray:
+    if not body.strip():
+        return np.empty((0, len(columns)), dtype=np.float64)
+    return np.loadtxt(io.StringIO(body), delimiter=delimiter, usecols=columns, ndmin=2, dtype=np.float64)
+
+
+def read_eval_columns(file_name) -> Dict[str, np.ndarray]:
+    with open(file_name, "r") as f:
+        headers = f.readline().replace("#", "").split()
+        body = f.read()
+    table = load_table(body, None, list(range(len(headers))))
+    return {headers[j]: table[:, j] for j in range(len(headers))}
+
+
+def read_res_columns(file_name) -> Dict[str, np.ndarray]:
+    with open(file_name, "r") as f:
+        headers = [h.strip() for h in f.readline().split("\t")]
+        body = f.read()
+    numeric = [j for j in range(len(headers)) if headers[j] != "link"]
+    table = load_table(body, "\t", numeric)
+    res = {}
+    for j in range(len(headers)):
+        if headers[j] == "link":
+            links = [line.split("\t")[j].strip() for line in body.splitlines() if line.strip()]
+            res[headers[j]] = np.array(links, dtype=str)
+        else:
+            res[headers[j]] = table[:, numeric.index(j)]
+    return res
+
+
+def write_eval_columns(file_name, header: List[str], columns: Dict[str, np.ndarray]):
+    table = np.column_stack([np.asarray(columns[h], dtype=np.float64) for h in header])
+    # "%.18e" formats exactly like "{:.18e}".format, so files stay byte-identical to utils.write_eval_file
+    row_format = " ".join(["%.18e"] * len(header))
+    # written atomically, as the results API may read it while it is regenerated
+    tmp_file_name = "%s.%d.tmp" % (file_name, threading.get_ident())
+    with open(tmp_file_name, "w") as f:
+        f.write(" ".join(["#"] + header) + "\n")
+        f.write("\n".join([row_format % tuple(row) for row in table.tolist()]))
+    os.replace(tmp_file_name, file_name)
+
+
+def res_to_TEMA_ev_columns(res: Dict[str, np.ndarray]) -> Dict[str, float]:
+
+    def divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # divisions by zero count as 0, as utils.res_to_TEMA_ev does for failing links
+        return np.divide(a, b, out=np.zeros_like(a), where=b != 0)
+
+    ttime = res["ttime"]
+    length = res["length"] / 1000
+    totalvehicles = res["totalvehicles"]
+    cost_co2 = res["cost_co2"]
+    cost_co2_veh = divide(cost_co2, length * totalvehicles)
+
+    return {
+        "ttime":                float(np.sum(ttime * totalvehicles)) / 3600,
+        "length":               float(np.sum(length * totalvehicles)),
+        "cost_co2":             float(np.sum(cost_co2)) / 1_000_000,
+        "cost_co2_veh":         float(np.mean(cost_co2_veh)),
+        "cost_co":              float(np.sum(res["cost_co"])) / 1000,
+        "cost_PMx":             float(np.sum(res["cost_pm10"] + res["cost_pm25"])) / 1000,
+        "cost_nox":             float(np.sum(res["cost_nox"])) / 1000,
+        "cost_eco_indicator":   float(np.sum(res["cost_eco_indicator"] * totalvehicles))
+    }
+
+
+def rows_to_columns(header: List[str], rows: List[dict]) -> Dict[str, np.ndarray]:
+    return {h: np.array([row[h] for row in rows], dtype=np.float64) for h in header}
@@ -1,16 +1,18 @@
 import os
 
+import eval_columns
 import utils
 
-import ecorouting_connector as eco
 from logger import logger
+from scenario_catalog import catalog
 
 
 def find_objetive_pair_dirs():
     dirs = []
-    for scenario, info in eco.get_test_cases().items():
+    for _, info in catalog.items():
         for obj_pair in utils.get_objective_combinations():
-            dirs.append(os.path.join(info["ofolder"], obj_pair))
+            objective1, objective2 = utils.reverse_format_objective_names(obj_pair)
+            dirs.append(info.get_objectives_dir(objective1, objective2))
     return dirs
 
 
@@ -22,7 +24,7 @@ def fix_eval_file(dir):
         if os.path.isdir(sol_dir) and file.startswith("solution"):
             for sol_file in os.listdir(sol_dir):
                 if sol_file.endswith("sim.ev"):
-                    sol_sim_ev = utils.read_ev_file(os.path.join(sol_dir, sol_file))
+                    sol_sim_ev = eval_columns.read_ev_columns(os.path.join(sol_dir, sol_file))
                     solution_evs[file] = sol_sim_ev
                     header = list(sol_sim_ev)
                     break
@@ -35,14 +37,15 @@ def fix_eval_file(dir):
         for sol in ordered_sols:
             sol_values = {h: solution_evs[sol][h] if solution_evs[sol] else float(0) for h in header}
             data.append(sol_values)
-        utils.write_eval_file(os.path.join(dir, "sim_fixed.eval"), header, data)
+        columns = eval_columns.rows_to_columns(header, data)
+        eval_columns.write_eval_columns(os.path.join(dir, "sim_fixed.eval"), header, columns)
         logger.info("EvalFileFixer", "Fixed sim.eval file at %s" % dir)
     else:
         logger.info("EvalFileFixer", "Unable to fix sim.eval file for %s as no solutions have been simulated yet" % dir)
 
 
-def run():
-    for dir in find_objetive_pair_dirs():
+def fix_eval_files(dirs):
+    for dir in dirs:
         try:
             logger.info("EvalFileFixer", "Fixing sim.eval file at %s" % dir)
             fix_eval_file(dir)
@@ -53,5 +56,9 @@ def run():
                 logger.flush()
 
 
+def run():
+    fix_eval_files(find_objetive_pair_dirs())
+
+
 if __name__ == '__main__':
     run()
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from threading import Thread
+from typing import Callable, Dict, Hashable, List
+
+from globals import Globals
+from logger import logger
+
+# inotify is Linux only; without it output changes are only picked up by task completions and the periodic scans
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+TASK_FINISHED = "task_finished"
+PATH_CHANGED = "path_changed"
+POST_PROCESS = "post_process"
+
+
+# Events are delivered in order to the subscribers of their topic on a dispatcher thread, a short while after being
+# published: the same (topic, key) published again while pending is delivered once, so a burst of file events (e.g. a
+# task moving its outputs in) results in a single round of work
+# Slow subscribers (e.g. the post-processing jobs, which wait for the periodic scans) get a bus of their own, so that
+# they do not hold up the delivery of the other topics
+class EventBus:
+    def __init__(self, name="EventBus"):
+        self.name = name
+        self.subscribers: Dict[str, List[Callable[[Hashable], None]]] = {}
+        self.pending: Dict[tuple, None] = OrderedDict()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread: Thread = None
+
+    def subscribe(self, topic, callback: Callable[[Hashable], None]):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, key: Hashable = None):
+        with self.condition:
+            self.pending[(topic, key)] = None
+            self.condition.notify()
+
+    def dispatch(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+            time.sleep(Globals.EVENTS_DEBOUNCE)
+            with self.condition:
+                events = list(self.pending)
+                self.pending.clear()
+            for topic, key in events:
+                for callback in self.subscribers.get(topic, []):
+                    try:
+                        callback(key)
+                    except BaseException as e:
+                        logger.error(self.name, "Error handling %s event for %s: %s" % (topic, key, e))
+
+    def start(self):
+        self.running = True
+        self.thread = Thread(target=self.dispatch, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+
+
+# Publishes PATH_CHANGED for files written or moved into the watched directory trees, and for directories moved in
+class DirectoryWatcher:
+    def __init__(self, event_bus: EventBus, paths: List[str]):
+        self.event_bus = event_bus
+        self.paths = paths
+        self.inotify = None
+        self.watches: Dict[int, str] = {}
+        self.running = False
+        self.thread: Thread = None
+
+    def add_watch(self, path):
+        flags = inotify_simple.flags
+        try:
+            wd = self.inotify.add_watch(path, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+            self.watches[wd] = path
+        except OSError as e:
+            logger.warn("DirectoryWatcher", "Unable to watch %s: %s" % (path, e))
+
+    def add_watch_tree(self, root):
+        for dir_path, _, _ in os.walk(root):
+            self.add_watch(dir_path)
+
+    def watch(self):
+        flags = inotify_simple.flags
+        while self.running:
+            for event in self.inotify.read(timeout=Globals.EVENTS_WATCHER_READ_TIMEOUT * 1000):
+                if event.mask & flags.IGNORED:
+                    self.watches.pop(event.wd, None)
+                    continue
+                dir_path = self.watches.get(event.wd)
+                if dir_path is None:
+                    continue
+                path = os.path.join(dir_path, event.name)
+                if event.mask & flags.ISDIR:
+                    self.add_watch_tree(path)
+                    self.event_bus.publish(PATH_CHANGED, path)
+                elif not event.mask & flags.CREATE:
+                    self.event_bus.publish(PATH_CHANGED, path)
+
+    def start(self) -> bool:
+        if not inotify_simple:
+            logger.warn("DirectoryWatcher", "inotify_simple is not installed, output changes will not be watched")
+            return False
+        self.inotify = inotify_simple.INotify()
+        for path in self.paths:
+            self.add_watch_tree(path)
+        logger.info("DirectoryWatcher", "Watching %d directories" % len(self.watches))
+        self.running = True
+        self.thread = Thread(target=self.watch, name="DirectoryWatcher", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.inotify.close()
@@ -56,11 +56,81 @@ class Globals(NoInit):
 
     XML_COMMENT_TAGS = ("<!--", "-->")
     XML_PROLOG_TAGS = ("<\\?xml", "\\?>")
+    # bytes of text expat buffers before reporting it, and of output buffered by the streaming XML transforms
+    XML_TRANSFORM_BUFFER_SIZE = 64 * 1024
 
     SUMO_EDGE_DATA_XML_TAG = "edgeData"
 
     TASK_MANAGER_MAX_TIMEOUT = 60 * 60 * 3
     TASK_MANAGER_MAX_THREADS = os.cpu_count()
+    # resources the task manager packs tasks into (memory in MB); each task class declares its demands
+    TASK_MANAGER_RESOURCE_CAPACITIES = {
+        "cpu": os.cpu_count(),
+        "display": 2,
+        "memory": os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2 ** 20,
+        "matlab": 2
+    }
+    TASK_STORE_PATH = os.path.join("..", "tasks.db")
+    # task workspaces link to the EcoRouting and TEMA trees and to their inputs (hardlink, symlink or copy), except for
+    # these files, which are copied as the tasks or their processes write to them
+    WORKSPACE_LINK_MODE = "hardlink"
+    WORKSPACE_MUTABLE_FILES = [ECOROUTING_GUI_SETTINGS_FILE_NAME, ECOROUTING_ADDITIONAL_FILES_FILE_NAME,
+                               TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME, TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME,
+                               TEMA_NOISE_EDGE_DATA_FILE_NAME]
+    # workspaces kept staged for each template (EcoRouting, EcoIndicator, Heatmaps), in directories named
+    # <prefix>-<template>-<number>, and seconds between checks of the pool by its thread
+    WORKSPACE_POOL_SIZES = {"EcoRouting": 2, "EcoIndicator": 1, "Heatmaps": 1}
+    WORKSPACE_POOL_DIR_PREFIX = "WorkspacePool"
+    WORKSPACE_POOL_CHECK_INTERVAL = 60
+    # content-addressed store the edge data and TEMA results outputs are hard links to; it must be on the same file
+    # system as the outputs, and its unreferenced objects are removed every ARTIFACT_STORE_GC_INTERVAL seconds
+    ARTIFACT_STORE_DIR = os.path.join("..", "artifacts")
+    ARTIFACT_STORE_CHUNK_SIZE = 1024 * 1024
+    ARTIFACT_STORE_GC_INTERVAL = 60 * 60
+    # consecutive Sim solutions of an objective pair run by a single EcoRouting process, as many as fit in the duration
+    ECOROUTING_SIM_BATCH_MAX_SIZE = 8
+    ECOROUTING_SIM_BATCH_MAX_DURATION = 60 * 60 * 4
+
+    DURATION_MODEL_WINDOW = 50
+    DURATION_MODEL_EMA_ALPHA = 0.3
+
+    # distributed runs: workers lease tasks from the coordinator and renew their leases with heartbeats
+    # local only by default (--coordinator-host/--coordinator-port to change); workers must send the shared secret in
+    # the DISTRIBUTED_TOKEN_ENV environment variable (or .env file) of both the coordinator and the workers
+    DISTRIBUTED_COORDINATOR_HOST = "127.0.0.1"
+    DISTRIBUTED_COORDINATOR_PORT = 5010
+    DISTRIBUTED_COORDINATOR_URL = "http://127.0.0.1:%d/" % DISTRIBUTED_COORDINATOR_PORT
+    DISTRIBUTED_TOKEN_ENV = "MOBIWISE_COORDINATOR_TOKEN"
+    DISTRIBUTED_LEASE_TIMEOUT = 60 * 3
+    DISTRIBUTED_HEARTBEAT_INTERVAL = 30
+    DISTRIBUTED_REQUEST_TIMEOUT = 60 * 5
+    DISTRIBUTED_CHUNK_SIZE = 1024 * 1024
+    # one of fifo, sjf (shortest expected job first), round_robin (between scenarios), finish_started or critical_path
+    TASK_MANAGER_SCHEDULING_POLICY = "critical_path"
+    # rough expected task durations in seconds, by dependency stage and mode, until the duration model has samples
+    TASK_MANAGER_EXPECTED_DURATIONS = {
+        "EcoRouting": {"Base": 60 * 60 * 2, "Pred": 60 * 10, "Sim": 60 * 60 * 2},
+        "EcoIndicator": {"Base": 60 * 15, "Sim": 60 * 15},
+        "Heatmaps": {"Base": 60 * 30, "Sim": 60 * 30}
+    }
+
+    # subprocesses writing nothing to stdout for this many seconds are considered stalled and terminated
+    PROCESS_MONITOR_INACTIVITY_TIMEOUT = 60 * 20
+    # per task type timeouts: the given quantile of past durations times the factor, within [min, TASK_MANAGER_MAX]
+    PROCESS_MONITOR_TIMEOUT_QUANTILE = 0.99
+    PROCESS_MONITOR_TIMEOUT_FACTOR = 2
+    PROCESS_MONITOR_TIMEOUT_MIN_SAMPLES = 5
+    PROCESS_MONITOR_MIN_TIMEOUT = 60 * 10
+    # seconds between SIGTERM and SIGKILL to the process group
+    PROCESS_MONITOR_KILL_GRACE = 10
+    PROCESS_MONITOR_POLL_INTERVAL = 5
+    PROCESS_MONITOR_READ_SIZE = 64 * 1024
+    PROCESS_MONITOR_MAX_RETRIES = 1
+
+    METRICS_PIPELINE_FILE = os.path.join("..", "logs", "pipeline.prom")
+    METRICS_PIPELINE_DUMP_INTERVAL = 15
+    METRICS_DURATION_BUCKETS = [0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 60 * 5, 60 * 15, 60 * 30,
+                                60 * 60, 60 * 60 * 2, 60 * 60 * 3]
 
     LOGS_OLD_NAME = "old logs"
     LOGS_DIR = os.path.join("..", "logs")
@@ -74,7 +144,8 @@ class Globals(NoInit):
     SNAPSHOTS_COUNT = 200_000
     SNAPSHOTS_FILE_TYPE = "png"
     SNAPSHOTS_FILE_NAME = "snapshot%d." + SNAPSHOTS_FILE_TYPE
-    SNAPSHOTS_XML_ELEMENT = "\t<snapshot file=\"%s\" time=\"%d\"/>"
+    SNAPSHOTS_XML_TAG = "snapshot"
+    SNAPSHOTS_XML_ELEMENT = "\t<" + SNAPSHOTS_XML_TAG + " file=\"%s\" time=\"%d\"/>"
 
     VIDEOS_DIR = os.path.join("..", "media", "videos")
     VIDEOS_TARGZ_DIR = os.path.join("..", "media", "videos.tar.gz")
@@ -93,14 +164,48 @@ class Globals(NoInit):
         "height": 1080
     }
     HEATMAP_EXPECTED_COUNT = 8  # 2 of each type (full, routes) for each of the 4 TEMA_METRICS
+    HEATMAPS_VARIANTS_DIR = os.path.join("..", "media", "heatmaps.variants")
+    HEATMAPS_VARIANT_SIZES = {
+        "thumb": {"width": 320, "height": 180},
+        "medium": {"width": 960, "height": 540}
+    }
+    HEATMAPS_VARIANT_FILE_TYPES = {"png": "image/png", "webp": "image/webp"}
+    HEATMAPS_PREWARM_SIZES = ["thumb"]
+    HEATMAPS_WEBP_QUALITY = 80
+    HEATMAPS_TILES_ENABLED = False
+    HEATMAPS_TILE_SIZE = 256
+    HEATMAPS_TILE_FILE_TYPE = "webp"
+
+    # media URLs are not versioned by content (heatmaps are regenerated in place), so they are only cached briefly and
+    # then revalidated against their ETag
+    MEDIA_CACHE_MAX_AGE = 60
+    MEDIA_HASH_CHUNK_SIZE = 1024 * 1024
+
+    API_HOST = "127.0.0.1"
+    API_PORT = 5000
+    API_WORKERS = min(4, os.cpu_count())
+    API_THREADS = 4
 
     VNC_MANAGER_API = "http://localhost:5001/api/"
+    VNC_MANAGER_POOL_SIZE = 8
+    VNC_MANAGER_TIMEOUT = 60
+    VNC_MANAGER_CHUNK_SIZE = 1024 * 1024
+    VNC_MANAGER_COMPRESSION_LEVEL = 6
+
+    RESULTS_CACHE_MAX_ENTRIES = 256
+    ANALYTICS_CACHE_MAX_ENTRIES = 256
+    RESPONSE_MAX_PRECISION = 17
 
     WAIT_MILLIS = 100
 
-    CONTENT_CHECKER_TIMEOUT = 60
-    CONTENT_CHECKER_LOG_TIMEOUT = CONTENT_CHECKER_TIMEOUT * 5
-    EVAL_FILE_FIXER_TIMEOUT = 60 * 15
-    TEMA_EVAL_FILE_GENERATOR_TIMEOUT = 60 * 15
-    HEATMAP_ORGANIZER_TIMEOUT = 60 * 15
-    VIDEO_GENERATOR_TIMEOUT = 60 * 15
+    # task completions and output changes trigger the content checker and the post-processing right away, so these
+    # periodic scans are only a safety net for changes that were missed (e.g. without inotify)
+    CONTENT_CHECKER_TIMEOUT = 60 * 5
+    CONTENT_CHECKER_LOG_TIMEOUT = 60 * 5
+    EVAL_FILE_FIXER_TIMEOUT = 60 * 60
+    TEMA_EVAL_FILE_GENERATOR_TIMEOUT = 60 * 60
+    HEATMAP_ORGANIZER_TIMEOUT = 60 * 60
+    VIDEO_GENERATOR_TIMEOUT = 60 * 60
+    # seconds events are held for so that bursts of them coalesce, and between checks of the watcher for stopping
+    EVENTS_DEBOUNCE = 2
+    EVENTS_WATCHER_READ_TIMEOUT = 1
@@ -1,19 +1,20 @@
 import os
 
+import heatmap_variants
 from globals import Globals
 from logger import logger
 
 
+def fix_heatmaps_dir_name(dir):
+    if dir.endswith("." + Globals.HEATMAPS_FILE_TYPE):
+        fixed_dir = dir.replace("." + Globals.HEATMAPS_FILE_TYPE, "")
+        os.rename(os.path.join(Globals.HEATMAPS_DIR, dir), os.path.join(Globals.HEATMAPS_DIR, fixed_dir))
+        return fixed_dir
+    return dir
+
+
 def find_heatmaps_dirs():
-    dirs = []
-    for dir in os.listdir(Globals.HEATMAPS_DIR):
-        if dir.endswith("." + Globals.HEATMAPS_FILE_TYPE):
-            fixed_dir = dir.replace("." + Globals.HEATMAPS_FILE_TYPE, "")
-            os.rename(os.path.join(Globals.HEATMAPS_DIR, dir), os.path.join(Globals.HEATMAPS_DIR, fixed_dir))
-            dirs.append(fixed_dir)
-        else:
-            dirs.append(dir)
-    return dirs
+    return [fix_heatmaps_dir_name(dir) for dir in os.listdir(Globals.HEATMAPS_DIR)]
 
 
 def organize_heatmap(dir):
@@ -34,13 +35,21 @@ def organize_heatmap(dir):
             os.remove(os.path.join(path, file))
 
 
-def run():
-    for dir in find_heatmaps_dirs():
+def organize_heatmaps(dirs):
+    for dir in dirs:
         logger.info("HeatmapOrganizer", "Organizing image files at %s" % dir)
         organize_heatmap(dir)
+        try:
+            heatmap_variants.generate_variants(dir)
+        except BaseException as e:
+            logger.error("HeatmapOrganizer", "Unable to generate heatmap variants for %s: %s" % (dir, e))
         if __name__ == '__main__':
             logger.flush()
 
 
+def run():
+    organize_heatmaps(find_heatmaps_dirs())
+
+
 if __name__ == '__main__':
     run()
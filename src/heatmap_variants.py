@@ -0,0 +1,108 @@
+import math
+import os
+import threading
+from typing import Dict
+
+from PIL import Image
+
+import utils
+from globals import Globals
+from logger import logger
+
+
+# Resized and re-encoded copies of the heatmaps, generated on first request (or by the heatmap organizer for the
+# prewarmed sizes) and kept under HEATMAPS_VARIANTS_DIR until the original heatmap changes
+
+variant_locks: Dict[str, threading.Lock] = {}
+variant_locks_lock = threading.Lock()
+
+
+def get_variant_lock(path) -> threading.Lock:
+    with variant_locks_lock:
+        return variant_locks.setdefault(path, threading.Lock())
+
+
+def is_up_to_date(path, src_path) -> bool:
+    return os.path.exists(path) and os.stat(path).st_mtime_ns >= os.stat(src_path).st_mtime_ns
+
+
+def get_variant_path(image_dir_name, file_name, size, file_type):
+    name = file_name.replace("." + Globals.HEATMAPS_FILE_TYPE, "")
+    return os.path.join(Globals.HEATMAPS_VARIANTS_DIR, image_dir_name, "%s.%s.%s" % (name, size, file_type))
+
+
+def save_image(image: Image.Image, path, file_type):
+    tmp_path = "%s.tmp.%s" % (path, file_type)
+    if file_type == "webp":
+        image.save(tmp_path, "WEBP", quality=Globals.HEATMAPS_WEBP_QUALITY, method=4)
+    else:
+        image.save(tmp_path, file_type.upper(), optimize=True)
+    os.replace(tmp_path, path)
+
+
+def get_variant(src_path, image_dir_name, size, file_type):
+    if size == "full" and file_type == Globals.HEATMAPS_FILE_TYPE:
+        return src_path
+    path = get_variant_path(image_dir_name, os.path.basename(src_path), size, file_type)
+    if is_up_to_date(path, src_path):
+        return path
+    with get_variant_lock(path):
+        if not is_up_to_date(path, src_path):
+            utils.ensure_dir_exists(os.path.dirname(path), silent=True)
+            with Image.open(src_path) as image:
+                image.load()
+                if size != "full":
+                    resolution = Globals.HEATMAPS_VARIANT_SIZES[size]
+                    image.thumbnail((resolution["width"], resolution["height"]), Image.LANCZOS)
+                save_image(image, path, file_type)
+            logger.info("HeatmapVariants", "Generated %s from %s" % (path, src_path))
+    return path
+
+
+def generate_tiles(src_path, image_dir_name):
+    # Deep Zoom (DZI) pyramid: level N holds the full image, each level below halves it, down to a single pixel
+    name = os.path.basename(src_path).replace("." + Globals.HEATMAPS_FILE_TYPE, "")
+    dzi_path = os.path.join(Globals.HEATMAPS_VARIANTS_DIR, image_dir_name, "%s.dzi" % name)
+    if is_up_to_date(dzi_path, src_path):
+        return dzi_path
+    tiles_dir = os.path.join(Globals.HEATMAPS_VARIANTS_DIR, image_dir_name, "%s_files" % name)
+    tile_size = Globals.HEATMAPS_TILE_SIZE
+    file_type = Globals.HEATMAPS_TILE_FILE_TYPE
+    with get_variant_lock(dzi_path):
+        utils.clear_and_remove_dir(tiles_dir, silent=True)
+        with Image.open(src_path) as image:
+            image.load()
+            width, height = image.size
+            max_level = math.ceil(math.log2(max(width, height)))
+            for level in range(max_level, -1, -1):
+                scale = 2 ** (max_level - level)
+                level_width, level_height = max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+                level_image = image.resize((level_width, level_height), Image.LANCZOS) if scale > 1 else image
+                level_dir = os.path.join(tiles_dir, str(level))
+                utils.ensure_dir_exists(level_dir, silent=True)
+                for column in range(math.ceil(level_width / tile_size)):
+                    for row in range(math.ceil(level_height / tile_size)):
+                        box = (column * tile_size, row * tile_size,
+                               min((column + 1) * tile_size, level_width), min((row + 1) * tile_size, level_height))
+                        tile_path = os.path.join(level_dir, "%d_%d.%s" % (column, row, file_type))
+                        save_image(level_image.crop(box), tile_path, file_type)
+        dzi = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+              '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="%d" Overlap="0" Format="%s">\n' \
+              '\t<Size Width="%d" Height="%d"/>\n' \
+              '</Image>\n' % (tile_size, file_type, width, height)
+        with open(dzi_path, "w") as f:
+            f.write(dzi)
+    logger.info("HeatmapVariants", "Generated tile pyramid %s from %s" % (dzi_path, src_path))
+    return dzi_path
+
+
+def generate_variants(image_dir_name):
+    path = os.path.join(Globals.HEATMAPS_DIR, image_dir_name)
+    for file in os.listdir(path):
+        if file.endswith("." + Globals.HEATMAPS_FILE_TYPE) and "draft" not in file.lower():
+            src_path = os.path.join(path, file)
+            for size in Globals.HEATMAPS_PREWARM_SIZES:
+                for file_type in Globals.HEATMAPS_VARIANT_FILE_TYPES:
+                    get_variant(src_path, image_dir_name, size, file_type)
+            if Globals.HEATMAPS_TILES_ENABLED:
+                generate_tiles(src_path, image_dir_name)
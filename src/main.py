@@ -1,24 +1,43 @@
+import argparse
+import multiprocessing
 import os
 import shutil
+import signal
 import threading
 import time
 from datetime import datetime
 
-import requests
 from apscheduler.schedulers.background import BackgroundScheduler
 
 import TEMA_eval_file_generator
+import distributed
+import events
 import eval_file_fixer
 import heatmap_organizer
+import heatmap_variants
+import metrics
+import post_processor
+import response_formats
 import utils
 import ecorouting_connector as eco
-from flask import Flask, send_file
+from flask import Flask, Response, request
 from flask_cors import CORS
+from werkzeug.security import safe_join
 from dotenv import load_dotenv, find_dotenv
 
 import video_generator
+from artifact_store import artifacts
 from globals import Globals
 from logger import logger
+from media import send_media, media_etags
+from pareto import analytics_cache
+from scenario_catalog import catalog
+from duration_model import DurationModel
+from task import TaskStatus
+from task_store import TaskStore, clean_orphaned_workspaces
+from workspace_pool import WorkspacePool
+from results_cache import results_cache, RESULTS_EVAL_FILES
+from vnc_client import vnc_client
 
 load_dotenv(find_dotenv())
 
@@ -27,14 +46,40 @@ app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 
+def get_cache_stats(key):
+    stats = {"results": results_cache.stats(), "analytics": analytics_cache.stats(), "media_etags": media_etags.stats()}
+    return {(cache,): cache_stats[key] for cache, cache_stats in stats.items()}
+
+
+metrics.registry.register(metrics.CallbackMetric("mobiwise_cache_hits_total", "Cache hits", "counter", ("cache",),
+                                                 lambda: get_cache_stats("hits")))
+metrics.registry.register(metrics.CallbackMetric("mobiwise_cache_misses_total", "Cache misses", "counter", ("cache",),
+                                                 lambda: get_cache_stats("misses")))
+metrics.registry.register(metrics.CallbackMetric("mobiwise_cache_entries", "Cache entries", "gauge", ("cache",),
+                                                 lambda: get_cache_stats("entries")))
+
+
+@app.before_request
+def start_request_timer():
+    request.started_at = time.monotonic()
+
+
+@app.after_request
+def observe_request_duration(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    labels = (request.method, route, str(response.status_code))
+    metrics.http_request_seconds.observe(time.monotonic() - request.started_at, labels)
+    return response
+
+
 @app.route("/api/scenarios", methods=["GET"])
 def scenarios():
     threading.current_thread().name = "REST"
-    testcases = eco.get_test_cases()
+    scenario_infos = list(catalog.items())
     return {
                "success": True,
-               "scenarios": [h for h in testcases],
-               "pretty_names": [testcases[h]["prettyName"] for h in testcases]
+               "scenarios": [h for h, _ in scenario_infos],
+               "pretty_names": [info.pretty_name for _, info in scenario_infos]
            }, 200
 
 
@@ -74,97 +119,146 @@ def TEMA_heatmaps_objectives():
 @app.route("/api/<scenario>/<objective1>/<objective2>/data", methods=["GET"])
 def data(scenario, objective1, objective2):
     threading.current_thread().name = "REST"
-    testcases = eco.get_test_cases()
-    tc = testcases[scenario]
-    path = os.path.join(tc["ofolder"], utils.format_objective_names(objective1, objective2))
-
-    base = utils.read_eval_file(os.path.join(path, "base.eval"))
-    base = {h: base[h] for h in base if h in [h for h in Globals.ECOROUTING_METRICS]}
-
-    pred = utils.read_eval_file(os.path.join(path, "pred.eval"))
-    pred = {h: pred[h] for h in pred if h in [h for h in Globals.ECOROUTING_METRICS]}
-
-    sim = utils.read_eval_file(os.path.join(path, "sim_fixed.eval"))
-    sim = {h: sim[h] for h in sim if h in [h for h in Globals.ECOROUTING_METRICS]}
-
-    baseTEMA = utils.read_eval_file(os.path.join(path, "baseTEMA.eval"))
-    baseTEMA = {h: baseTEMA[h] for h in baseTEMA if h in [h for h in Globals.TEMA_RESULTS_METRICS]}
-
-    simTEMA = utils.read_eval_file(os.path.join(path, "simTEMA.eval"))
-    simTEMA = {h: simTEMA[h] for h in simTEMA if h in [h for h in Globals.TEMA_RESULTS_METRICS]}
-
+    try:
+        response_format = response_formats.negotiate_format()
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 406
+    results = results_cache.get(scenario, objective1, objective2)
+    data = {
+        "objective1": objective1,
+        "objective2": objective2,
+        **results
+    }
+    data = response_formats.encode_data(data, response_format, RESULTS_EVAL_FILES)
+    return response_formats.make_response({"success": True, "data": data}, response_format)
+
+
+@app.route("/api/<scenario>/<objective1>/<objective2>/analytics", methods=["GET"])
+def analytics(scenario, objective1, objective2):
+    threading.current_thread().name = "REST"
     return {
                "success": True,
                "data": {
                    "objective1": objective1,
                    "objective2": objective2,
-                   "base": {**base},
-                   "pred": {**pred},
-                   "sim": {**sim},
-                   "baseTEMA": {**baseTEMA},
-                   "simTEMA": {**simTEMA},
+                   **analytics_cache.get(scenario, objective1, objective2)
                }
            }, 200
 
 
+@app.route("/api/<scenario>/data", methods=["GET"])
+def scenario_data(scenario):
+    threading.current_thread().name = "REST"
+    info = catalog.find(scenario)
+    if not info:
+        return {"success": False, "error": "Unknown scenario %s" % scenario}, 404
+    try:
+        response_format = response_formats.negotiate_format()
+    except ValueError as e:
+        return {"success": False, "error": str(e)}, 406
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or list(RESULTS_EVAL_FILES)
+    unknown_fields = [f for f in fields if f not in RESULTS_EVAL_FILES]
+    if unknown_fields:
+        return {"success": False, "error": "Unknown fields %s" % ", ".join(unknown_fields)}, 400
+
+    def generate():
+        threading.current_thread().name = "REST"
+        for objectives in sorted(utils.get_objective_combinations()):
+            objective1, objective2 = utils.reverse_format_objective_names(objectives)
+            try:
+                results = results_cache.get(scenario, objective1, objective2, info)
+            except FileNotFoundError:
+                continue
+            pair = {"objective1": objective1, "objective2": objective2, **{f: results[f] for f in fields}}
+            pair = response_formats.encode_data(pair, response_format, RESULTS_EVAL_FILES)
+            if response_format.name == "msgpack":
+                yield response_formats.dumps(pair, response_format)
+            else:
+                yield response_formats.dumps(pair, response_format) + b"\n"
+
+    mimetype = response_format.mimetype if response_format.name == "msgpack" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype)
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_endpoint():
+    threading.current_thread().name = "REST"
+    text = metrics.registry.render_all(Globals.METRICS_PIPELINE_FILE)
+    return Response(text, mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/cache/results", methods=["GET"])
+def results_cache_stats():
+    threading.current_thread().name = "REST"
+    return {"success": True, "data": {"results": results_cache.stats(), "analytics": analytics_cache.stats()}}, 200
+
+
 @app.route("/api/<scenario>/base/view", methods=["GET"])
 def base_view(scenario):
     threading.current_thread().name = "REST"
-    testcases = eco.get_test_cases()
-    tc = testcases[scenario]
-    netfile = os.path.join(tc["ifolder"], tc["netfile"])
-    roufile = os.path.join(tc["ofolder"], "inputdata", tc["bname"]) + "-base.rou.xml"
-    files = utils.get_simulation_files(netfile, roufile)
-    response = requests.post(Globals.VNC_MANAGER_API + "vnc/request", files=files)
-    return {"success": True, "data": response.json()["data"]}, 200
+    info = catalog.get(scenario)
+    response = vnc_client.request_simulation(info.net_path, info.base_route_path)
+    return {"success": True, "data": response["data"]}, 200
 
 
 @app.route("/api/<scenario>/optimized/<objective1>/<objective2>/view/<solution>", methods=["GET"])
 def optimized_view(scenario, objective1, objective2, solution):
     threading.current_thread().name = "REST"
-    testcases = eco.get_test_cases()
-    tc = testcases[scenario]
-    netfile = os.path.join(tc["ifolder"], tc["netfile"])
-    objs = utils.format_objective_names(objective1, objective2)
-    sol = "solution%d" % (int(solution) + 1)
-    roufile = os.path.join(tc["ofolder"], objs, sol, tc["bname"]) + ".rou.xml"
-    files = utils.get_simulation_files(netfile, roufile)
-    response = requests.post(Globals.VNC_MANAGER_API + "vnc/request", files=files)
-    return {"success": True, **response.json()}, 200
-
-
-@app.route("/api/<scenario>/base/heatmap/<metric>/<type>", methods=["GET"])
-def base_heatmap(scenario, metric, type):
-    threading.current_thread().name = "REST"
-    image_dir_name = utils.format_file_name_base(scenario)
+    info = catalog.get(scenario)
+    roufile = info.get_solution(objective1, objective2, int(solution) + 1).route_path
+    response = vnc_client.request_simulation(info.net_path, roufile)
+    return {"success": True, **response}, 200
+
+
+def send_heatmap(image_dir_name, metric, type):
+    size = request.args.get("size", "full")
+    file_type = request.args.get("format", Globals.HEATMAPS_FILE_TYPE)
+    if size != "full" and size not in Globals.HEATMAPS_VARIANT_SIZES:
+        return {"success": False, "error": "Unknown heatmap size %s" % size}, 400
+    if file_type not in Globals.HEATMAPS_VARIANT_FILE_TYPES:
+        return {"success": False, "error": "Unknown heatmap format %s" % file_type}, 400
     if type == "routes":
         file_name = metric + "_routes." + Globals.HEATMAPS_FILE_TYPE
     else:
         file_name = metric + "." + Globals.HEATMAPS_FILE_TYPE
     path = os.path.join(Globals.HEATMAPS_DIR, image_dir_name, file_name)
-    return send_file(path, mimetype="image/png")
+    path = heatmap_variants.get_variant(path, image_dir_name, size, file_type)
+    return send_media(path, Globals.HEATMAPS_VARIANT_FILE_TYPES[file_type])
+
+
+@app.route("/api/<scenario>/base/heatmap/<metric>/<type>", methods=["GET"])
+def base_heatmap(scenario, metric, type):
+    threading.current_thread().name = "REST"
+    image_dir_name = catalog.get(scenario).base_media_name
+    return send_heatmap(image_dir_name, metric, type)
 
 
 @app.route("/api/<scenario>/optimized/<objective1>/<objective2>/heatmap/<solution>/<metric>/<type>", methods=["GET"])
 def optimized_heatmap(scenario, objective1, objective2, solution, metric, type):
     threading.current_thread().name = "REST"
-    image_dir_name = utils.format_file_name_sim(scenario, objective1, objective2, int(solution))
-    if type == "routes":
-        file_name = metric + "_routes." + Globals.HEATMAPS_FILE_TYPE
-    else:
-        file_name = metric + "." + Globals.HEATMAPS_FILE_TYPE
-    path = os.path.join(Globals.HEATMAPS_DIR, image_dir_name, file_name)
+    image_dir_name = catalog.get(scenario).get_solution(objective1, objective2, int(solution)).media_name
     # if not os.path.exists(path):
     #     path = os.path.join(Globals.HEATMAPS_DIR, utils.format_file_name_base(scenario), file_name)
-    return send_file(path, mimetype="image/png")
+    return send_heatmap(image_dir_name, metric, type)
+
+
+@app.route("/api/heatmaps/tiles/<image_dir_name>/<path:tile_path>", methods=["GET"])
+def heatmap_tiles(image_dir_name, tile_path):
+    threading.current_thread().name = "REST"
+    path = safe_join(Globals.HEATMAPS_VARIANTS_DIR, image_dir_name, tile_path)
+    if not path or not os.path.isfile(path):
+        return {"success": False, "error": "Unknown tile %s" % tile_path}, 404
+    if path.endswith(".dzi"):
+        return send_media(path, "application/xml")
+    return send_media(path, Globals.HEATMAPS_VARIANT_FILE_TYPES[Globals.HEATMAPS_TILE_FILE_TYPE])
 
 
 @app.route("/api/<scenario>/base/video", methods=["GET"])
 def base_video(scenario):
     threading.current_thread().name = "REST"
-    video_name = utils.format_file_name_base(scenario) + "." + Globals.VIDEOS_FILE_TYPE
+    video_name = catalog.get(scenario).base_media_name + "." + Globals.VIDEOS_FILE_TYPE
     path = os.path.join(Globals.VIDEOS_DIR, video_name)
-    return send_file(path, mimetype="video/mp4")
+    return send_media(path, "video/mp4")
 
 
 @app.route("/api/<scenario>/optimized/<objective1>/<objective2>/video/<solution>", methods=["GET"])
@@ -174,16 +268,13 @@ def optimized_video(scenario, objective1, objective2, solution):
     video_name = utils.format_file_name_sim(scenario, objective1, objective2, sol)
     video_name = video_name + "." + Globals.VIDEOS_FILE_TYPE
     path = os.path.join(Globals.VIDEOS_DIR, video_name)
-    if not os.path.exists(path):
+    fallback = not os.path.exists(path)
+    if fallback:
         path = os.path.join(Globals.VIDEOS_DIR, utils.format_file_name_base(scenario) + "." + Globals.VIDEOS_FILE_TYPE)
-    return send_file(path, mimetype="video/mp4")
-
-
-def main():
-    threading.current_thread().name = "Main"
+    return send_media(path, "video/mp4", fallback=fallback)
 
-    logger.info("Main", "---------------------- MobiWise backend starting ----------------------")
 
+def rotate_logs():
     if os.path.exists(Globals.LOGS_DIR):
         old_logs = []
         log_files = []
@@ -200,51 +291,205 @@ def main():
                 shutil.move(os.path.join(Globals.LOGS_DIR, file), os.path.join(old_logs_dir, file))
     else:
         utils.ensure_dir_exists(Globals.LOGS_DIR)
+
+
+def main(coordinate=False, coordinator_host=Globals.DISTRIBUTED_COORDINATOR_HOST,
+         coordinator_port=Globals.DISTRIBUTED_COORDINATOR_PORT):
+    threading.current_thread().name = "Main"
+
+    logger.info("Main", "---------------------- MobiWise backend starting ----------------------")
+
     utils.ensure_dir_exists(Globals.VIDEOS_TARGZ_DIR)
     utils.ensure_dir_exists(Globals.VIDEOS_DIR)
     utils.ensure_dir_exists(Globals.HEATMAPS_DIR)
+    utils.ensure_dir_exists(Globals.HEATMAPS_VARIANTS_DIR)
 
     def update_tasks(silent=True):
-        for _, task in eco.check_content(silent=silent).items():
+        scan_start = time.monotonic()
+        content = eco.check_content(silent=silent)
+        metrics.content_check_seconds.observe(time.monotonic() - scan_start)
+        for _, task in content.items():
             task_manager.add_task(task)
 
+    def dump_metrics():
+        metrics.registry.dump(Globals.METRICS_PIPELINE_FILE)
+
     scheduler = BackgroundScheduler()
     scheduler.start()
-    scheduler.add_job(eval_file_fixer.run, 'interval', seconds=Globals.EVAL_FILE_FIXER_TIMEOUT)
-    scheduler.add_job(TEMA_eval_file_generator.run, 'interval', seconds=Globals.TEMA_EVAL_FILE_GENERATOR_TIMEOUT)
-    scheduler.add_job(heatmap_organizer.run, 'interval', seconds=Globals.HEATMAP_ORGANIZER_TIMEOUT)
-    scheduler.add_job(video_generator.run, 'interval', seconds=Globals.VIDEO_GENERATOR_TIMEOUT)
-
-    task_manager = eco.EcoRoutingTaskManager(Globals.TASK_MANAGER_MAX_THREADS, update_tasks)
+    for run, seconds in [(eval_file_fixer.run, Globals.EVAL_FILE_FIXER_TIMEOUT),
+                         (TEMA_eval_file_generator.run, Globals.TEMA_EVAL_FILE_GENERATOR_TIMEOUT),
+                         (heatmap_organizer.run, Globals.HEATMAP_ORGANIZER_TIMEOUT),
+                         (video_generator.run, Globals.VIDEO_GENERATOR_TIMEOUT)]:
+        scheduler.add_job(post_processor.run_exclusive, 'interval', args=[run], seconds=seconds)
+    scheduler.add_job(dump_metrics, 'interval', seconds=Globals.METRICS_PIPELINE_DUMP_INTERVAL)
+    scheduler.add_job(artifacts.collect_garbage, 'interval', seconds=Globals.ARTIFACT_STORE_GC_INTERVAL)
+
+    task_manager = eco.EcoRoutingTaskManager(Globals.TASK_MANAGER_MAX_THREADS, update_tasks,
+                                             Globals.TASK_MANAGER_SCHEDULING_POLICY,
+                                             Globals.TASK_MANAGER_RESOURCE_CAPACITIES)
+    clean_orphaned_workspaces("..")
+    task_store = TaskStore(Globals.TASK_STORE_PATH)
+    task_manager.duration_model = DurationModel(task_store)
+    task_manager.restore(task_store)
     update_tasks(silent=False)
-    task_manager.start()
+
+    # changed outputs wake the content checker up, and are post-processed right away, on a thread of their own as the
+    # jobs wait for the periodic post-processing scans to finish
+    def on_path_changed(path):
+        for job in post_processor.get_jobs(path):
+            post_process_bus.publish(events.POST_PROCESS, job)
+        content_changed.set()
+
+    def on_task_finished(task):
+        if task.status == TaskStatus.Completed:
+            for path in task.get_output_paths():
+                on_path_changed(path)
+
+    post_process_bus = events.EventBus("PostProcessBus")
+    post_process_bus.subscribe(events.POST_PROCESS, post_processor.run_job)
+    post_process_bus.start()
+    event_bus = events.EventBus()
+    event_bus.subscribe(events.PATH_CHANGED, on_path_changed)
+    event_bus.subscribe(events.TASK_FINISHED, on_task_finished)
+    event_bus.start()
+    task_manager.event_bus = event_bus
+    watched_dirs = [info.output_dir for _, info in catalog.items()]
+    watcher = events.DirectoryWatcher(event_bus, watched_dirs + [Globals.VIDEOS_TARGZ_DIR, Globals.HEATMAPS_DIR])
+    watcher.start()
+    # as a coordinator, the tasks are run by the workers that lease them instead of by this task manager
+    coordinator = distributed.Coordinator(task_manager, coordinator_host, coordinator_port) if coordinate else None
+    workspace_pool = None
+    if coordinator:
+        scheduler.add_job(coordinator.expire_leases, 'interval', seconds=Globals.DISTRIBUTED_HEARTBEAT_INTERVAL)
+        coordinator.start()
+    else:
+        workspace_pool = WorkspacePool("..")
+        for template in eco.WORKSPACE_TEMPLATES:
+            workspace_pool.register(template)
+        workspace_pool.start()
+        task_manager.workspace_pool = workspace_pool
+        task_manager.start()
     last_status = datetime.now()
     try:
-        while running:
+        while not stopping.is_set():
             print_status = (datetime.now() - last_status).total_seconds() >= Globals.CONTENT_CHECKER_LOG_TIMEOUT
             update_tasks(silent=not print_status)
             if print_status:
                 task_manager.status()
                 last_status = datetime.now()
             logger.flush()
-            time.sleep(Globals.CONTENT_CHECKER_TIMEOUT)
+            content_changed.wait(Globals.CONTENT_CHECKER_TIMEOUT)
+            content_changed.clear()
     except:
         pass
     finally:
         logger.flush()
+        if coordinator:
+            coordinator.stop()
         task_manager.stop(wait=True)
+        if workspace_pool:
+            workspace_pool.stop()
+        watcher.stop()
+        event_bus.stop()
+        post_process_bus.stop()
         eco.check_content(silent=False)
         scheduler.shutdown()
         task_manager.status()
+        task_store.close()
         logger.info("Main", "---------------------- MobiWise backend stopping ----------------------")
         logger.flush()
 
 
-if __name__ == "__main__":
+def handle_stop_signals():
+    def stop(signum, frame):
+        stopping.set()
+        content_changed.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+
+def run_pipeline(coordinate=False, coordinator_host=Globals.DISTRIBUTED_COORDINATOR_HOST,
+                 coordinator_port=Globals.DISTRIBUTED_COORDINATOR_PORT):
+    # pipeline daemon: runs until SIGTERM/SIGINT, then lets the running tasks finish
+    handle_stop_signals()
+    main(coordinate, coordinator_host, coordinator_port)
+
+
+def run_worker(coordinator_url, worker_index):
+    # distributed worker: runs tasks leased from the coordinator until SIGTERM/SIGINT, then finishes the running ones
+    threading.current_thread().name = "Worker"
+    handle_stop_signals()
+    distributed.run_worker(coordinator_url, worker_index, stopping)
+
+
+def run_api_server():
+    # production API: a pre-forking gunicorn server; every worker reads the results and media the pipeline writes
+    from gunicorn.app.base import BaseApplication
+
+    class APIServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", "%s:%d" % (Globals.API_HOST, Globals.API_PORT))
+            self.cfg.set("workers", Globals.API_WORKERS)
+            self.cfg.set("threads", Globals.API_THREADS)
+            self.cfg.set("post_request", lambda worker, req, environ, resp: logger.flush())
+
+        def load(self):
+            return app
+
+    APIServer().run()
+
+
+def launch(role, coordinator_url=Globals.DISTRIBUTED_COORDINATOR_URL, worker_index=0,
+           coordinator_host=Globals.DISTRIBUTED_COORDINATOR_HOST,
+           coordinator_port=Globals.DISTRIBUTED_COORDINATOR_PORT):
     threading.current_thread().name = "Launcher"
-    running = True
-    content_checker_thread = threading.Thread(target=main)
-    content_checker_thread.start()
-    app.run(port=5000)
-    running = False
-    content_checker_thread.join()
+    rotate_logs()
+    if role == "dev":
+        content_checker_thread = threading.Thread(target=main)
+        content_checker_thread.start()
+        app.run(host=Globals.API_HOST, port=Globals.API_PORT)
+        stopping.set()
+        content_changed.set()
+        content_checker_thread.join()
+    elif role == "api":
+        run_api_server()
+    elif role == "pipeline":
+        run_pipeline()
+    elif role == "coordinator":
+        run_pipeline(True, coordinator_host, coordinator_port)
+    elif role == "worker":
+        run_worker(coordinator_url, worker_index)
+    elif role == "all":
+        pipeline_process = multiprocessing.Process(target=run_pipeline, name="Pipeline")
+        pipeline_process.start()
+        try:
+            run_api_server()
+        finally:
+            pipeline_process.terminate()
+            pipeline_process.join()
+
+
+stopping = threading.Event()
+# set to run the content checker before its next periodic scan
+content_changed = threading.Event()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MobiWise backend")
+    parser.add_argument("--role", choices=["dev", "api", "pipeline", "all", "coordinator", "worker"], default="dev",
+                        help="dev: pipeline and Flask development server in one process (default); "
+                             "api: REST API under gunicorn; pipeline: task manager and periodic jobs only; "
+                             "all: api and pipeline as separate processes; "
+                             "coordinator: pipeline that leases its tasks to workers instead of running them; "
+                             "worker: runs tasks leased from a coordinator")
+    parser.add_argument("--coordinator-url", default=Globals.DISTRIBUTED_COORDINATOR_URL,
+                        help="coordinator the worker leases tasks from")
+    parser.add_argument("--coordinator-host", default=Globals.DISTRIBUTED_COORDINATOR_HOST,
+                        help="address the coordinator listens for workers on (e.g. 0.0.0.0 for remote workers)")
+    parser.add_argument("--coordinator-port", type=int, default=Globals.DISTRIBUTED_COORDINATOR_PORT,
+                        help="port the coordinator listens for workers on")
+    parser.add_argument("--worker-index", type=int, default=0,
+                        help="index of the worker among those sharing a host, which gives it its own displays")
+    args = parser.parse_args()
+    launch(args.role, args.coordinator_url, args.worker_index, args.coordinator_host, args.coordinator_port)
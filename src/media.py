@@ -0,0 +1,57 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+from flask import send_file
+
+from globals import Globals
+
+
+class MediaETagCache:
+    def __init__(self):
+        self.etags: Dict[str, Tuple[tuple, str]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def compute_etag(path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(Globals.MEDIA_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, path) -> str:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.etags.get(path)
+            if cached and cached[0] == signature:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        etag = MediaETagCache.compute_etag(path)
+        with self.lock:
+            self.etags[path] = (signature, etag)
+        return etag
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.etags)}
+
+
+media_etags = MediaETagCache()
+
+
+def send_media(path, mimetype, fallback=False):
+    # conditional responses answer If-None-Match/If-Modified-Since with 304 and Range requests with 206
+    # a fallback (e.g. the base video served until the optimized one exists) is revalidated on every request, so that the
+    # actual media is picked up as soon as it is there
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=media_etags.get(path),
+                         max_age=None if fallback else Globals.MEDIA_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    if fallback:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,183 @@
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from globals import Globals
+
+
+# Metrics in the Prometheus text exposition format, served by /api/metrics
+# Metrics are scoped to the process that maintains them: the pipeline dumps its own to METRICS_PIPELINE_FILE, which
+# the API appends to its own when the two run as separate processes
+PIPELINE = "pipeline"
+API = "api"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else "%d" % value
+
+
+class Metric:
+    def __init__(self, name, description, metric_type, label_names: Tuple[str, ...], scope):
+        self.name = name
+        self.description = description
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self.scope = scope
+        self.lock = threading.Lock()
+
+    def format_labels(self, label_values: tuple, extra: Dict[str, str] = None) -> str:
+        labels = list(zip(self.label_names, label_values)) + list((extra or {}).items())
+        if not labels:
+            return ""
+        return "{" + ",".join(['%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels]) + "}"
+
+    def get_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        samples = self.get_samples()
+        if not samples:
+            return ""
+        header = ["# HELP %s %s" % (self.name, self.description), "# TYPE %s %s" % (self.name, self.metric_type)]
+        return "\n".join(header + samples) + "\n"
+
+
+class Counter(Metric):
+    def __init__(self, name, description, label_names=(), scope=API, metric_type="counter"):
+        Metric.__init__(self, name, description, metric_type, label_names, scope)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, label_values: tuple = (), amount: float = 1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get_samples(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return ["%s%s %s" % (self.name, self.format_labels(k), format_value(v)) for k, v in values]
+
+
+class Gauge(Counter):
+    def __init__(self, name, description, label_names=(), scope=API):
+        Counter.__init__(self, name, description, label_names, scope, "gauge")
+
+    def dec(self, label_values: tuple = (), amount: float = 1):
+        self.inc(label_values, -amount)
+
+    def set(self, label_values: tuple = (), value: float = 0):
+        with self.lock:
+            self.values[label_values] = value
+
+
+class Histogram(Metric):
+    def __init__(self, name, description, label_names=(), scope=API, buckets=Globals.METRICS_DURATION_BUCKETS):
+        Metric.__init__(self, name, description, "histogram", label_names, scope)
+        self.buckets = sorted(buckets)
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, label_values: tuple = ()):
+        with self.lock:
+            counts, totals = self.values.setdefault(label_values, [[0] * (len(self.buckets) + 1), [0, 0]])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def get_samples(self) -> List[str]:
+        samples = []
+        with self.lock:
+            values = [(k, list(counts), list(totals)) for k, (counts, totals) in self.values.items()]
+        for label_values, counts, (total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+                cumulative += bucket_count
+                labels = self.format_labels(label_values, {"le": format_value(bound)})
+                samples.append("%s_bucket%s %d" % (self.name, labels, cumulative))
+            samples.append("%s_sum%s %s" % (self.name, self.format_labels(label_values), format_value(total)))
+            samples.append("%s_count%s %d" % (self.name, self.format_labels(label_values), count))
+        return samples
+
+
+# values read when rendered, e.g. from the stats of a cache
+class CallbackMetric(Metric):
+    def __init__(self, name, description, metric_type, label_names, collect: Callable[[], Dict[tuple, float]],
+                 scope=API):
+        Metric.__init__(self, name, description, metric_type, label_names, scope)
+        self.collect = collect
+
+    def get_samples(self) -> List[str]:
+        return ["%s%s %s" % (self.name, self.format_labels(k), format_value(v)) for k, v in self.collect().items()]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, scopes=(PIPELINE, API)) -> str:
+        return "".join([metric.render() for metric in self.metrics if metric.scope in scopes])
+
+    def dump(self, path):
+        # written atomically, headed by the PID so the API can tell whether it is its own process
+        tmp_path = "%s.tmp" % path
+        with open(tmp_path, "w") as f:
+            f.write("# pid %d\n" % os.getpid())
+            f.write(self.render([PIPELINE]))
+        os.replace(tmp_path, path)
+
+    def render_all(self, pipeline_file) -> str:
+        text = self.render()
+        if os.path.exists(pipeline_file):
+            with open(pipeline_file) as f:
+                pid_line = f.readline()
+                max_age = Globals.METRICS_PIPELINE_DUMP_INTERVAL * 3
+                if pid_line != "# pid %d\n" % os.getpid() and time.time() - os.stat(pipeline_file).st_mtime < max_age:
+                    text = self.render([API]) + f.read()
+        return text
+
+
+registry = MetricsRegistry()
+
+tasks = registry.register(Gauge("mobiwise_tasks", "Tasks known to the task manager",
+                                ("task_type", "status"), PIPELINE))
+task_duration_seconds = registry.register(Histogram("mobiwise_task_duration_seconds", "Duration of finished tasks",
+                                                    ("task_type", "mode", "status"), PIPELINE))
+task_stage_seconds = registry.register(Histogram("mobiwise_task_stage_seconds",
+                                                 "Time tasks spend in each status: Starting stages the workspace, "
+                                                 "Running runs the subprocess and Completing collects its outputs",
+                                                 ("task_type", "stage"), PIPELINE))
+threads = registry.register(Gauge("mobiwise_task_manager_threads", "Task manager threads, busy and maximum",
+                                  ("state",), PIPELINE))
+thread_busy_seconds = registry.register(Counter("mobiwise_task_manager_busy_seconds_total",
+                                                "Time task manager threads spent running tasks", (), PIPELINE))
+workspace_staging_seconds = registry.register(Histogram("mobiwise_workspace_staging_seconds",
+                                                        "Time taken to stage task workspaces", ("task_type",), PIPELINE))
+workspace_files = registry.register(Counter("mobiwise_workspace_files_total",
+                                            "Files staged into task workspaces, by whether they were linked or copied",
+                                            ("task_type", "method"), PIPELINE))
+workspace_copied_bytes = registry.register(Counter("mobiwise_workspace_copied_bytes_total",
+                                                   "Bytes copied into task workspaces", ("task_type",), PIPELINE))
+workspace_pool_leases = registry.register(Counter("mobiwise_workspace_pool_leases_total",
+                                                  "Workspaces leased from the pool, by whether one was already staged",
+                                                  ("template", "state"), PIPELINE))
+workspace_pool_reset_seconds = registry.register(Histogram("mobiwise_workspace_pool_reset_seconds",
+                                                           "Time taken to reset the workspaces given back to the pool",
+                                                           ("template",), PIPELINE))
+workspace_pool_idle = registry.register(Gauge("mobiwise_workspace_pool_idle",
+                                              "Staged workspaces waiting in the pool", ("template",), PIPELINE))
+artifact_store_publishes = registry.register(Counter("mobiwise_artifact_store_publishes_total",
+                                                     "Outputs published to the artifact store, by whether their "
+                                                     "content was new or already stored", ("result",), PIPELINE))
+artifact_store_deduplicated_bytes = registry.register(Counter("mobiwise_artifact_store_deduplicated_bytes_total",
+                                                              "Bytes of outputs whose content was already stored",
+                                                              (), PIPELINE))
+content_check_seconds = registry.register(Histogram("mobiwise_content_check_seconds",
+                                                    "Duration of the content checker scans", (), PIPELINE))
+http_request_seconds = registry.register(Histogram("mobiwise_http_request_duration_seconds",
+                                                   "Duration of REST requests", ("method", "route", "status"), API))
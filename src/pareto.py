@@ -0,0 +1,124 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+import utils
+from globals import Globals
+from results_cache import TEMA_RESULTS_KEYS, ResultsCache, load_results
+
+
+# Pareto analytics over the solutions of an objective pair; every metric is a cost, so lower is better
+
+
+def non_dominated_mask(points: np.ndarray) -> np.ndarray:
+    # dominated[i] is True when some point j is no worse than i in every objective and better in at least one
+    no_worse = np.all(points[None, :, :] <= points[:, None, :], axis=2)
+    better = np.any(points[None, :, :] < points[:, None, :], axis=2)
+    return ~np.any(no_worse & better, axis=1)
+
+
+def crowding_distance(points: np.ndarray) -> np.ndarray:
+    count, objectives = points.shape
+    distance = np.zeros(count)
+    if count <= 2:
+        distance[:] = np.inf
+        return distance
+    for m in range(objectives):
+        order = np.argsort(points[:, m], kind="stable")
+        values = points[order, m]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        spread = values[-1] - values[0]
+        if spread > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / spread
+    return distance
+
+
+def hypervolume_2d(points: np.ndarray, reference: np.ndarray) -> float:
+    # area dominated by the points and bounded by the reference point, which is normally the base (non-optimized) run
+    points = points[np.all(points < reference, axis=1)]
+    if not len(points):
+        return 0.0
+    points = points[non_dominated_mask(points)]
+    points = points[np.argsort(points[:, 0], kind="stable")]
+    next_x = np.append(points[1:, 0], reference[0])
+    return float(np.sum((next_x - points[:, 0]) * (reference[1] - points[:, 1])))
+
+
+def percentage_deltas(values: dict, reference: dict) -> dict:
+    deltas = {}
+    for h in values:
+        if h in reference and len(reference[h]):
+            base = reference[h][0]
+            delta = (np.asarray(values[h]) - base) / base * 100 if base else np.full(len(values[h]), np.nan)
+            deltas[h] = [None if np.isnan(d) else d for d in delta.tolist()]
+        elif h in reference:
+            # e.g. baseTEMA.eval is not generated yet
+            deltas[h] = [None] * len(values[h])
+    return deltas
+
+
+def analyze_front(results: dict, objective1, objective2, reference: np.ndarray) -> dict:
+    points = np.column_stack([np.asarray(results[objective1]), np.asarray(results[objective2])])
+    front = np.flatnonzero(non_dominated_mask(points))
+    crowding = crowding_distance(points[front])
+    return {
+        "front": front.tolist(),
+        "crowding_distance": [None if np.isinf(d) else d for d in crowding.tolist()],
+        "hypervolume": hypervolume_2d(points[front], reference)
+    }
+
+
+def get_solutions(path) -> List[int]:
+    # the solution numbers of a pair, in the order of the rows of sim_fixed.eval and simTEMA.eval
+    return sorted(int(name[len("solution"):]) for name in os.listdir(path)
+                  if name.startswith("solution") and os.path.isdir(os.path.join(path, name)))
+
+
+def is_simulated(path, solution) -> bool:
+    solution_dir = os.path.join(path, "solution%d" % solution)
+    return any(file.endswith("sim.ev") for file in os.listdir(solution_dir))
+
+
+def count_rows(values: dict) -> int:
+    return len(next(iter(values.values()), []))
+
+
+def select_rows(values: dict, rows: List[int]) -> dict:
+    return {h: [values[h][i] if i is not None else None for i in rows] for h in values}
+
+
+def align_solutions(path, results: dict) -> Tuple[List[int], dict, List[int]]:
+    # sim_fixed.eval holds all-zero placeholder rows for the solutions without a sim.ev file, which would dominate every
+    # simulated solution, so only the simulated ones are kept, along with the row of each in simTEMA.eval (None until it
+    # is generated, which requires the TEMA results of every solution, so that their TEMA deltas are None meanwhile)
+    solutions = get_solutions(path)
+    sim, sim_TEMA = results["sim"], results["simTEMA"]
+    TEMA_rows = dict(zip(solutions, range(count_rows(sim_TEMA)))) if count_rows(sim_TEMA) == len(solutions) else {}
+    sim_rows = [i for i, solution in enumerate(solutions[:count_rows(sim)])
+                if is_simulated(path, solution) and any(sim[h][i] for h in sim)]
+    simulated = [solutions[i] for i in sim_rows]
+    return simulated, select_rows(sim, sim_rows), [TEMA_rows.get(solution) for solution in simulated]
+
+
+def analyze(path) -> dict:
+    objective1, objective2 = utils.reverse_format_objective_names(os.path.basename(path))
+    results = load_results(path, TEMA_RESULTS_KEYS)
+    base = results["base"]
+    reference = np.array([base[objective1][0], base[objective2][0]])
+    solutions, sim, TEMA_rows = align_solutions(path, results)
+    sim_TEMA_deltas = percentage_deltas(results["simTEMA"], results["baseTEMA"])
+    return {
+        "objectives": [objective1, objective2],
+        "reference": reference.tolist(),
+        "pred": analyze_front(results["pred"], objective1, objective2, reference),
+        "solutions": solutions,
+        "sim": analyze_front(sim, objective1, objective2, reference),
+        "deltas": {
+            "sim": percentage_deltas(sim, base),
+            "simTEMA": select_rows(sim_TEMA_deltas, TEMA_rows)
+        }
+    }
+
+
+analytics_cache = ResultsCache(Globals.ANALYTICS_CACHE_MAX_ENTRIES, analyze, TEMA_RESULTS_KEYS)
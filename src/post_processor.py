@@ -0,0 +1,99 @@
+import os
+import threading
+from typing import Callable, List, Tuple
+
+import TEMA_eval_file_generator
+import eval_file_fixer
+import heatmap_organizer
+import utils
+import video_generator
+from globals import Globals
+from logger import logger
+from scenario_catalog import catalog
+
+# Post-processing of task outputs, either of everything by the periodic scans or only of what a changed path affects:
+# - a sim.ev file under an objective pair directory: the pair's sim_fixed.eval
+# - a TEMA results file: the baseTEMA.eval of every pair of the scenario, or the simTEMA.eval of its pair
+# - a heatmaps directory or a videos tar.gz file: that directory or file
+# Directories moved in are treated as if any of their files changed
+SIM_EVAL = "sim_eval"
+TEMA_EVAL = "TEMA_eval"
+HEATMAPS = "heatmaps"
+VIDEO = "video"
+
+# files written by the post-processing itself, which must not trigger it again
+GENERATED_FILES = ["sim_fixed.eval", "baseTEMA.eval", "simTEMA.eval"]
+
+lock = threading.RLock()
+
+
+def run_exclusive(run: Callable):
+    with lock:
+        run()
+
+
+def is_within(path, dir) -> bool:
+    path = os.path.abspath(path)
+    dir = os.path.abspath(dir)
+    return path == dir or path.startswith(dir + os.sep)
+
+
+def get_top_level_name(path, dir):
+    name = os.path.relpath(path, dir).split(os.sep)[0]
+    return name if name != "." else None
+
+
+def get_jobs(path) -> List[Tuple[str, tuple]]:
+    file_name = os.path.basename(path)
+    is_dir = os.path.isdir(path)
+    if file_name in GENERATED_FILES:
+        return []
+    if is_within(path, Globals.VIDEOS_TARGZ_DIR):
+        name = get_top_level_name(path, Globals.VIDEOS_TARGZ_DIR)
+        return [(VIDEO, (name,))] if name and name.endswith(Globals.VIDEOS_TARGZ_FILE_TYPE) else []
+    if is_within(path, Globals.HEATMAPS_DIR):
+        name = get_top_level_name(path, Globals.HEATMAPS_DIR)
+        return [(HEATMAPS, (name,))] if name else []
+    sim_eval = is_dir or file_name.endswith("sim.ev")
+    TEMA_eval = is_dir or file_name == Globals.TEMA_RESULTS_FILE_NAME
+    jobs = []
+    for scenario, info in catalog.items():
+        if not is_within(path, info.output_dir):
+            continue
+        for obj_pair in utils.get_objective_combinations():
+            objective1, objective2 = utils.reverse_format_objective_names(obj_pair)
+            if TEMA_eval and is_within(path, info.base_output_dir):
+                jobs.append((TEMA_EVAL, (scenario, objective1, objective2)))
+            elif is_within(path, info.get_objectives_dir(objective1, objective2)):
+                if sim_eval:
+                    jobs.append((SIM_EVAL, (scenario, objective1, objective2)))
+                if TEMA_eval:
+                    jobs.append((TEMA_EVAL, (scenario, objective1, objective2)))
+        break
+    return jobs
+
+
+def run_job(job: Tuple[str, tuple]):
+    kind, args = job
+    logger.info("PostProcessor", "Running %s post-processing for %s" % (kind, args))
+    with lock:
+        if kind == VIDEO:
+            file = args[0]
+            if os.path.exists(os.path.join(Globals.VIDEOS_TARGZ_DIR, file)):
+                video_generator.generate_videos([video_generator.fix_video_targz_file_name(file)])
+        elif kind == HEATMAPS:
+            dir = args[0]
+            if os.path.isdir(os.path.join(Globals.HEATMAPS_DIR, dir)):
+                heatmap_organizer.organize_heatmaps([heatmap_organizer.fix_heatmaps_dir_name(dir)])
+        elif kind in [SIM_EVAL, TEMA_EVAL]:
+            scenario, objective1, objective2 = args
+            info = catalog.find(scenario)
+            if not info:
+                return
+            if kind == SIM_EVAL:
+                dir = info.get_objectives_dir(objective1, objective2)
+                if os.path.isdir(dir):
+                    eval_file_fixer.fix_eval_files([dir])
+            else:
+                dirs = TEMA_eval_file_generator.find_objective_pair_TEMA_res_file_dirs(info, objective1, objective2)
+                TEMA_eval_file_generator.generate_TEMA_eval_files(dirs)
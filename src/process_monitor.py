@@ -0,0 +1,113 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from subprocess import TimeoutExpired
+from typing import Callable, Tuple
+
+from globals import Globals
+
+
+# Watchdog for the EcoRouting and TEMA subprocesses: a process that runs past its timeout, or writes nothing to stdout
+# for inactivity_timeout seconds, is stopped along with its whole process group (it must be started with
+# start_new_session=True), first with SIGTERM and, after a grace period, with SIGKILL
+class ProcessStalled(TimeoutExpired):
+    def __str__(self):
+        return "Command '%s' produced no output for %s seconds" % (self.cmd, self.timeout)
+
+
+def kill_process_group(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        process.poll()
+        return
+    deadline = time.monotonic() + Globals.PROCESS_MONITOR_KILL_GRACE
+    while time.monotonic() < deadline:
+        process.poll()
+        try:
+            os.killpg(process.pid, 0)
+        except (ProcessLookupError, PermissionError):
+            return
+        time.sleep(0.1)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
+
+
+# Reads the stdout of a process in a thread, so that its input may be written piece by piece (e.g. one Sim solution at
+# a time) while the timeouts are enforced
+class ProcessMonitor:
+    def __init__(self, process: subprocess.Popen, timeout: float = None, inactivity_timeout: float = None):
+        self.process = process
+        self.timeout = timeout
+        self.inactivity_timeout = inactivity_timeout
+        self.output = []
+        self.started_at = time.monotonic()
+        self.last_output_at = self.started_at
+        self.reader = threading.Thread(target=self.read, name="%s-stdout" % threading.current_thread().name,
+                                       daemon=True)
+        self.reader.start()
+
+    def read(self):
+        for chunk in iter(lambda: self.process.stdout.read1(Globals.PROCESS_MONITOR_READ_SIZE), b""):
+            self.output.append(chunk)
+            self.last_output_at = time.monotonic()
+
+    def get_output(self) -> bytes:
+        return b"".join(self.output)
+
+    def write(self, data: bytes, close=False):
+        try:
+            if data:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+            if close:
+                self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def reset_timeout(self):
+        self.started_at = time.monotonic()
+
+    def check(self):
+        now = time.monotonic()
+        if self.timeout and now - self.started_at > self.timeout:
+            kill_process_group(self.process)
+            self.reader.join()
+            raise TimeoutExpired(self.process.args, self.timeout, self.get_output())
+        if self.inactivity_timeout and now - self.last_output_at > self.inactivity_timeout:
+            kill_process_group(self.process)
+            self.reader.join()
+            raise ProcessStalled(self.process.args, self.inactivity_timeout, self.get_output())
+
+    def wait_until(self, condition: Callable[[], bool], interval=Globals.PROCESS_MONITOR_POLL_INTERVAL) -> bool:
+        # False if the process closed its output before the condition held
+        while not condition():
+            if not self.reader.is_alive():
+                return condition()
+            self.reader.join(interval)
+            if self.reader.is_alive():
+                self.check()
+        return True
+
+    def wait(self) -> bytes:
+        self.wait_until(lambda: False)
+        remaining = self.timeout - (time.monotonic() - self.started_at) if self.timeout else None
+        try:
+            self.process.wait(timeout=max(0, remaining) if remaining is not None else None)
+        except TimeoutExpired:
+            kill_process_group(self.process)
+            raise TimeoutExpired(self.process.args, self.timeout, self.get_output())
+        return self.get_output()
+
+
+def communicate(process: subprocess.Popen, input: bytes = None, timeout: float = None,
+                inactivity_timeout: float = None) -> Tuple[bytes, None]:
+    monitor = ProcessMonitor(process, timeout, inactivity_timeout)
+    if process.stdin:
+        monitor.write(input, close=True)
+    return monitor.wait(), None
@@ -0,0 +1,92 @@
+import json
+import math
+
+import numpy as np
+from flask import Response, request
+
+import utils
+from globals import Globals
+
+if utils.is_module_available("msgpack"):
+    import msgpack
+else:
+    msgpack = None
+
+
+# Encodings available for the results endpoints, picked with ?format= or the Accept header:
+# - json: the default, Flask's own JSON; ?precision=N rounds every float to N significant digits instead
+# - msgpack: each result set maps metric names to raw little-endian float64 (or ?dtype=float32) column buffers, and
+#   the encoded data carries its "dtype"; the bulk endpoint streams one msgpack object per objective pair
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/x-msgpack"
+FORMAT_MIMETYPES = {"json": JSON_MIMETYPE, "msgpack": MSGPACK_MIMETYPE}
+COLUMN_DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+
+class ResponseFormat:
+    def __init__(self, name, precision=None, dtype="float64"):
+        self.name = name
+        self.mimetype = FORMAT_MIMETYPES[name]
+        self.precision = precision
+        self.dtype = dtype
+
+    def is_default(self):
+        return self.name == "json" and self.precision is None
+
+
+def negotiate_format() -> ResponseFormat:
+    name = request.args.get("format")
+    if not name:
+        mimetype = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE], default=JSON_MIMETYPE)
+        name = "msgpack" if mimetype == MSGPACK_MIMETYPE else "json"
+    if name not in FORMAT_MIMETYPES or (name == "msgpack" and not msgpack):
+        raise ValueError("Unsupported response format %s" % name)
+    precision = request.args.get("precision", type=int)
+    if precision is not None and not 1 <= precision <= Globals.RESPONSE_MAX_PRECISION:
+        raise ValueError("Precision must be between 1 and %d" % Globals.RESPONSE_MAX_PRECISION)
+    dtype = request.args.get("dtype", "float64")
+    if dtype not in COLUMN_DTYPES:
+        raise ValueError("Unsupported column dtype %s" % dtype)
+    return ResponseFormat(name, precision, dtype)
+
+
+def format_float(value: float, float_format) -> str:
+    return float_format % value if math.isfinite(value) else json.dumps(value)
+
+
+def dumps_json(value, float_format) -> str:
+    if isinstance(value, dict):
+        return "{" + ",".join(["%s:%s" % (json.dumps(k), dumps_json(v, float_format)) for k, v in value.items()]) + "}"
+    if isinstance(value, list):
+        if all(type(v) is float for v in value):
+            return "[" + ",".join([format_float(v, float_format) for v in value]) + "]"
+        return "[" + ",".join([dumps_json(v, float_format) for v in value]) + "]"
+    if type(value) is float:
+        return format_float(value, float_format)
+    return json.dumps(value)
+
+
+def encode_data(data: dict, response_format: ResponseFormat, result_keys) -> dict:
+    if response_format.name != "msgpack":
+        return data
+    dtype = COLUMN_DTYPES[response_format.dtype]
+    encoded = {"dtype": response_format.dtype}
+    for key, value in data.items():
+        if key in result_keys:
+            value = {h: np.asarray(values, dtype=dtype).tobytes() for h, values in value.items()}
+        encoded[key] = value
+    return encoded
+
+
+def dumps(payload: dict, response_format: ResponseFormat) -> bytes:
+    if response_format.name == "msgpack":
+        return msgpack.packb(payload, use_bin_type=True)
+    if response_format.precision is not None:
+        return dumps_json(payload, "%%.%dg" % response_format.precision).encode()
+    return json.dumps(payload).encode()
+
+
+def make_response(payload: dict, response_format: ResponseFormat, status=200):
+    if response_format.is_default():
+        return payload, status
+    return Response(dumps(payload, response_format), status=status, mimetype=response_format.mimetype)
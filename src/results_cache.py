@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Tuple
+
+import eval_columns
+import utils
+from globals import Globals
+from scenario_catalog import ScenarioInfo, catalog
+
+
+# Eval files served by the results API, mapped to the key they are returned under and the metrics kept from them
+RESULTS_EVAL_FILES = {
+    "base": ("base.eval", Globals.ECOROUTING_METRICS),
+    "pred": ("pred.eval", Globals.ECOROUTING_METRICS),
+    "sim": ("sim_fixed.eval", Globals.ECOROUTING_METRICS),
+    "baseTEMA": ("baseTEMA.eval", Globals.TEMA_RESULTS_METRICS),
+    "simTEMA": ("simTEMA.eval", Globals.TEMA_RESULTS_METRICS),
+}
+
+
+def get_results_dir(scenario, objective1, objective2, info: ScenarioInfo = None):
+    return (info or catalog.get(scenario)).get_objectives_dir(objective1, objective2)
+
+
+# the eval files the analytics can do without, as the TEMA ones are only generated once every solution has its results
+TEMA_RESULTS_KEYS = ("baseTEMA", "simTEMA")
+
+
+def load_results(path, optional: Iterable[str] = ()) -> Dict[str, Dict[str, list]]:
+    # the metrics of a missing optional eval file have no values
+    results = {}
+    for key, (file_name, metrics) in RESULTS_EVAL_FILES.items():
+        file_path = os.path.join(path, file_name)
+        if key in optional and not os.path.exists(file_path):
+            results[key] = {h: [] for h in metrics}
+            continue
+        eval = eval_columns.read_eval_columns(file_path)
+        results[key] = {h: eval[h].tolist() for h in eval if h in metrics}
+    return results
+
+
+class ResultsCache:
+    class Entry:
+        def __init__(self, signature: tuple, value):
+            self.signature = signature
+            self.value = value
+
+    def __init__(self, max_entries: int, loader: Callable[[str], object], optional: Iterable[str] = ()):
+        self.max_entries = max_entries
+        self.loader = loader
+        # keys of RESULTS_EVAL_FILES the loader does without, recorded as None in the signature while missing
+        self.optional = set(optional)
+        self.entries: Dict[Tuple[str, str], ResultsCache.Entry] = OrderedDict()
+        self.loading: Dict[Tuple[str, str], threading.Event] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_signature(self, path) -> tuple:
+        # a missing eval file that is not optional raises FileNotFoundError here, before anything is parsed or cached
+        signature = []
+        for key, (file_name, _) in RESULTS_EVAL_FILES.items():
+            try:
+                stat = os.stat(os.path.join(path, file_name))
+            except FileNotFoundError:
+                if key not in self.optional:
+                    raise
+                signature.append(None)
+                continue
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get(self, scenario, objective1, objective2, info: ScenarioInfo = None):
+        # info is the scenario as found by the caller, if it already looked it up in the catalog
+        key = (scenario, utils.format_objective_names(objective1, objective2))
+        path = get_results_dir(scenario, objective1, objective2, info)
+        while True:
+            signature = self.get_signature(path)
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry.signature == signature:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                loading = self.loading.get(key)
+                if not loading:
+                    loading = threading.Event()
+                    self.loading[key] = loading
+                    self.misses += 1
+                    break
+            # another request is already parsing these files: wait for it and check the cache again
+            loading.wait()
+
+        try:
+            value = self.loader(path)
+            with self.lock:
+                self.entries[key] = ResultsCache.Entry(signature, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                self.loading.pop(key)
+            loading.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries
+            }
+
+
+results_cache = ResultsCache(Globals.RESULTS_CACHE_MAX_ENTRIES, load_results)
@@ -0,0 +1,158 @@
+import importlib
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+import utils
+from globals import Globals
+
+
+def load_test_cases_module():
+    if not utils.is_module_available("ecorouting"):
+        return utils.import_module(os.path.join(Globals.ECOROUTING_DIR, "testcases.py"), "testcases")
+    import ecorouting.testcases
+    return importlib.reload(ecorouting.testcases)
+
+
+TEMA_EDGE_DATA_FILES = [
+    Globals.TEMA_ROUTING_VEHICLES_EDGE_DATA_FILE_NAME,
+    Globals.TEMA_ALL_VEHICLES_EDGE_DATA_FILE_NAME,
+    Globals.TEMA_NOISE_EDGE_DATA_FILE_NAME
+]
+
+
+class ScenarioSolution:
+    def __init__(self, scenario: "ScenarioInfo", objective1, objective2, solution: int):
+        period = scenario.period
+        location = scenario.location
+        self.objective1 = objective1
+        self.objective2 = objective2
+        self.solution = solution
+        self.output_dir = os.path.join(scenario.get_objectives_dir(objective1, objective2), "solution%d" % solution)
+        self.route_path = os.path.join(self.output_dir, scenario.bname) + ".rou.xml"
+        self.media_name = utils.format_file_name_sim(scenario.name, objective1, objective2, solution)
+        self.TEMA_route_file = utils.get_sim_route_file_name_per_TEMA_spec(scenario.bname, period, location, solution)
+        self.TEMA_res_file = utils.get_sim_res_file_name_per_TEMA_spec(period, location, solution)
+        self.TEMA_files: List[Tuple[str, str]] = [("%s.rou.xml" % scenario.bname, self.TEMA_route_file)] + [
+            (f, utils.convert_sim_file_name_to_TEMA_spec(f, period, location, solution)) for f in TEMA_EDGE_DATA_FILES
+        ]
+
+
+class ScenarioInfo:
+    def __init__(self, name, test_case: dict):
+        period = test_case["period"]
+        location = test_case["location"]
+        self.name = name
+        self.test_case = MappingProxyType(dict(test_case))
+        self.pretty_name = test_case["prettyName"]
+        self.bname = test_case["bname"]
+        self.period = period
+        self.location = location
+
+        self.input_dir = test_case["ifolder"]
+        self.net_file = test_case["netfile"]
+        self.route_file = test_case["roufile"]
+        self.net_path = os.path.join(self.input_dir, self.net_file)
+        self.route_path = os.path.join(self.input_dir, self.route_file)
+        self.TEMA_additional_file_path = os.path.join(self.input_dir, Globals.TEMA_ADDITIONAL_FILES_FILE_NAME)
+
+        self.output_dir = test_case["ofolder"]
+        self.base_output_dir = os.path.join(self.output_dir, "inputdata")
+        self.base_route_path = os.path.join(self.base_output_dir, self.bname) + "-base.rou.xml"
+        self.base_media_name = utils.format_file_name_base(name)
+        self.base_TEMA_route_file = utils.get_base_route_file_name_per_TEMA_spec(period)
+        self.base_TEMA_res_file = utils.get_base_res_file_name_per_TEMA_spec(period, location)
+        self.base_TEMA_files: List[Tuple[str, str]] = [("%s-base.rou.xml" % self.bname, self.base_TEMA_route_file)] + [
+            (f, utils.convert_base_file_name_to_TEMA_spec(f, period, location)) for f in TEMA_EDGE_DATA_FILES
+        ]
+
+        self.objectives_dirs: Dict[Tuple[str, str], str] = {}
+        for objectives in utils.get_objective_combinations():
+            objective1, objective2 = utils.reverse_format_objective_names(objectives)
+            path = os.path.join(self.output_dir, objectives)
+            self.objectives_dirs[(objective1, objective2)] = path
+            self.objectives_dirs[(objective2, objective1)] = path
+
+        self.solutions: Dict[Tuple[str, str, int], ScenarioSolution] = {}
+
+    def get_objectives_dir(self, objective1, objective2) -> str:
+        return self.objectives_dirs[(objective1, objective2)]
+
+    def get_solution(self, objective1, objective2, solution: int) -> ScenarioSolution:
+        key = (objective1, objective2, solution)
+        info = self.solutions.get(key)
+        if not info:
+            info = self.solutions.setdefault(key, ScenarioSolution(self, objective1, objective2, solution))
+        return info
+
+
+# An immutable view of the catalog: a reload builds a new snapshot and replaces the previous one with a single
+# assignment, so a caller that checks for a scenario before getting it, or reads several scenarios, does so from one
+# snapshot (catalog.snapshot, or catalog.find and catalog.items) and never sees a scenario dropped in between
+class ScenarioCatalogSnapshot:
+    def __init__(self, scenarios: Dict[str, ScenarioInfo]):
+        self.scenarios = MappingProxyType(scenarios)
+        self.test_cases = MappingProxyType({k: v.test_case for k, v in scenarios.items()})
+
+    def get(self, scenario) -> ScenarioInfo:
+        return self.scenarios[scenario]
+
+    def find(self, scenario) -> Optional[ScenarioInfo]:
+        return self.scenarios.get(scenario)
+
+    def items(self):
+        return self.scenarios.items()
+
+    def __contains__(self, scenario):
+        return scenario in self.scenarios
+
+    def __iter__(self):
+        return iter(self.scenarios)
+
+
+class ScenarioCatalog:
+    def __init__(self, excluded: List[str]):
+        self.excluded = excluded
+        self.reload_lock = threading.Lock()
+        self.module_file = None
+        self.module_mtime = None
+        self.snapshot = ScenarioCatalogSnapshot({})
+        self.reload()
+
+    def reload(self):
+        with self.reload_lock:
+            module = load_test_cases_module()
+            test_cases = getattr(module, "testcases")
+            scenarios = {k: ScenarioInfo(k, v) for k, v in test_cases.items() if k not in self.excluded}
+            self.module_file = module.__file__
+            self.module_mtime = os.stat(self.module_file).st_mtime_ns
+            self.snapshot = ScenarioCatalogSnapshot(scenarios)
+
+    def reload_if_changed(self) -> bool:
+        if os.stat(self.module_file).st_mtime_ns == self.module_mtime:
+            return False
+        self.reload()
+        return True
+
+    @property
+    def test_cases(self):
+        return self.snapshot.test_cases
+
+    def get(self, scenario) -> ScenarioInfo:
+        return self.snapshot.get(scenario)
+
+    def find(self, scenario) -> Optional[ScenarioInfo]:
+        return self.snapshot.find(scenario)
+
+    def items(self):
+        return self.snapshot.items()
+
+    def __contains__(self, scenario):
+        return scenario in self.snapshot
+
+    def __iter__(self):
+        return iter(self.snapshot)
+
+
+catalog = ScenarioCatalog(["ang-est", "portoSB_8AM9AM_fewerv", "portoA3_6PM7PM"])
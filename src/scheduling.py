@@ -0,0 +1,203 @@
+import heapq
+import itertools
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List
+
+
+# Scheduling policies decide which of the ready tasks (Available, with every ancestor Completed) a TaskManager thread
+# runs next. The TaskManager pushes a task dependency when it becomes ready, removes it when it stops being ready,
+# and pops the next one to run, skipping those that can_run rejects (e.g. for lack of resources) without changing
+# their place in the queue; policies may ask the TaskManager for a task's expected duration and group
+class SchedulingPolicy:
+    def __init__(self, task_manager):
+        self.task_manager = task_manager
+
+    def push(self, node):
+        raise NotImplementedError
+
+    def remove(self, task_id: str):
+        raise NotImplementedError
+
+    def pop(self, can_run: Callable[[object], bool] = None):
+        raise NotImplementedError
+
+    def invalidate(self, node):
+        # called by the TaskManager when the children or the expected duration of a task dependency change
+        pass
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+# runs tasks in the order they became ready
+class FIFOPolicy(SchedulingPolicy):
+    def __init__(self, task_manager):
+        super().__init__(task_manager)
+        self.queue: Dict[str, object] = OrderedDict()
+
+    def push(self, node):
+        self.queue.setdefault(node.task.task_id, node)
+
+    def remove(self, task_id: str):
+        self.queue.pop(task_id, None)
+
+    def pop(self, can_run: Callable[[object], bool] = None):
+        for task_id, node in self.queue.items():
+            if not can_run or can_run(node):
+                return self.queue.pop(task_id)
+        return None
+
+    def __len__(self):
+        return len(self.queue)
+
+
+# runs the task with the lowest priority value first, and ties in the order they became ready
+class PriorityPolicy(SchedulingPolicy):
+    def __init__(self, task_manager):
+        super().__init__(task_manager)
+        self.heap = []
+        self.entries: Dict[str, list] = {}
+        self.counter = itertools.count()
+
+    def get_priority(self, node):
+        raise NotImplementedError
+
+    def push(self, node):
+        if node.task.task_id not in self.entries:
+            entry = [self.get_priority(node), next(self.counter), node]
+            self.entries[node.task.task_id] = entry
+            heapq.heappush(self.heap, entry)
+
+    def remove(self, task_id: str):
+        entry = self.entries.pop(task_id, None)
+        if entry:
+            entry[-1] = None
+
+    def reprioritize(self):
+        for entry in self.entries.values():
+            entry[0] = self.get_priority(entry[-1])
+        self.heap = list(self.entries.values())
+        heapq.heapify(self.heap)
+
+    def pop(self, can_run: Callable[[object], bool] = None):
+        skipped = []
+        node = None
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            if entry[-1]:
+                if not can_run or can_run(entry[-1]):
+                    node = self.entries.pop(entry[-1].task.task_id)[-1]
+                    break
+                skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return node
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# shortest expected job first: cheap finishing steps do not wait behind hour-long simulations
+class ShortestJobFirstPolicy(PriorityPolicy):
+    def get_priority(self, node):
+        return self.task_manager.get_expected_duration(node.task)
+
+
+# favours the tasks furthest down a chain of completed parents, so work already started is finished first
+class FinishStartedPolicy(PriorityPolicy):
+    def get_priority(self, node):
+        depth = 0
+        while node.parent:
+            depth += 1
+            node = node.parent
+        return -depth
+
+
+# favours the tasks with the longest expected path to the end of their chain (e.g. Base -> Pred -> Sims -> TEMA), so
+# the chains that bound the total run time start first
+# Bottom levels are kept per task dependency, and dropped along the ancestors of one whose children or expected
+# duration change (as chains grow and the duration model learns while tasks wait); the queue is only reordered then
+class CriticalPathPolicy(PriorityPolicy):
+    def __init__(self, task_manager):
+        super().__init__(task_manager)
+        self.bottom_levels: Dict[object, float] = {}
+        self.stale = False
+
+    def get_priority(self, node):
+        return -get_bottom_level(node, self.task_manager.get_expected_duration, self.bottom_levels)
+
+    def invalidate(self, node):
+        # a cached bottom level implies cached ones for every descendant, so ancestors are only walked while cached
+        self.bottom_levels.pop(node, None)
+        node = node.parent
+        while node is not None and self.bottom_levels.pop(node, None) is not None:
+            node = node.parent
+        self.stale = True
+
+    def pop(self, can_run: Callable[[object], bool] = None):
+        if self.stale:
+            self.reprioritize()
+            self.stale = False
+        return PriorityPolicy.pop(self, can_run)
+
+
+# takes turns between task groups (scenarios), running each group's tasks in the order they became ready
+class RoundRobinPolicy(SchedulingPolicy):
+    def __init__(self, task_manager):
+        super().__init__(task_manager)
+        self.queues: Dict[Hashable, Dict[str, object]] = OrderedDict()
+        self.groups: Dict[str, Hashable] = {}
+
+    def push(self, node):
+        task_id = node.task.task_id
+        if task_id not in self.groups:
+            group = self.task_manager.get_task_group(node.task)
+            self.groups[task_id] = group
+            self.queues.setdefault(group, OrderedDict())[task_id] = node
+
+    def remove(self, task_id: str):
+        if task_id in self.groups:
+            self.queues[self.groups.pop(task_id)].pop(task_id)
+
+    def pop(self, can_run: Callable[[object], bool] = None):
+        empty_groups: List[Hashable] = [group for group, queue in self.queues.items() if not queue]
+        for group in empty_groups:
+            self.queues.pop(group)
+        for group, queue in self.queues.items():
+            for task_id, node in queue.items():
+                if not can_run or can_run(node):
+                    queue.pop(task_id)
+                    self.groups.pop(task_id)
+                    self.queues.move_to_end(group)
+                    return node
+        return None
+
+    def __len__(self):
+        return len(self.groups)
+
+
+POLICIES = {
+    "fifo": FIFOPolicy,
+    "sjf": ShortestJobFirstPolicy,
+    "round_robin": RoundRobinPolicy,
+    "finish_started": FinishStartedPolicy,
+    "critical_path": CriticalPathPolicy
+}
+
+
+def get_bottom_level(node, get_cost: Callable[[object], float], bottom_levels: Dict[object, float] = None) -> float:
+    # longest sum of task costs from the start of this task to the end of its last descendant, reusing and filling in
+    # the bottom levels already known, if given
+    if bottom_levels is not None and node in bottom_levels:
+        return bottom_levels[node]
+    children_level = [get_bottom_level(child, get_cost, bottom_levels) for child in node.children]
+    level = get_cost(node.task) + max(children_level, default=0)
+    if bottom_levels is not None:
+        bottom_levels[node] = level
+    return level
+
+
+def get_policy(name: str, task_manager) -> SchedulingPolicy:
+    if name not in POLICIES:
+        raise ValueError("Unknown scheduling policy %s (expected one of %s)" % (name, ", ".join(POLICIES)))
+    return POLICIES[name](task_manager)
@@ -1,10 +1,15 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from enum import Enum
 import threading
-from threading import Thread, Lock, RLock
-from typing import List, Dict
-
+import time
+from threading import Thread, RLock
+from typing import Callable, Dict, Hashable, List
+
+import events
+import metrics
+import scheduling
+from globals import Globals
 from logger import logger
 
 
@@ -26,16 +31,57 @@ class TaskRunMode(Enum):
 class Task:
     def __init__(self, task_id: str):
         self.task_id = task_id
-        self.status = TaskStatus.Available
+        self.status_listener: Callable[[Task, TaskStatus, TaskStatus], None] = None
+        self._status = TaskStatus.Available
+        self.started_at: datetime = None
+        self.status_changed_at = time.monotonic()
+        # subprocess limits: seconds in total, and seconds without any output
+        self.timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
+        self.inactivity_timeout = Globals.PROCESS_MONITOR_INACTIVITY_TIMEOUT
+        # set when the task failed on a stalled subprocess, which may well succeed on a second attempt
+        self.retryable = False
+        self.retries = 0
         self.cwd = os.getcwd()
+        # set while the isolated cwd is a workspace leased from the task manager's workspace pool
+        self.workspace = None
         self.env = os.environ.copy()
 
+    @property
+    def status(self) -> TaskStatus:
+        return self._status
+
+    @status.setter
+    def status(self, status: TaskStatus):
+        old_status = self._status
+        self._status = status
+        if self.status_listener and old_status != status:
+            self.status_listener(self, old_status, status)
+        if old_status != status:
+            self.status_changed_at = time.monotonic()
+
     def get_cwd_mode(self) -> TaskRunMode:
         raise NotImplementedError
 
     def get_display_mode(self) -> TaskRunMode:
         raise NotImplementedError
 
+    def get_resource_demands(self) -> Dict[str, float]:
+        return {"cpu": 1}
+
+    def get_input_paths(self) -> List[str]:
+        return []
+
+    def get_shallow_input_paths(self) -> List[str]:
+        # directories whose files are inputs too, but not their subdirectories (e.g. the outputs of sibling tasks)
+        return []
+
+    def get_output_paths(self) -> List[str]:
+        return []
+
+    def get_workspace_template(self):
+        # the template of the isolated cwd, for it to be leased from a workspace pool
+        return None
+
     def before(self):
         raise NotImplementedError
 
@@ -47,9 +93,13 @@ class Task:
 
 
 class TaskDependency:
-    def __init__(self, task: Task):
+    def __init__(self, task: Task, key: Hashable = None):
         self.task = task
+        self.key = key
+        self.parent = None
         self.children = []
+        # True when every ancestor has Completed, i.e. this task may run as soon as it is Available
+        self.reachable = False
 
     def has_children(self):
         return bool(self.children)
@@ -57,6 +107,12 @@ class TaskDependency:
     def add_child(self, child):
         if TaskDependency.is_task_dependency(child):
             self.children.append(child)
+            child.parent = self
+
+    def remove_child(self, child):
+        if self.is_child(child):
+            self.children.remove(child)
+            child.parent = None
 
     def is_child(self, child):
         return child in self.children
@@ -73,6 +129,39 @@ class TaskDependency:
         return TaskDependency is type(other)
 
 
+# Capacities of the resources tasks declare demands for (e.g. CPU slots, displays, memory in MB, MATLAB runtimes)
+# Resources without a capacity are unlimited, and a task demanding more than a capacity may still run on its own
+class ResourcePool:
+    def __init__(self, capacities: Dict[str, float]):
+        self.capacities = dict(capacities)
+        self.used = {resource: 0 for resource in self.capacities}
+        self.lock = RLock()
+
+    def can_acquire(self, demands: Dict[str, float]) -> bool:
+        with self.lock:
+            for resource, amount in demands.items():
+                if resource in self.capacities and self.used[resource] and \
+                        self.used[resource] + amount > self.capacities[resource]:
+                    return False
+            return True
+
+    def acquire(self, demands: Dict[str, float]):
+        with self.lock:
+            for resource, amount in demands.items():
+                if resource in self.used:
+                    self.used[resource] += amount
+
+    def release(self, demands: Dict[str, float]):
+        with self.lock:
+            for resource, amount in demands.items():
+                if resource in self.used:
+                    self.used[resource] -= amount
+
+    def get_used(self) -> Dict[str, float]:
+        with self.lock:
+            return dict(self.used)
+
+
 class TaskManager:
     dummy_task = Task("dummy")
 
@@ -81,28 +170,164 @@ class TaskManager:
             self.thread_id: int = thread_id
             self.thread: Thread = thread
 
-    def __init__(self, max_parallel_tasks, on_task_finish_callback: callable):
+    def __init__(self, max_parallel_tasks, on_task_finish_callback: callable, scheduling_policy="fifo",
+                 resource_capacities: Dict[str, float] = None):
         self.max_parallel_tasks = max_parallel_tasks
         self.callback_rlock = RLock()
         self.on_task_finish_callback = on_task_finish_callback
         self.tasks: Dict[str, Task] = {}
-        self.dep_tree_lock = Lock()
+        # task counts per status, kept up to date by add_task and task status changes
+        self.status_counts: Dict[TaskStatus, int] = {status: 0 for status in TaskStatus}
+        self.failed_task_ids = set()
+        # the dependency graph is kept up to date by add_task and task status changes, and ready_tasks holds the
+        # Available tasks whose ancestors have all Completed, in the order given by the scheduling policy
+        self.dep_graph_rlock = RLock()
+        self.dep_root = TaskDependency(Task("root"))
+        self.dep_root.task.status = TaskStatus.Completed
+        self.dep_root.reachable = True
+        self.dep_nodes: Dict[Hashable, TaskDependency] = {}
+        self.task_nodes: Dict[str, TaskDependency] = {}
+        self.orphan_nodes: Dict[Hashable, List[TaskDependency]] = {}
+        self.ready_tasks = scheduling.get_policy(scheduling_policy, self)
+        self.resource_pool = ResourcePool(resource_capacities or {})
         self.thread_pool_rlock = RLock()
         self.thread_info_pool: Dict[str, TaskManager.ThreadInfo] = {}
+        # added to the thread IDs to number the isolated displays, so task managers can share a host
+        self.display_offset = 0
+        # durable task state (see task_store.py), set by restore
+        self.task_store = None
+        # historical task durations (see duration_model.py)
+        self.duration_model = None
+        # finished tasks are published to it (see events.py)
+        self.event_bus = None
+        self.workspace_pool = None
         self.running = False
 
     def add_task(self, task: Task):
         retrial_statuses = [TaskStatus.Failed, TaskStatus.Completed]
-        if task.task_id not in self.tasks or (task.task_id in self.tasks and
-                                              self.tasks[task.task_id].status in retrial_statuses and
-                                              task.status == TaskStatus.Available):
-            self.tasks[task.task_id] = task
+        with self.dep_graph_rlock:
+            if task.task_id not in self.tasks or (task.task_id in self.tasks and
+                                                  self.tasks[task.task_id].status in retrial_statuses and
+                                                  task.status == TaskStatus.Available):
+                if task.task_id in self.tasks:
+                    self.count_task(self.tasks[task.task_id], self.tasks[task.task_id].status, -1)
+                self.tasks[task.task_id] = task
+                self.count_task(task, task.status, 1)
+                self.add_task_dependency(task)
+                if self.task_store:
+                    self.task_store.save_task(task, self.describe_task(task))
+
+    def count_task(self, task: Task, status: TaskStatus, delta: int):
+        self.status_counts[status] += delta
+        if status == TaskStatus.Failed:
+            if delta > 0:
+                self.failed_task_ids.add(task.task_id)
+            else:
+                self.failed_task_ids.discard(task.task_id)
+        metrics.tasks.inc((task.__class__.__name__, status.name), delta)
+
+    def describe_task(self, task: Task) -> dict:
+        raise NotImplementedError
 
-    def get_dependency_tree(self, root: TaskDependency, task_list: List[Task]) -> TaskDependency:
+    def build_task(self, description: dict) -> Task:
         raise NotImplementedError
 
+    def restore(self, task_store):
+        # rebuilds the tasks and their dependency graph from the task store, making the tasks that were interrupted
+        # while in progress available again, and persists every status transition from then on
+        in_progress_statuses = [TaskStatus.Taken, TaskStatus.Starting, TaskStatus.Running, TaskStatus.Completing]
+        interrupted = 0
+        with self.dep_graph_rlock:
+            for stored_task in task_store.load():
+                task = self.build_task(stored_task.description)
+                if not task:
+                    continue
+                task.status = stored_task.status
+                if task.status in in_progress_statuses:
+                    task.status = TaskStatus.Available
+                    task_store.save_status(task, task.status)
+                    interrupted += 1
+                self.tasks[task.task_id] = task
+                self.count_task(task, task.status, 1)
+                self.add_task_dependency(task)
+            self.task_store = task_store
+        print_info = (len(self.tasks), interrupted, task_store.path)
+        logger.info("TaskManager", "Restored %d tasks (%d interrupted) from %s" % print_info)
+
+    def get_dependency_key(self, task: Task) -> Hashable:
+        raise NotImplementedError
+
+    def get_parent_dependency_key(self, task: Task) -> Hashable:
+        raise NotImplementedError
+
+    def get_expected_duration(self, task: Task) -> float:
+        return 0
+
+    def get_task_group(self, task: Task) -> Hashable:
+        return None
+
+    def add_task_dependency(self, task: Task):
+        key = self.get_dependency_key(task)
+        if key is None:
+            return
+        node = self.dep_nodes.get(key)
+        if node:
+            node.task.status_listener = None
+            self.ready_tasks.remove(node.task.task_id)
+            node.task = task
+        else:
+            node = TaskDependency(task, key)
+            self.dep_nodes[key] = node
+            parent_key = self.get_parent_dependency_key(task)
+            parent = self.dep_nodes.get(parent_key) if parent_key is not None else None
+            if parent:
+                parent.add_child(node)
+            else:
+                self.dep_root.add_child(node)
+                if parent_key is not None:
+                    self.orphan_nodes.setdefault(parent_key, []).append(node)
+            for orphan in self.orphan_nodes.pop(key, []):
+                self.dep_root.remove_child(orphan)
+                node.add_child(orphan)
+        self.task_nodes[task.task_id] = node
+        task.status_listener = self.on_task_status_change
+        self.ready_tasks.invalidate(node)
+        self.update_task_dependency(node, True)
+
+    def update_task_dependency(self, node: TaskDependency, changed: bool):
+        stack = [(node, changed)]
+        while stack:
+            node, changed = stack.pop()
+            parent = node.parent
+            reachable = parent is None or (parent.reachable and parent.task.status == TaskStatus.Completed)
+            if reachable == node.reachable and not changed:
+                continue
+            node.reachable = reachable
+            if reachable and node.task.status == TaskStatus.Available:
+                self.ready_tasks.push(node)
+            else:
+                self.ready_tasks.remove(node.task.task_id)
+            stack.extend([(child, False) for child in node.children])
+
+    def on_task_status_change(self, task: Task, old_status: TaskStatus, new_status: TaskStatus):
+        if self.task_store:
+            try:
+                self.task_store.save_status(task, new_status)
+            except Exception as e:
+                logger.error("TaskManager", "Could not store status of task ID = %s: %s" % (task.task_id, e))
+        task_type = task.__class__.__name__
+        metrics.task_stage_seconds.observe(time.monotonic() - task.status_changed_at, (task_type, old_status.name))
+        with self.dep_graph_rlock:
+            if self.tasks.get(task.task_id) is task:
+                self.count_task(task, old_status, -1)
+                self.count_task(task, new_status, 1)
+            node = self.task_nodes.get(task.task_id)
+            if node and node.task is task:
+                self.update_task_dependency(node, True)
+
     def start(self):
         self.running = True
+        metrics.threads.set(("max",), self.max_parallel_tasks)
 
         def run():
             thread_name = threading.current_thread().getName()
@@ -112,16 +337,27 @@ class TaskManager:
                 task = self.get_available_task()
                 if task:
                     if task.get_cwd_mode() == TaskRunMode.Isolated:
-                        task.cwd = os.path.join("..", "%s-%s" % (thread_name, task.task_id))
+                        task.cwd = self.get_isolated_cwd(task, thread_name)
                     with self.thread_pool_rlock:
                         if task.get_display_mode() == TaskRunMode.Isolated:
-                            task.env["DISPLAY"] = ":%d" % self.thread_info_pool[thread_name].thread_id
+                            display = self.thread_info_pool[thread_name].thread_id + self.display_offset
+                            task.env["DISPLAY"] = ":%d" % display
                     logger.info("TaskManager", "Thread %s is starting task ID = %s" % (thread_name, task.task_id))
                     date_start = datetime.now()
-                    task.start()
+                    task.started_at = date_start
+                    task.timeout = self.get_timeout(task)
+                    metrics.threads.inc(("busy",))
+                    try:
+                        task.start()
+                    finally:
+                        self.resource_pool.release(task.get_resource_demands())
+                        self.release_isolated_cwd(task)
+                        metrics.threads.dec(("busy",))
                     delta_seconds = (datetime.now() - date_start).total_seconds()
+                    self.task_finished(task, delta_seconds)
                     print_info = (thread_name, task.task_id, delta_seconds)
                     logger.info("TaskManager", "Thread %s finished task ID = %s in %d seconds" % print_info)
+                    self.retry_stalled_task(task)
                     with self.callback_rlock:
                         self.on_task_finish_callback()
                     check_thread_pool()
@@ -168,38 +404,23 @@ class TaskManager:
             self.thread_info_pool[k].thread.join()
 
     def status(self):
-        count_total = len(self.tasks)
-        count_available = 0
-        count_taken = 0
-        count_starting = 0
-        count_running = 0
-        count_completing = 0
-        count_completed = 0
-        count_failed = 0
-        which_failed = []
-
-        for _, v in self.tasks.items():
-            count_available += 1 if v.status == TaskStatus.Available else 0
-            count_taken += 1 if v.status == TaskStatus.Taken else 0
-            count_starting += 1 if v.status == TaskStatus.Starting else 0
-            count_running += 1 if v.status == TaskStatus.Running else 0
-            count_completing += 1 if v.status == TaskStatus.Completing else 0
-            count_completed += 1 if v.status == TaskStatus.Completed else 0
-            if v.status == TaskStatus.Failed:
-                count_failed += 1
-                which_failed.append(v.task_id)
-
-        total = "Total: %d" % count_total
-        available = "Available: %d" % count_available
-        taken = "Taken: %d" % count_taken
-        starting = "Starting: %d" % count_starting
-        running = "Running: %d" % count_running
-        completing = "Completing: %d" % count_completing
-        completed = "Completed: %d" % count_completed
-        failed = "Failed: %d" % count_failed
-
-        print_info = (available, taken, starting, running, completing, completed, failed, total)
-        logger.info("TaskManager", "Task status: %s | %s | %s | %s | %s | %s | %s | %s" % print_info)
+        with self.dep_graph_rlock:
+            counts = dict(self.status_counts)
+            which_failed = sorted(self.failed_task_ids)
+
+        total = "Total: %d" % len(self.tasks)
+        available = "Available: %d" % counts[TaskStatus.Available]
+        taken = "Taken: %d" % counts[TaskStatus.Taken]
+        starting = "Starting: %d" % counts[TaskStatus.Starting]
+        running = "Running: %d" % counts[TaskStatus.Running]
+        completing = "Completing: %d" % counts[TaskStatus.Completing]
+        completed = "Completed: %d" % counts[TaskStatus.Completed]
+        failed = "Failed: %d" % counts[TaskStatus.Failed]
+
+        eta = "ETA: %s" % timedelta(seconds=int(self.get_eta()))
+
+        print_info = (available, taken, starting, running, completing, completed, failed, total, eta)
+        logger.info("TaskManager", "Task status: %s | %s | %s | %s | %s | %s | %s | %s | %s" % print_info)
         if which_failed:
             logger.info("TaskManager", "Failed task IDs:")
         for t_id in which_failed:
@@ -208,24 +429,88 @@ class TaskManager:
         if not self.thread_info_pool:
             self.running = False
 
-    def get_available_task(self) -> Task:
-
-        def find_next_available_task(dep_tree: TaskDependency) -> Task:
-            available_task = None
-            if dep_tree.task.status == TaskStatus.Available:
-                available_task = dep_tree.task
-            elif dep_tree.task.status == TaskStatus.Completed:
-                for dep_tree_child in dep_tree.children:
-                    available_task = find_next_available_task(dep_tree_child)
-                    if available_task:
-                        break
-            return available_task
-
-        with self.dep_tree_lock:
-            root = TaskDependency(Task("root"))
-            root.task.status = TaskStatus.Completed
-            task_list = [self.tasks[t_id] for t_id in self.tasks]
-            task_to_run = find_next_available_task(self.get_dependency_tree(root, task_list))
-            if task_to_run:
-                task_to_run.status = TaskStatus.Taken
-            return task_to_run
+    def get_isolated_cwd(self, task: Task, thread_name) -> str:
+        template = task.get_workspace_template()
+        if self.workspace_pool and template:
+            task.workspace = self.workspace_pool.lease(template, task.__class__.__name__)
+            return task.workspace.path
+        return os.path.join("..", "%s-%s" % (thread_name, task.task_id))
+
+    def release_isolated_cwd(self, task: Task):
+        if task.workspace:
+            self.workspace_pool.release(task.workspace)
+            task.workspace = None
+
+    def get_duration_key(self, task: Task) -> tuple:
+        return task.__class__.__name__, None, None
+
+    def task_finished(self, task: Task, seconds: float):
+        task_type, _, mode = self.get_duration_key(task)
+        metrics.task_duration_seconds.observe(seconds, (task_type, mode, task.status.name))
+        metrics.thread_busy_seconds.inc((), seconds)
+        if self.duration_model and task.status == TaskStatus.Completed:
+            self.duration_model.record(self.get_duration_key(task), seconds)
+            self.invalidate_expected_durations(task)
+        if self.event_bus:
+            self.event_bus.publish(events.TASK_FINISHED, task)
+
+    def invalidate_expected_durations(self, task: Task):
+        # the duration model estimates a task from the durations of the same type and mode, in any scenario if need be
+        task_type, _, mode = self.get_duration_key(task)
+        with self.dep_graph_rlock:
+            for node in self.task_nodes.values():
+                other_type, _, other_mode = self.get_duration_key(node.task)
+                if other_type == task_type and other_mode == mode:
+                    self.ready_tasks.invalidate(node)
+
+    def get_timeout(self, task: Task) -> float:
+        # a high quantile of past durations of the same task type, with some headroom, once there are enough of them
+        timeout = Globals.TASK_MANAGER_MAX_TIMEOUT
+        if self.duration_model:
+            q = Globals.PROCESS_MONITOR_TIMEOUT_QUANTILE
+            quantile = self.duration_model.quantile(self.get_duration_key(task), q, None,
+                                                    Globals.PROCESS_MONITOR_TIMEOUT_MIN_SAMPLES)
+            if quantile is not None:
+                adaptive = max(quantile * Globals.PROCESS_MONITOR_TIMEOUT_FACTOR, Globals.PROCESS_MONITOR_MIN_TIMEOUT)
+                timeout = min(adaptive, timeout)
+        return timeout
+
+    def retry_stalled_task(self, task: Task):
+        # put back in the queue right away, rather than after the content checker replaces the failed task
+        if task.status != TaskStatus.Failed or not task.retryable or self.tasks.get(task.task_id) is not task:
+            return
+        task.retryable = False
+        if task.retries < Globals.PROCESS_MONITOR_MAX_RETRIES:
+            task.retries += 1
+            print_info = (task.task_id, task.retries, Globals.PROCESS_MONITOR_MAX_RETRIES)
+            logger.info("TaskManager", "Retrying stalled task ID = %s (attempt %d out of %d)" % print_info)
+            task.status = TaskStatus.Available
+
+    def get_remaining_duration(self, task: Task) -> float:
+        if task.status in [TaskStatus.Completed, TaskStatus.Failed]:
+            return 0
+        expected = self.get_expected_duration(task)
+        if task.status != TaskStatus.Available and task.started_at:
+            expected = max(0, expected - (datetime.now() - task.started_at).total_seconds())
+        return expected
+
+    def get_eta(self) -> float:
+        # the remaining work spread over every thread, but no less than the longest remaining chain of tasks
+        with self.dep_graph_rlock:
+            remaining = sum([self.get_remaining_duration(task) for task in self.tasks.values()])
+            critical_path = max([scheduling.get_bottom_level(node, self.get_remaining_duration)
+                                 for node in self.dep_root.children], default=0)
+        return max(remaining / self.max_parallel_tasks, critical_path)
+
+    def get_available_task(self, resource_pool: ResourcePool = None) -> Task:
+        resource_pool = resource_pool or self.resource_pool
+        with self.dep_graph_rlock:
+            while self.ready_tasks:
+                node = self.ready_tasks.pop(lambda n: resource_pool.can_acquire(n.task.get_resource_demands()))
+                if not node:
+                    break
+                if node.reachable and node.task.status == TaskStatus.Available:
+                    resource_pool.acquire(node.task.get_resource_demands())
+                    node.task.status = TaskStatus.Taken
+                    return node.task
+            return None
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+import utils
+from globals import Globals
+from logger import logger
+from task import Task, TaskStatus
+
+# Durable task state: every task the task manager knows of, with its status, attempts, timings, workspace and
+# artifacts, written on every status transition so that a restarted pipeline resumes where it stopped
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    workspace TEXT,
+    artifacts TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS durations (
+    task_type TEXT NOT NULL,
+    scenario TEXT,
+    mode TEXT,
+    seconds REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class StoredTask:
+    def __init__(self, row: sqlite3.Row):
+        self.task_id = row["task_id"]
+        self.description = json.loads(row["description"])
+        self.status = TaskStatus[row["status"]]
+        self.attempts = row["attempts"]
+        self.started_at = row["started_at"]
+        self.finished_at = row["finished_at"]
+        self.workspace = row["workspace"]
+        self.artifacts = json.loads(row["artifacts"]) if row["artifacts"] else []
+
+
+class TaskStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def save_task(self, task: Task, description: dict):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO tasks (task_id, description, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(task_id) DO UPDATE SET description = excluded.description, status = excluded.status, "
+                "updated_at = excluded.updated_at",
+                (task.task_id, json.dumps(description), task.status.name, now, now))
+
+    def save_status(self, task: Task, status: TaskStatus):
+        now = time.time()
+        if status == TaskStatus.Taken:
+            query = "UPDATE tasks SET status = ?, updated_at = ?, attempts = attempts + 1, started_at = NULL, " \
+                    "finished_at = NULL, workspace = NULL WHERE task_id = ?"
+            args = (status.name, now, task.task_id)
+        elif status == TaskStatus.Starting:
+            workspace = task.cwd if task.cwd != os.getcwd() else None
+            query = "UPDATE tasks SET status = ?, updated_at = ?, started_at = ?, workspace = ? WHERE task_id = ?"
+            args = (status.name, now, now, workspace, task.task_id)
+        elif status == TaskStatus.Completed:
+            query = "UPDATE tasks SET status = ?, updated_at = ?, finished_at = ?, artifacts = ? WHERE task_id = ?"
+            args = (status.name, now, now, json.dumps(task.get_output_paths()), task.task_id)
+        elif status == TaskStatus.Failed:
+            query = "UPDATE tasks SET status = ?, updated_at = ?, finished_at = ? WHERE task_id = ?"
+            args = (status.name, now, now, task.task_id)
+        else:
+            query = "UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ?"
+            args = (status.name, now, task.task_id)
+        with self.lock, self.connection:
+            self.connection.execute(query, args)
+
+    def load(self) -> List[StoredTask]:
+        with self.lock:
+            return [StoredTask(row) for row in self.connection.execute("SELECT * FROM tasks ORDER BY created_at")]
+
+    def save_duration(self, key: tuple, seconds: float):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO durations VALUES (?, ?, ?, ?, ?)", (*key, seconds, time.time()))
+
+    def load_durations(self) -> List[Tuple[tuple, float]]:
+        with self.lock:
+            rows = self.connection.execute("SELECT * FROM durations ORDER BY finished_at")
+            return [((row["task_type"], row["scenario"], row["mode"]), row["seconds"]) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def clean_orphaned_workspaces(root_dir):
+    # isolated task workspaces are named <thread name>-<task ID>, or <prefix>-<template>-<number> when pooled, and none
+    # is in use before the task manager starts
+    pattern = r"^(TaskManager\d+-|%s-)" % re.escape(Globals.WORKSPACE_POOL_DIR_PREFIX)
+    for name in os.listdir(root_dir):
+        path = os.path.join(root_dir, name)
+        if re.match(pattern, name) and os.path.isdir(path):
+            logger.info("TaskStore", "Removing orphaned workspace %s" % path)
+            utils.clear_and_remove_dir(path)
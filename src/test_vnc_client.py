@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import os
+import threading
+
+import pytest
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+from globals import Globals
+from vnc_client import VNCManagerClient
+
+
+# Stand-in VNC manager with a file store, served over HTTP so that the client streams its uploads as it would to the
+# real one; probe_status is the answer to the file store probe (200 with a file store, 404 without one)
+class VNCManager:
+    def __init__(self):
+        self.files = {}
+        self.probe_status = 200
+        self.calls = []
+        self.requests = []
+        app = Flask("vnc_manager")
+
+        @app.route("/api/vnc/files", methods=["GET"])
+        def probe():
+            self.calls.append(("GET", None))
+            return "", self.probe_status
+
+        @app.route("/api/vnc/files/<file_hash>", methods=["HEAD", "PUT"])
+        def file(file_hash):
+            self.calls.append((request.method, file_hash))
+            if request.method == "HEAD":
+                return "", 200 if file_hash in self.files else 404
+            content = gzip.decompress(request.get_data())
+            if hashlib.sha256(content).hexdigest() != file_hash:
+                return "", 400
+            self.files[file_hash] = content
+            return "", 201
+
+        @app.route("/api/vnc/request", methods=["POST"])
+        def simulation_request():
+            if request.is_json:
+                hashes = request.get_json()
+                if any(file_hash not in self.files for file_hash in hashes.values()):
+                    return "", 400
+                self.requests.append({name: self.files[file_hash] for name, file_hash in hashes.items()})
+            else:
+                self.requests.append({name: f.read() for name, f in request.files.items()})
+            return {"url": "vnc://localhost:5900"}
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.api_url = "http://127.0.0.1:%d/api/" % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def count(self, method) -> int:
+        return len([call for call in self.calls if call[0] == method])
+
+
+@pytest.fixture
+def manager():
+    manager = VNCManager()
+    manager.thread.start()
+    yield manager
+    manager.server.shutdown()
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setattr(Globals, "ECOROUTING_DIR", str(tmp_path))
+    contents = {
+        "gui-settings": b'<viewsettings>\n    <delay value="0"/>\n</viewsettings>\n',
+        "net-file": b"<net>" + b"<edge/>" * 100_000 + b"</net>\n",
+        "route-files": b"<routes/>\n"
+    }
+    paths = {
+        "gui-settings": os.path.join(str(tmp_path), Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME),
+        "net-file": os.path.join(str(tmp_path), "net.xml"),
+        "route-files": os.path.join(str(tmp_path), "routes.xml")
+    }
+    for name, path in paths.items():
+        with open(path, "wb") as f:
+            f.write(contents[name])
+    return paths, contents
+
+
+def test_uploads_each_file_once(manager, files):
+    paths, contents = files
+    client = VNCManagerClient(manager.api_url)
+    assert client.request_simulation(paths["net-file"], paths["route-files"]) == {"url": "vnc://localhost:5900"}
+    assert manager.count("PUT") == 3
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert manager.count("PUT") == 3
+    assert manager.count("HEAD") == 6
+    assert manager.requests == [contents, contents]
+
+
+def test_skips_files_already_stored(manager, files):
+    paths, contents = files
+    VNCManagerClient(manager.api_url).request_simulation(paths["net-file"], paths["route-files"])
+    # a new client (e.g. after a restart) finds the files stored by the previous one
+    VNCManagerClient(manager.api_url).request_simulation(paths["net-file"], paths["route-files"])
+    assert manager.count("PUT") == 3
+    assert manager.requests == [contents, contents]
+
+
+def test_uploads_modified_files(manager, files):
+    paths, contents = files
+    client = VNCManagerClient(manager.api_url)
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    contents["route-files"] = b"<routes>\n    <route/>\n</routes>\n"
+    with open(paths["route-files"], "wb") as f:
+        f.write(contents["route-files"])
+    os.utime(paths["route-files"], ns=(0, 0))
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert manager.count("PUT") == 4
+    assert manager.requests[-1] == contents
+
+
+@pytest.mark.parametrize("probe_status", [404, 405])
+def test_falls_back_to_multipart(manager, files, probe_status):
+    paths, contents = files
+    manager.probe_status = probe_status
+    client = VNCManagerClient(manager.api_url)
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert manager.count("GET") == 1
+    assert manager.count("HEAD") == manager.count("PUT") == 0
+    assert manager.requests == [contents, contents]
+
+
+def test_probes_again_after_an_error(manager, files):
+    paths, contents = files
+    manager.probe_status = 503
+    client = VNCManagerClient(manager.api_url)
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert client.supports_file_store is None
+    manager.probe_status = 200
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert manager.count("GET") == 2
+    assert manager.count("PUT") == 3
+    assert manager.requests == [contents, contents, contents]
+
+
+def test_probes_again_after_a_connection_error(manager, files):
+    paths, contents = files
+    client = VNCManagerClient("http://127.0.0.1:1/api/")
+    assert not client.check_file_store()
+    assert client.supports_file_store is None
+    client.api_url = manager.api_url
+    client.request_simulation(paths["net-file"], paths["route-files"])
+    assert client.supports_file_store
+    assert manager.requests == [contents]
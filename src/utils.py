@@ -1,5 +1,4 @@
 import os
-import re
 import shutil
 import tarfile
 import time
@@ -7,6 +6,7 @@ from importlib import machinery, util
 from types import ModuleType
 from typing import List, Tuple, Callable
 
+import xml_transform
 from globals import Globals
 from logger import logger
 
@@ -166,14 +166,6 @@ def res_to_TEMA_ev(res):
     }
 
 
-def get_simulation_files(netfile, roufile):
-    return {
-        "gui-settings": open(os.path.join(Globals.ECOROUTING_DIR, Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME), "rb"),
-        "net-file": open(netfile, "rb"),
-        "route-files": open(roufile, "rb")
-    }
-
-
 def get_objective_combinations():
     combinations = set()
     for objective1 in Globals.ECOROUTING_METRICS:
@@ -199,71 +191,32 @@ def reverse_format_objective_names(name):
 def add_snapshots_to_gui_settings(path_to_gui_settings):
     # remove_snapshots_from_gui_settings(path_to_gui_settings)
     snapshot_file_name = os.path.join(Globals.SNAPSHOTS_DIR, Globals.SNAPSHOTS_FILE_NAME)
-    snapshot_str = "\n".join([Globals.SNAPSHOTS_XML_ELEMENT % (snapshot_file_name % i, i) for i in
-                              range(Globals.SNAPSHOTS_COUNT)])
     gui_settings = os.path.join(path_to_gui_settings, Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME)
-    with open(gui_settings, "r") as f:
-        content = f.read()
 
-    content = content.replace("</viewsettings>", "%s\n</viewsettings>" % snapshot_str)
+    def append_snapshots(out):
+        for i in range(Globals.SNAPSHOTS_COUNT):
+            out.write(Globals.SNAPSHOTS_XML_ELEMENT % (snapshot_file_name % i, i) + "\n")
 
-    with open(gui_settings, "w") as f:
-        f.write(content)
-
-    del content
+    xml_transform.transform(gui_settings, append=append_snapshots)
 
 
 def remove_snapshots_from_gui_settings(path_to_gui_settings):
-    xml_line = Globals.SNAPSHOTS_XML_ELEMENT
-    regex = re.compile(xml_line.replace("%s", ".+").replace("%d", "[0-9]+").strip())
     gui_settings = os.path.join(path_to_gui_settings, Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME)
-    with open(gui_settings, "r") as f:
-        content = f.readlines()
-
-    content = [line for line in content if not regex.match(line.strip())]
-
-    with open(gui_settings, "w") as f:
-        f.writelines(content)
-
-    del content
+    xml_transform.transform(gui_settings, drop=[Globals.SNAPSHOTS_XML_TAG])
 
 
 def merge_additional_files_content(file_src, file_dest, xml_tags: list):
-    content_to_add = []
-    with open(file_src, "r") as f:
-        for line in f.readlines():
-            for xml_tag in xml_tags:
-                if line.replace("<", "").replace(">", "").strip().startswith(xml_tag):
-                    content_to_add.append(line.strip())
-                    break
-    content_to_add_str = "\n".join(content_to_add)
-
-    with open(file_dest, "r") as f:
-        content = f.read()
-
-    content = content.replace("</additional>", "%s\n</additional>" % content_to_add_str)
-
-    with open(file_dest, "w") as f:
-        f.write(content)
-
-    del content
+    # appends the elements of file_src named in xml_tags to file_dest
+    xml_transform.transform(file_dest, append=lambda out: xml_transform.copy_elements(file_src, xml_tags, out))
 
 
 def remove_tags_from_xml(file, tags: List[Tuple[str, str]]):
-    with open(file, "r") as f:
-        content = f.read()
-
+    # only comments (Globals.XML_COMMENT_TAGS) and the XML declaration (Globals.XML_PROLOG_TAGS) can be removed
     for tag in tags:
-        start = tag[0]
-        end = tag[1]
-        content = re.sub("(%s.*?%s)" % (start, end), "", content, flags=re.DOTALL)
-
-    content = re.sub("\n(\n)+", "", content)
-
-    with open(file, "w") as f:
-        f.write(content)
-
-    del content
+        if tag not in [Globals.XML_COMMENT_TAGS, Globals.XML_PROLOG_TAGS]:
+            raise ValueError("Cannot remove %s...%s tags from %s" % (tag[0], tag[1], file))
+    xml_transform.transform(file, declaration=Globals.XML_PROLOG_TAGS not in tags,
+                            comments=Globals.XML_COMMENT_TAGS not in tags)
 
 
 def is_module_available(module_name):
@@ -10,16 +10,16 @@ from globals import Globals
 from logger import logger
 
 
+def fix_video_targz_file_name(file):
+    if file.endswith(Globals.VIDEOS_TARGZ_FILE_TYPE) and not file.endswith("." + Globals.VIDEOS_TARGZ_FILE_TYPE):
+        fixed_file = file.replace(Globals.VIDEOS_TARGZ_FILE_TYPE, "." + Globals.VIDEOS_TARGZ_FILE_TYPE)
+        os.rename(os.path.join(Globals.VIDEOS_TARGZ_DIR, file), os.path.join(Globals.VIDEOS_TARGZ_DIR, fixed_file))
+        return fixed_file
+    return file
+
+
 def find_video_targz_files():
-    files = []
-    for file in os.listdir(Globals.VIDEOS_TARGZ_DIR):
-        if file.endswith(Globals.VIDEOS_TARGZ_FILE_TYPE) and not file.endswith("." + Globals.VIDEOS_TARGZ_FILE_TYPE):
-            fixed_file = file.replace(Globals.VIDEOS_TARGZ_FILE_TYPE, "." + Globals.VIDEOS_TARGZ_FILE_TYPE)
-            os.rename(os.path.join(Globals.VIDEOS_TARGZ_DIR, file), os.path.join(Globals.VIDEOS_TARGZ_DIR, fixed_file))
-            files.append(fixed_file)
-        else:
-            files.append(file)
-    return files
+    return [fix_video_targz_file_name(file) for file in os.listdir(Globals.VIDEOS_TARGZ_DIR)]
 
 
 def generate_video_from_targz(targz_file_name):
@@ -56,13 +56,17 @@ def generate_video_from_targz(targz_file_name):
     utils.clear_and_remove_dir(dst_dir)
 
 
-def run():
-    for file in find_video_targz_files():
+def generate_videos(files):
+    for file in files:
         logger.info("VideoGenerator", "Generating video from %s" % file)
         generate_video_from_targz(file)
         if __name__ == '__main__':
             logger.flush()
 
 
+def run():
+    generate_videos(find_video_targz_files())
+
+
 if __name__ == '__main__':
     run()
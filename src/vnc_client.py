@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+import zlib
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from globals import Globals
+from logger import logger
+
+
+# Client for the VNC manager API used by the simulation view endpoints
+# Files are uploaded once, gzip-compressed and streamed, to vnc/files/<sha256>; simulation requests then reference
+# them by hash. VNC managers that do not expose vnc/files are sent the legacy multipart request instead
+class VNCManagerClient:
+    def __init__(self, api_url):
+        self.api_url = api_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Globals.VNC_MANAGER_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.hashes: Dict[str, Tuple[tuple, str]] = {}
+        self.hashes_lock = threading.Lock()
+        self.supports_file_store = None
+
+    @staticmethod
+    def read_chunks(path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(Globals.VNC_MANAGER_CHUNK_SIZE), b""):
+                yield chunk
+
+    @staticmethod
+    def gzip_chunks(path):
+        compressor = zlib.compressobj(Globals.VNC_MANAGER_COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in VNCManagerClient.read_chunks(path):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def get_file_hash(self, path) -> str:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.hashes_lock:
+            cached = self.hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        for chunk in VNCManagerClient.read_chunks(path):
+            digest.update(chunk)
+        file_hash = digest.hexdigest()
+        with self.hashes_lock:
+            self.hashes[path] = (signature, file_hash)
+        return file_hash
+
+    def check_file_store(self) -> bool:
+        # only a definitive answer is kept: after an error, this request is sent as multipart and the next one probes
+        # the VNC manager again
+        if self.supports_file_store is None:
+            try:
+                response = self.session.get(self.api_url + "vnc/files", timeout=Globals.VNC_MANAGER_TIMEOUT)
+            except requests.RequestException as e:
+                logger.warn("VNCManagerClient", "Could not probe the VNC manager file store: %s" % e)
+                return False
+            if response.status_code == 200:
+                self.supports_file_store = True
+            elif response.status_code in [404, 405]:
+                self.supports_file_store = False
+                logger.info("VNCManagerClient", "VNC manager has no file store, using multipart uploads")
+            else:
+                status_code = response.status_code
+                logger.warn("VNCManagerClient", "Could not probe the VNC manager file store: HTTP %d" % status_code)
+                return False
+        return self.supports_file_store
+
+    def upload_file(self, path) -> str:
+        file_hash = self.get_file_hash(path)
+        url = self.api_url + "vnc/files/" + file_hash
+        response = self.session.head(url, timeout=Globals.VNC_MANAGER_TIMEOUT)
+        if response.status_code == 404:
+            headers = {"Content-Encoding": "gzip", "Content-Type": "application/octet-stream"}
+            response = self.session.put(url, data=VNCManagerClient.gzip_chunks(path), headers=headers,
+                                        timeout=Globals.VNC_MANAGER_TIMEOUT)
+            response.raise_for_status()
+            logger.info("VNCManagerClient", "Uploaded %s as %s" % (path, file_hash))
+        else:
+            response.raise_for_status()
+        return file_hash
+
+    def request_simulation(self, netfile, roufile) -> dict:
+        files = {
+            "gui-settings": os.path.join(Globals.ECOROUTING_DIR, Globals.ECOROUTING_GUI_SETTINGS_FILE_NAME),
+            "net-file": netfile,
+            "route-files": roufile
+        }
+        url = self.api_url + "vnc/request"
+        if self.check_file_store():
+            hashes = {name: self.upload_file(path) for name, path in files.items()}
+            response = self.session.post(url, json=hashes, timeout=Globals.VNC_MANAGER_TIMEOUT)
+        else:
+            handles = {name: open(path, "rb") for name, path in files.items()}
+            try:
+                response = self.session.post(url, files=handles, timeout=Globals.VNC_MANAGER_TIMEOUT)
+            finally:
+                for handle in handles.values():
+                    handle.close()
+        response.raise_for_status()
+        return response.json()
+
+
+vnc_client = VNCManagerClient(Globals.VNC_MANAGER_API)
@@ -0,0 +1,99 @@
+import os
+import shutil
+import time
+from typing import Dict, List, Set, Tuple
+
+import metrics
+from globals import Globals
+from logger import logger
+
+
+# The trees a task workspace is staged from, and the files of them the task writes to
+class WorkspaceTemplate:
+    def __init__(self, name, trees: List[str], mutable_files: List[str] = ()):
+        self.name = name
+        self.trees = trees
+        self.mutable_files = list(mutable_files)
+
+
+# Task workspaces staged from read-only inputs (the EcoRouting and TEMA trees, the outputs of earlier tasks) as farms of
+# hard links, or of symbolic links across file systems, rather than as copies
+# Only the files a task writes to are copied: those in Globals.WORKSPACE_MUTABLE_FILES or given when staging a tree, and
+# those materialized before being written to
+class Workspace:
+    def __init__(self, path, task_type):
+        self.path = path
+        self.task_type = task_type
+        self.started_at = time.monotonic()
+        self.files_linked = 0
+        self.files_copied = 0
+        self.bytes_copied = 0
+        # the files staged, mapped to their source and whether they were linked, and the directories created
+        self.staged: Dict[str, Tuple[str, bool]] = {}
+        self.dirs: Set[str] = set()
+
+    def copy_file(self, src, dst):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        shutil.copyfile(src, dst)
+        self.files_copied += 1
+        self.bytes_copied += os.path.getsize(dst)
+        self.staged[dst] = (src, False)
+
+    def link_file(self, src, dst):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        mode = Globals.WORKSPACE_LINK_MODE
+        if mode == "hardlink":
+            try:
+                os.link(src, dst)
+                self.files_linked += 1
+                self.staged[dst] = (src, True)
+                return
+            except OSError:
+                # e.g. across file systems
+                mode = "symlink"
+        if mode == "symlink":
+            os.symlink(os.path.abspath(src), dst)
+            self.files_linked += 1
+            self.staged[dst] = (src, True)
+            return
+        self.copy_file(src, dst)
+
+    def stage_tree(self, src_dir, mutable_files: List[str] = ()):
+        if not os.path.isdir(src_dir):
+            return
+        mutable_files = set(Globals.WORKSPACE_MUTABLE_FILES).union(mutable_files)
+        for dir_path, _, file_names in os.walk(src_dir, followlinks=True):
+            dst_dir = os.path.normpath(os.path.join(self.path, os.path.relpath(dir_path, src_dir)))
+            os.makedirs(dst_dir, exist_ok=True)
+            self.dirs.add(dst_dir)
+            for file_name in file_names:
+                src = os.path.join(dir_path, file_name)
+                dst = os.path.join(dst_dir, file_name)
+                if file_name in mutable_files:
+                    self.copy_file(src, dst)
+                else:
+                    self.link_file(src, dst)
+
+    def materialize(self, path):
+        # replaces a link by a private copy, so that writing to it leaves its source untouched
+        if os.path.islink(path) or (os.path.isfile(path) and os.stat(path).st_nlink > 1):
+            tmp_path = "%s.tmp" % path
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, path)
+            self.files_copied += 1
+            self.bytes_copied += os.path.getsize(path)
+
+    def stage_template(self, template: "WorkspaceTemplate"):
+        for tree in template.trees:
+            self.stage_tree(tree, template.mutable_files)
+
+    def report(self):
+        seconds = time.monotonic() - self.started_at
+        metrics.workspace_staging_seconds.observe(seconds, (self.task_type,))
+        metrics.workspace_files.inc((self.task_type, "linked"), self.files_linked)
+        metrics.workspace_files.inc((self.task_type, "copied"), self.files_copied)
+        metrics.workspace_copied_bytes.inc((self.task_type,), self.bytes_copied)
+        print_info = (self.path, seconds, self.files_linked, self.files_copied, self.bytes_copied)
+        logger.info("Workspace", "Staged %s in %.3f seconds: %d files linked, %d files (%d bytes) copied" % print_info)
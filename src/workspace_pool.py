@@ -0,0 +1,191 @@
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+import metrics
+import utils
+from globals import Globals
+from logger import logger
+from workspace import Workspace, WorkspaceTemplate
+
+
+# A workspace staged from a template once and then reused by task after task: the stat of every file it was staged
+# with is recorded, so that resetting it only removes what a task added and restages what a task replaced or modified
+class PooledWorkspace(Workspace):
+    def __init__(self, path, template: WorkspaceTemplate):
+        Workspace.__init__(self, path, template.name)
+        self.template = template
+        self.manifest: Dict[str, Tuple[int, int, int]] = {}
+
+    @staticmethod
+    def get_stat(path) -> Tuple[int, int, int]:
+        stat = os.lstat(path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def stage(self):
+        utils.ensure_dir_exists(self.path)
+        utils.clear_dir(self.path)
+        self.stage_template(self.template)
+        self.manifest = {path: self.get_stat(path) for path in self.staged}
+
+    def lease(self, task_type):
+        # the files a task stages on top of the template are reported as its own
+        self.task_type = task_type
+        self.started_at = time.monotonic()
+        self.files_linked = 0
+        self.files_copied = 0
+        self.bytes_copied = 0
+
+    def reset(self) -> Tuple[int, int]:
+        self.staged = {path: self.staged[path] for path in self.manifest}
+        removed = 0
+        for dir_path, dir_names, file_names in os.walk(self.path, topdown=False):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                if path not in self.manifest:
+                    os.remove(path)
+                    removed += 1
+            for name in dir_names:
+                path = os.path.join(dir_path, name)
+                if os.path.islink(path):
+                    os.remove(path)
+                    removed += 1
+                elif path not in self.dirs:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+        restaged = 0
+        for path in sorted(self.dirs):
+            os.makedirs(path, exist_ok=True)
+        for path, stat in self.manifest.items():
+            if os.path.lexists(path) and self.get_stat(path) == stat:
+                continue
+            src, linked = self.staged[path]
+            if linked:
+                self.link_file(src, path)
+            else:
+                self.copy_file(src, path)
+            self.manifest[path] = self.get_stat(path)
+            restaged += 1
+        return removed, restaged
+
+
+# Workspaces for isolated task directories, kept staged for each template (Globals.WORKSPACE_POOL_SIZES of them) by a
+# background thread, which also resets the workspaces the tasks give back
+# A task leasing from an empty pool has a workspace staged right away, as it would without the pool
+class WorkspacePool:
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        self.templates: Dict[str, WorkspaceTemplate] = {}
+        self.idle: Dict[str, List[PooledWorkspace]] = {}
+        self.created: Dict[str, int] = {}
+        self.released: Deque[PooledWorkspace] = deque()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: threading.Thread = None
+        self.running = False
+
+    def register(self, template: WorkspaceTemplate):
+        with self.lock:
+            if template.name not in self.templates:
+                self.templates[template.name] = template
+                self.idle[template.name] = []
+                self.created[template.name] = 0
+        self.wake.set()
+
+    def get_size(self, template: WorkspaceTemplate) -> int:
+        return Globals.WORKSPACE_POOL_SIZES.get(template.name, 0)
+
+    def create(self, template: WorkspaceTemplate) -> PooledWorkspace:
+        with self.lock:
+            self.created[template.name] += 1
+            name = "%s-%s-%d" % (Globals.WORKSPACE_POOL_DIR_PREFIX, template.name, self.created[template.name])
+        workspace = PooledWorkspace(os.path.join(self.root_dir, name), template)
+        workspace.stage()
+        workspace.report()
+        return workspace
+
+    def lease(self, template: WorkspaceTemplate, task_type) -> PooledWorkspace:
+        self.register(template)
+        with self.lock:
+            idle = self.idle[template.name]
+            workspace = idle.pop() if idle else None
+        metrics.workspace_pool_leases.inc((template.name, "warm" if workspace else "cold"))
+        if workspace is None:
+            workspace = self.create(template)
+        workspace.lease(task_type)
+        return workspace
+
+    def release(self, workspace: PooledWorkspace):
+        with self.lock:
+            self.released.append(workspace)
+        self.wake.set()
+
+    def recycle(self, workspace: PooledWorkspace):
+        name = workspace.template.name
+        with self.lock:
+            keep = len(self.idle[name]) < max(self.get_size(workspace.template), Globals.TASK_MANAGER_MAX_THREADS)
+        if not keep:
+            utils.clear_and_remove_dir(workspace.path)
+            return
+        started_at = time.monotonic()
+        try:
+            removed, restaged = workspace.reset()
+        except OSError as e:
+            logger.warn("WorkspacePool", "Could not reset %s, removing it: %s" % (workspace.path, e))
+            utils.clear_and_remove_dir(workspace.path)
+            return
+        seconds = time.monotonic() - started_at
+        metrics.workspace_pool_reset_seconds.observe(seconds, (name,))
+        print_info = (workspace.path, seconds, removed, restaged)
+        logger.info("WorkspacePool", "Reset %s in %.3f seconds: %d paths removed, %d files restaged" % print_info)
+        with self.lock:
+            self.idle[name].append(workspace)
+
+    def maintain(self):
+        while self.running:
+            self.wake.wait(Globals.WORKSPACE_POOL_CHECK_INTERVAL)
+            self.wake.clear()
+            while self.running:
+                with self.lock:
+                    workspace = self.released.popleft() if self.released else None
+                if workspace is None:
+                    break
+                self.recycle(workspace)
+            for template in list(self.templates.values()):
+                while self.running:
+                    with self.lock:
+                        missing = len(self.idle[template.name]) < self.get_size(template)
+                    if not missing:
+                        break
+                    try:
+                        workspace = self.create(template)
+                    except OSError as e:
+                        logger.warn("WorkspacePool", "Could not stage a %s workspace: %s" % (template.name, e))
+                        break
+                    with self.lock:
+                        self.idle[template.name].append(workspace)
+            with self.lock:
+                for name in self.idle:
+                    metrics.workspace_pool_idle.set((name,), len(self.idle[name]))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.maintain, name="WorkspacePool", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # leased workspaces are left to the orphaned workspaces cleanup of the next start
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join()
+        with self.lock:
+            workspaces = list(self.released) + [workspace for idle in self.idle.values() for workspace in idle]
+            self.released.clear()
+            for idle in self.idle.values():
+                idle.clear()
+        for workspace in workspaces:
+            utils.clear_and_remove_dir(workspace.path)
@@ -0,0 +1,162 @@
+import os
+import re
+import threading
+from typing import Callable, Iterable, List, TextIO
+from xml.parsers import expat
+
+from globals import Globals
+
+# Streaming edits of XML files (gui-settings, SUMO additional files): the file is parsed incrementally by expat and
+# written back out event by event, so memory stays bounded whatever its size, and every edit is applied in that single
+# pass:
+# - elements named in drop are left out, along with the whitespace before them
+# - append writes more content (e.g. elements copied from another file by copy_elements) before the end of the root
+# - the XML declaration and comments may be left out
+# The result replaces the file by a rename, so a file linked from elsewhere is never written to in place
+# DTDs are not kept, and CDATA sections are written as escaped text
+
+# most text and attribute values need no escaping, and are checked for it first as translating them is slower
+TEXT_SPECIAL_CHARS = re.compile("[&<>]")
+TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+ATTRIBUTE_SPECIAL_CHARS = re.compile("[&<>\"\n\r\t]")
+ATTRIBUTE_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;", "\n": "&#10;", "\r": "&#13;",
+                                   "\t": "&#9;"})
+
+
+def escape_text(text) -> str:
+    return text.translate(TEXT_ESCAPES) if TEXT_SPECIAL_CHARS.search(text) else text
+
+
+def escape_attribute(value) -> str:
+    return value.translate(ATTRIBUTE_ESCAPES) if ATTRIBUTE_SPECIAL_CHARS.search(value) else value
+
+
+class XMLStreamWriter:
+    def __init__(self, out: TextIO, drop: Iterable[str] = (), keep: Iterable[str] = None,
+                 append: Callable[[TextIO], None] = None, declaration=True, comments=True):
+        self.out = out
+        self.drop = set(drop)
+        # only the elements named in keep (and their content) are written, one per line, if given
+        self.keep = set(keep) if keep is not None else None
+        self.append = append
+        self.declaration = declaration
+        self.comments = comments
+        self.depth = 0
+        self.drop_depth = None
+        self.keep_depth = None
+        self.writing = self.keep is None
+        self.whitespace = ""
+        self.tag_open = False
+
+    def update_writing(self):
+        self.writing = self.drop_depth is None and (self.keep is None or self.keep_depth is not None)
+
+    def write(self, data):
+        # an open start tag is closed before the whitespace that follows it
+        if self.tag_open:
+            data = ">" + self.whitespace + data
+            self.tag_open = False
+        elif self.whitespace:
+            data = self.whitespace + data
+        self.whitespace = ""
+        self.out.write(data)
+
+    def end_top_level_node(self, depth=0):
+        # whitespace outside of the root element is not reported, so it and the nodes around it get a line each
+        if self.depth == depth:
+            self.out.write("\n")
+
+    def start_document(self):
+        if self.declaration and self.keep is None:
+            self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+
+    def start_element(self, name, attrs: List[str]):
+        self.depth += 1
+        if self.drop_depth is None and name in self.drop:
+            self.drop_depth = self.depth
+            self.whitespace = ""
+            self.update_writing()
+        elif self.keep_depth is None and self.keep is not None and name in self.keep:
+            self.keep_depth = self.depth
+            self.update_writing()
+        if self.writing:
+            # attributes come as a flat [name, value, ...] list, in document order
+            self.write("<" + name + "".join([' %s="%s"' % (attrs[i], escape_attribute(attrs[i + 1]))
+                                             for i in range(0, len(attrs), 2)]))
+            self.tag_open = True
+
+    def end_element(self, name):
+        if self.writing:
+            if self.depth == 1 and self.append:
+                self.write("")
+                self.append(self.out)
+            if self.tag_open and not self.whitespace:
+                self.out.write("/>")
+                self.tag_open = False
+            else:
+                self.write("</%s>" % name)
+            if self.keep is None:
+                self.end_top_level_node(1)
+        if self.drop_depth == self.depth:
+            self.drop_depth = None
+            self.update_writing()
+        elif self.keep_depth == self.depth:
+            self.keep_depth = None
+            self.out.write("\n")
+            self.update_writing()
+        self.depth -= 1
+
+    def characters(self, content):
+        if not self.writing:
+            return
+        if content.isspace():
+            # held back until the next event, as it is left out along with a dropped element
+            self.whitespace += content
+        else:
+            self.write(escape_text(content))
+
+    def processing_instruction(self, target, data):
+        if self.writing:
+            self.write("<?%s %s?>" % (target, data) if data else "<?%s?>" % target)
+            self.end_top_level_node()
+
+    def comment(self, content):
+        if not self.writing:
+            return
+        if self.comments:
+            self.write("<!--%s-->" % content)
+            self.end_top_level_node()
+        else:
+            self.whitespace = ""
+
+
+def parse(file, handler: XMLStreamWriter):
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.buffer_size = Globals.XML_TRANSFORM_BUFFER_SIZE
+    parser.ordered_attributes = True
+    parser.StartElementHandler = handler.start_element
+    parser.EndElementHandler = handler.end_element
+    parser.CharacterDataHandler = handler.characters
+    parser.ProcessingInstructionHandler = handler.processing_instruction
+    parser.CommentHandler = handler.comment
+    handler.start_document()
+    with open(file, "rb") as f:
+        parser.ParseFile(f)
+
+
+def copy_elements(file, names: Iterable[str], out: TextIO):
+    # writes the elements of a file named in names, wherever they are, one per line
+    parse(file, XMLStreamWriter(out, keep=names))
+
+
+def transform(file, drop: Iterable[str] = (), append: Callable[[TextIO], None] = None, declaration=True,
+              comments=True):
+    tmp_file = "%s.%d.tmp" % (file, threading.get_ident())
+    try:
+        with open(tmp_file, "w", encoding="utf-8", buffering=Globals.XML_TRANSFORM_BUFFER_SIZE) as out:
+            parse(file, XMLStreamWriter(out, drop=drop, append=append, declaration=declaration, comments=comments))
+        os.replace(tmp_file, file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)